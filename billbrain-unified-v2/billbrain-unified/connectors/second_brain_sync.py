@@ -343,6 +343,79 @@ class SecondBrainSync:
         logger.info(f"Bill sync complete: {stats['synced']} synced, {stats['failed']} failed")
         return stats
     
+    # ==================== RECONCILIATION ====================
+    
+    def reconcile_bills(self, session, BillInstance, BillStatus) -> Dict[str, Any]:
+        """
+        Match open bill instances to bank transactions imported in Second Brain.
+        
+        Confident matches, and review matches confirmed in Second Brain since
+        the last call, are marked PAID here; low-confidence ones are returned
+        for review (and queued in Second Brain's /api/financial/reconcile/review).
+        
+        Args:
+            session: SQLAlchemy session for BillBrain DB
+            BillInstance: The BillInstance model class
+            BillStatus: The BillStatus enum
+        
+        Returns:
+            Stats dict with paid/review counts and the review matches
+        """
+        stats = {"paid": 0, "review": [], "unmatched": 0}
+        
+        open_bills = session.query(BillInstance).filter(
+            BillInstance.status.in_([BillStatus.DETECTED, BillStatus.READY]),
+            BillInstance.amount_due.isnot(None),
+            BillInstance.due_date.isnot(None)
+        ).all()
+        
+        if not open_bills:
+            logger.info("No open bills to reconcile")
+            return stats
+        
+        payload = {
+            "source": "billbrain",
+            "bills": [
+                {
+                    "id": str(bill.id),
+                    "vendor": bill.entity.vendor_normalized if bill.entity else None,
+                    "amount": bill.amount_due,
+                    "due_date": bill.due_date.isoformat()[:10]
+                }
+                for bill in open_bills
+            ]
+        }
+        
+        try:
+            response = requests.post(
+                f"{self.api_url}/api/financial/reconcile/external",
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=60
+            )
+        except requests.exceptions.ConnectionError:
+            logger.error(f"Cannot connect to Second Brain API at {self.api_url}")
+            return stats
+        
+        if response.status_code != 200:
+            logger.error(f"Reconcile API error {response.status_code}: {response.text}")
+            return stats
+        
+        result = response.json()
+        by_id = {str(bill.id): bill for bill in open_bills}
+        for match in result.get("auto_matched", []) + result.get("confirmed", []):
+            bill = by_id.get(str(match["bill_ref"]))
+            if bill:
+                bill.status = BillStatus.PAID
+                stats["paid"] += 1
+        
+        session.commit()
+        
+        stats["review"] = result.get("review", [])
+        stats["unmatched"] = result.get("unmatched", 0)
+        logger.info(f"Reconciliation: {stats['paid']} paid, {len(stats['review'])} for review, {stats['unmatched']} unmatched")
+        return stats
+    
     def sync_all(self, session, ActionItem, ActionStatus, Bill=None, BillStatus=None) -> Dict[str, Any]:
         """
         Sync all approved items (actions and bills) to Second Brain.
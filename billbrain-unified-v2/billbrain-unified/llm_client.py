@@ -4,18 +4,119 @@ Detects TWO distinct categories:
 1. BILLS - financial obligations (keep existing handling with amounts, vendors, reconciliation)
 2. ACTIONS - other emails requiring a task/response (sync to Second Brain)
 """
+import os
+import re
 import requests
 import json
 import logging
-from typing import Dict, Any, List
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Any, Iterator, List
+
+from json_stream import JSONStreamParser
 
 # --- Configuration ---
-OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 DEFAULT_MODEL = "qwen2.5:14b" 
+# Fixed context window; changing num_ctx between calls makes Ollama reload the model
+NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "16384"))
+# Response room reserved per email in a batch (one classification object each)
+OUTPUT_TOKENS_PER_EMAIL = 200
+MAX_BODY_CHARS = 3000
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Recent LLM calls (stage, tokens, latency) for /api/llm/traces
+TRACE_BUFFER_SIZE = 500
+traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+# Where quoted history or a signature starts; everything after is dropped
+_CUT_RE = re.compile(r"^(?:On .{0,200} wrote:$|-----\s*Original Message\s*-----|From: .+ Sent: |--$)", re.I)
+# Lines carrying a money amount are content (a receipt's charge), never footer
+_AMOUNT_RE = re.compile(r"[$€£¥]\s?\d|\d[\d,]*\.\d{2}\b")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count (~4 chars per word piece, 1 per symbol)."""
+    return sum(-(-len(p) // 4) if p[0].isalnum() or p[0] == "_" else 1 for p in _PIECE_RE.findall(text))
+
+
+def _clean_body(body: str) -> List[str]:
+    """Lines of an email minus quoted replies and signatures, whitespace collapsed."""
+    lines = []
+    for line in (body or "").splitlines():
+        line = " ".join(line.split())
+        if _CUT_RE.match(line):
+            break
+        if line.startswith(">"):
+            continue
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _footer_start(lines: List[str]) -> int:
+    """Index where the email's trailing block (after its last blank line) starts."""
+    for i in range(len(lines) - 1, -1, -1):
+        if not lines[i]:
+            return i + 1
+    return len(lines)
+
+
+def compact_bodies(bodies: List[str]) -> List[str]:
+    """Drop quoted replies and signatures, collapse whitespace, and keep only
+    the first copy of shared footer lines.
+
+    A footer line is a long line (no money amount) that sits in the trailing
+    block of every email containing it, or that occurs in every email of the
+    batch. Later copies are dropped from trailing blocks only, never from the
+    body of an email.
+    """
+    cleaned = [_clean_body(body) for body in bodies]
+    starts = [_footer_start(lines) for lines in cleaned]
+    counts, tail_counts = Counter(), Counter()
+    for lines, start in zip(cleaned, starts):
+        keys = {line.lower() for line in lines if len(line) > 30}
+        counts.update(keys)
+        tail_counts.update(keys & {line.lower() for line in lines[start:]})
+    footer = {key for key, n in counts.items()
+              if n > 1 and not _AMOUNT_RE.search(key) and (tail_counts[key] == n or n == len(bodies))}
+    
+    seen = set()
+    compacted = []
+    for lines, start in zip(cleaned, starts):
+        kept = []
+        for i, line in enumerate(lines):
+            key = line.lower()
+            if key in footer:
+                if i >= start and key in seen:
+                    continue
+                seen.add(key)
+            kept.append(line)
+        compacted.append("\n".join(kept).strip())
+    return compacted
+
+
+def fit_bodies(bodies: List[str], budget_tokens: int) -> List[str]:
+    """Truncate bodies to share the token budget; short emails leave their
+    unused share to longer ones."""
+    limits = [MAX_BODY_CHARS] * len(bodies)
+    remaining = budget_tokens
+    order = sorted(range(len(bodies)), key=lambda i: len(bodies[i]))
+    for n, i in enumerate(order):
+        share = remaining // (len(bodies) - n)
+        needed = estimate_tokens(bodies[i][:MAX_BODY_CHARS])
+        if needed > share:
+            limits[i] = max(200, len(bodies[i][:MAX_BODY_CHARS]) * share // max(needed, 1))
+            needed = share
+        remaining -= needed
+    return [body[:limit] for body, limit in zip(bodies, limits)]
+
 
 class LLMClient:
     def __init__(self, model: str = DEFAULT_MODEL):
@@ -30,9 +131,13 @@ class LLMClient:
             "system": system_prompt,
             "stream": False
         }
-        return self._send_request(payload)
+        return self._send_request(payload, stage="query")
 
     def extract_batch(self, emails_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """All classifications for a batch; see extract_batch_stream."""
+        return list(self.extract_batch_stream(emails_list))
+
+    def extract_batch_stream(self, emails_list: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
         """
         Process emails and classify into THREE categories:
         1. BILL - financial obligation (vendor, amount, due date)
@@ -41,14 +146,11 @@ class LLMClient:
         
         Bills get full extraction for reconciliation.
         Actions become tasks in Second Brain.
+        
+        Streams the response and yields each email's classification as soon
+        as the model closes it, so callers can file it while the rest of the
+        batch is still generating.
         """
-        context_block = ""
-        for i, mail in enumerate(emails_list):
-            context_block += f"--- EMAIL INDEX: {i} ---\n"
-            context_block += f"Subject: {mail.get('subject')}\n"
-            context_block += f"From: {mail.get('sender', 'Unknown')}\n"
-            context_block += f"Body:\n{mail.get('body', '')[:3000]}\n\n"
-
         system_prompt = """You are an email triage AI. Classify each email into exactly ONE category.
 
 === CATEGORY: BILL ===
@@ -145,39 +247,54 @@ For IGNORE:
 
 Return a JSON array with one object per email."""
 
+        # Fit the bodies to what's left of the window after instructions, headers and the response
+        bodies = compact_bodies([mail.get('body', '') for mail in emails_list])
+        headers = [f"--- EMAIL INDEX: {i} ---\nSubject: {mail.get('subject')}\nFrom: {mail.get('sender', 'Unknown')}\n"
+                   for i, mail in enumerate(emails_list)]
+        overhead = estimate_tokens(system_prompt) + sum(estimate_tokens(h) + 4 for h in headers) + 20
+        budget = NUM_CTX - overhead - OUTPUT_TOKENS_PER_EMAIL * len(emails_list)
+        bodies = fit_bodies(bodies, max(budget, 0))
+
+        context_block = ""
+        for header, body in zip(headers, bodies):
+            context_block += f"{header}Body:\n{body}\n\n"
+
         prompt = f"Classify these {len(emails_list)} emails:\n\n{context_block}"
+        estimated = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+        if estimated > NUM_CTX - OUTPUT_TOKENS_PER_EMAIL * len(emails_list):
+            logger.warning(f"Batch of {len(emails_list)} emails (~{estimated} tokens) leaves little room "
+                           f"for the response in num_ctx={NUM_CTX}; use a smaller batch_size")
 
         payload = {
             "model": self.model,
             "prompt": prompt,
             "system": system_prompt,
             "format": "json",
-            "stream": False,
+            "stream": True,
             "temperature": 0.1,
             "options": {
-                "num_ctx": 16384,
+                "num_ctx": NUM_CTX,
                 "top_p": 0.9
             }
         }
 
         logger.info(f"🧠 Processing batch of {len(emails_list)} emails...")
-        response_text = self._send_request(payload)
-        
+        parser = JSONStreamParser()
+        yielded = 0
         try:
-            results = json.loads(response_text)
-            
-            # Handle if LLM wraps in a container object
-            if isinstance(results, dict):
-                for val in results.values():
-                    if isinstance(val, list): 
-                        return val
-                return [results]
-            
-            return results if isinstance(results, list) else []
-            
-        except json.JSONDecodeError:
-            logger.error(f"❌ JSON parse failed. Raw: {response_text[:500]}")
-            return []
+            for chunk in self._stream_request(payload, stage="extract_batch", estimated_prompt_tokens=estimated):
+                # Elements of a top-level array, or of a list the model wrapped in an object
+                for _, result in parser.feed(chunk):
+                    if isinstance(result, dict):
+                        yielded += 1
+                        yield result
+            if not yielded and parser.done:
+                # A single classification object rather than a list
+                result = parser.value()
+                if isinstance(result, dict) and "item_type" in result:
+                    yield result
+        except ValueError as e:
+            logger.error(f"❌ JSON parse failed after {yielded} results: {e}")
 
     def refine_action(self, action_text: str, email_context: str) -> Dict[str, Any]:
         """
@@ -210,7 +327,7 @@ Break this down into a clear task with an easy first step."""
             "temperature": 0.2
         }
 
-        response_text = self._send_request(payload)
+        response_text = self._send_request(payload, stage="refine_action")
         try:
             return json.loads(response_text)
         except json.JSONDecodeError:
@@ -221,15 +338,84 @@ Break this down into a clear task with an easy first step."""
                 "needs_clarification": False
             }
 
-    def _send_request(self, payload: dict) -> str:
+    def _send_request(self, payload: dict, stage: str = "query", estimated_prompt_tokens: int = None) -> str:
+        trace = self._new_trace(payload, stage, estimated_prompt_tokens)
+        start = time.perf_counter()
         try:
             response = requests.post(self.api_url, json=payload, timeout=120)
             response.raise_for_status()
             data = response.json()
+            trace["prompt_tokens"] = data.get("prompt_eval_count", 0)
+            trace["completion_tokens"] = data.get("eval_count", 0)
             return data.get("response", "")
         except requests.exceptions.RequestException as e:
+            trace["status"] = "error"
             logger.error(f"Ollama API Error: {e}")
             return ""
+        finally:
+            trace["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            traces.append(trace)
+            logger.info(f"⏱️ LLM {stage}: {trace['latency_ms']} ms, "
+                        f"{trace['prompt_tokens']}+{trace['completion_tokens']} tokens ({trace['status']})")
+
+    def _stream_request(self, payload: dict, stage: str, estimated_prompt_tokens: int = None) -> Iterator[str]:
+        """Yield response text chunks from a streaming /api/generate call."""
+        trace = self._new_trace(payload, stage, estimated_prompt_tokens)
+        start = time.perf_counter()
+        try:
+            with requests.post(self.api_url, json=payload, timeout=120, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("done"):
+                        trace["prompt_tokens"] = data.get("prompt_eval_count", 0)
+                        trace["completion_tokens"] = data.get("eval_count", 0)
+                    if data.get("response"):
+                        yield data["response"]
+        except requests.exceptions.RequestException as e:
+            trace["status"] = "error"
+            logger.error(f"Ollama API Error: {e}")
+        finally:
+            trace["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            traces.append(trace)
+            logger.info(f"⏱️ LLM {stage}: {trace['latency_ms']} ms, "
+                        f"{trace['prompt_tokens']}+{trace['completion_tokens']} tokens ({trace['status']})")
+
+    @staticmethod
+    def _new_trace(payload: dict, stage: str, estimated_prompt_tokens: int = None) -> Dict[str, Any]:
+        if estimated_prompt_tokens is None:
+            estimated_prompt_tokens = estimate_tokens(payload.get("system", "")) + estimate_tokens(payload["prompt"])
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "stage": stage,
+            "model": payload.get("model"),
+            "estimated_prompt_tokens": estimated_prompt_tokens,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "status": "ok"
+        }
+
+
+def get_trace_stats() -> Dict[str, Any]:
+    """Totals per stage over the buffered calls."""
+    stages: Dict[str, Dict[str, Any]] = {}
+    for t in traces:
+        s = stages.setdefault(t["stage"], {"calls": 0, "errors": 0, "estimated_prompt_tokens": 0,
+                                           "max_prompt_tokens": 0, "prompt_tokens": 0,
+                                           "completion_tokens": 0, "total_latency_ms": 0.0})
+        s["calls"] += 1
+        s["errors"] += t["status"] == "error"
+        s["estimated_prompt_tokens"] += t["estimated_prompt_tokens"]
+        s["max_prompt_tokens"] = max(s["max_prompt_tokens"], t["prompt_tokens"] or t["estimated_prompt_tokens"])
+        s["prompt_tokens"] += t["prompt_tokens"]
+        s["completion_tokens"] += t["completion_tokens"]
+        s["total_latency_ms"] += t["latency_ms"]
+    for s in stages.values():
+        s["avg_latency_ms"] = round(s["total_latency_ms"] / s["calls"], 1)
+        s["total_latency_ms"] = round(s["total_latency_ms"], 1)
+    return stages
 
 
 # --- Test ---
@@ -144,6 +144,22 @@ def ignore_bill(bill_id: str):
     return {"status": "ok", "message": "Bill ignored"}
 
 
+@app.post("/api/bills/reconcile")
+def reconcile_bills():
+    """Match open bills to bank transactions imported in Second Brain."""
+    session = get_session(engine)
+    
+    stats = second_brain.reconcile_bills(session, BillInstance, BillStatus)
+    session.close()
+    
+    return {
+        "status": "ok",
+        "paid": stats["paid"],
+        "review": stats["review"],
+        "unmatched": stats["unmatched"]
+    }
+
+
 # --- Action Endpoints ---
 
 @app.get("/api/actions", response_model=List[ActionResponse])
@@ -295,6 +311,17 @@ def get_stats():
     }
 
 
+@app.get("/api/llm/traces")
+def get_llm_traces(limit: int = 50):
+    """Recent LLM calls and per-stage totals."""
+    from llm_client import traces, get_trace_stats
+    
+    return {
+        "traces": list(reversed(traces))[:limit],
+        "by_stage": get_trace_stats()
+    }
+
+
 # --- Ingestion Trigger ---
 
 @app.post("/api/ingest")
@@ -81,7 +81,7 @@ def process_bill(session, res: dict, mail_data: dict, evidence: Evidence):
 
 
 def process_action(session, res: dict, mail_data: dict, evidence: Evidence):
-    """Create ActionItem from extraction."""
+    """Create ActionItem from extraction; refine_action_item() fills in the first step."""
     action_text = res.get("action_required", "Review email")
     
     # Map priority
@@ -92,13 +92,11 @@ def process_action(session, res: dict, mail_data: dict, evidence: Evidence):
     }
     priority = priority_map.get(res.get("priority", "medium"), ActionPriority.medium)
     
-    # Get ADHD-friendly refinement
     context = res.get("context", mail_data.get("body", "")[:500])
-    refined = llm.refine_action(action_text, context)
     
     # Create action item
     new_action = ActionItem(
-        action_required=refined.get("refined_action", action_text),
+        action_required=action_text,
         sender_name=res.get("sender_name", mail_data.get("sender", "Unknown")),
         sender_email=mail_data.get("sender"),
         subject=res.get("subject", mail_data.get("subject")),
@@ -109,10 +107,8 @@ def process_action(session, res: dict, mail_data: dict, evidence: Evidence):
         email_snippet=mail_data.get("body", "")[:500],
         status=ActionStatus.PENDING,
         evidence_id=evidence.id,
-        first_step=refined.get("first_step"),
-        estimated_minutes=refined.get("estimated_minutes", 15),
-        needs_clarification=refined.get("needs_clarification", False),
-        clarification_questions=refined.get("questions") if refined.get("needs_clarification") else None
+        estimated_minutes=15,
+        needs_clarification=False
     )
     session.add(new_action)
     
@@ -122,6 +118,16 @@ def process_action(session, res: dict, mail_data: dict, evidence: Evidence):
     return new_action
 
 
+def refine_action_item(action: ActionItem):
+    """Apply the ADHD-friendly refinement (clear task, tiny first step) to an action."""
+    refined = llm.refine_action(action.action_required, action.context or "")
+    action.action_required = refined.get("refined_action", action.action_required)
+    action.first_step = refined.get("first_step")
+    action.estimated_minutes = refined.get("estimated_minutes", 15)
+    action.needs_clarification = refined.get("needs_clarification", False)
+    action.clarification_questions = refined.get("questions") if refined.get("needs_clarification") else None
+
+
 def run_ingestion_loop(limit: int = 999999, batch_size: int = 5):
     """
     Main ingestion loop:
@@ -165,15 +171,12 @@ def run_ingestion_loop(limit: int = 999999, batch_size: int = 5):
         batch_num = i // batch_size + 1
         print(f"🧠 Batch {batch_num}: Processing {len(chunk)} emails...")
         
-        # LLM batch classification
-        results = llm.extract_batch(chunk)
-        
-        if not results:
-            print(f"⚠️ Warning: Batch {batch_num} returned no results")
-            continue
-        
-        # 4. Process each result
-        for res in results:
+        # LLM batch classification, streamed; 4. each result is processed as soon as it arrives
+        handled = 0
+        # Refined after the stream closes; a call made mid-stream only queues behind it in Ollama
+        actions = []
+        for res in llm.extract_batch_stream(chunk):
+            handled += 1
             try:
                 idx = res.get('index')
                 if idx is None or idx >= len(chunk):
@@ -203,7 +206,7 @@ def run_ingestion_loop(limit: int = 999999, batch_size: int = 5):
                     stats["bills"] += 1
                     
                 elif item_type == "action":
-                    process_action(session, res, mail_data, evidence)
+                    actions.append(process_action(session, res, mail_data, evidence))
                     stats["actions"] += 1
                     
                 else:  # ignore
@@ -217,6 +220,16 @@ def run_ingestion_loop(limit: int = 999999, batch_size: int = 5):
                 logger.error(f"⚠️ Error processing index {res.get('index')}: {e}")
                 stats["errors"] += 1
         
+        if not handled:
+            print(f"⚠️ Warning: Batch {batch_num} returned no results")
+            continue
+        
+        for action in actions:
+            try:
+                refine_action_item(action)
+            except Exception as e:
+                logger.error(f"⚠️ Error refining action '{action.action_required[:50]}': {e}")
+        
         # Commit after each batch
         session.commit()
         print(f"   ✓ Batch {batch_num} committed\n")
@@ -0,0 +1,4 @@
+"""Synthetic data generator and benchmark suites for the hot service paths.
+    
+    python -m benchmarks --scale 10k
+"""
@@ -0,0 +1,91 @@
+"""Run the benchmark suites against generated data.
+    
+    python -m benchmarks --scale 1k --scale 10k
+    python -m benchmarks --scale 100k --only generate_plan --runs 5
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def run_scale(scale: str, runs: int, only: list, keep: bool):
+    """Generate one scale and time each suite. Runs in its own process."""
+    tmp_dir = tempfile.mkdtemp(prefix=f"bench_{scale}_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    # Services bind settings.sqlite_db_path at import time
+    os.environ["SQLITE_DB_PATH"] = db_path
+    os.environ.setdefault("VAULT_WATCH_ENABLED", "false")
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    from benchmarks.generator import SCALES, generate
+    from benchmarks.suites import SUITES, Skip
+    
+    start = time.perf_counter()
+    counts = generate(db_path, SCALES[scale])
+    print(f"\n== {scale}: " + ", ".join(f"{v} {k}" for k, v in counts.items())
+          + f" (generated in {time.perf_counter() - start:.1f}s)")
+    print(f"{'suite':<24} {'median':>10} {'p95':>10} {'min':>10}")
+    
+    for name, (suite, units, unit) in SUITES.items():
+        if only and name not in only:
+            continue
+        try:
+            fn = suite(counts)
+        except Skip as e:
+            print(f"{name:<24} skipped: {e}")
+            continue
+        fn()  # warm-up
+        timings = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000 / units)
+        timings.sort()
+        p95 = timings[int(0.95 * (len(timings) - 1))]
+        print(f"{name:<24} {statistics.median(timings):>8.3f}ms {p95:>8.3f}ms {timings[0]:>8.3f}ms"
+              + (f"  per {unit}" if units > 1 else ""))
+    
+    if keep:
+        print(f"database kept at {db_path}")
+    else:
+        shutil.rmtree(tmp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot service paths on synthetic data.")
+    parser.add_argument("--scale", action="append", choices=["1k", "10k", "100k"],
+                        help="data scale; repeat for several (default: 1k and 10k)")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--only", action="append", default=[], help="suite name; repeatable")
+    parser.add_argument("--keep", action="store_true", help="keep the generated database")
+    parser.add_argument("--in-process", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    scales = args.scale or ["1k", "10k"]
+    
+    if args.in_process:
+        run_scale(scales[0], args.runs, args.only, args.keep)
+        return
+    
+    # One process per scale so every run imports services against its own database
+    for scale in scales:
+        cmd = [sys.executable, "-m", "benchmarks", "--in-process", "--scale", scale, "--runs", str(args.runs)]
+        cmd += [arg for name in args.only for arg in ("--only", name)]
+        if args.keep:
+            cmd.append("--keep")
+        subprocess.run(cmd, check=True, cwd=Path(__file__).resolve().parent.parent)
+
+
+if __name__ == "__main__":
+    main()
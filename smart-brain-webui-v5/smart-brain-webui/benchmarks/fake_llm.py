@@ -0,0 +1,447 @@
+"""Stand-in LLM server for offline load tests.
+
+Speaks enough of the Ollama API (/api/chat, /api/generate, /api/tags) and
+Azure OpenAI chat completions for OllamaClient, AzureOpenAIClient and
+BillBrain's LLMClient to run unchanged against it:
+
+    python -m benchmarks.fake_llm --port 11434 --latency lognormal:800,0.5 --error-rate 0.02
+    OLLAMA_HOST=http://127.0.0.1:11434 AZURE_OPENAI_ENDPOINT=http://127.0.0.1:11434 ...
+
+Responses come from fixtures (regex on the prompt, first match wins) and
+then from built-in responders that recognise this repo's prompts and answer
+with well-formed JSON derived from the prompt text, so pipelines do real
+downstream work. Latency is a sampled time-to-first-token plus a per-token
+generation rate; streaming requests get the tokens incrementally.
+
+GET /__fake/stats returns request counters; POST /__fake/config changes the
+latency and error settings of a running server.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+MODELS = ["qwen2.5:14b", "qwen2.5:7b", "llama3.1:8b", "mistral:7b"]
+
+ACTION_VERBS = {"need", "should", "must", "talk", "create", "fix", "send", "call", "email", "review",
+                "schedule", "prepare", "update", "pay", "draft", "follow", "ask", "book", "check"}
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour knobs; all of them can be changed at runtime via /__fake/config."""
+    latency: str = "fixed:0"            # time to first token, see sample_latency()
+    tokens_per_second: float = 0.0      # 0 = the whole completion arrives at once
+    error_rate: float = 0.0             # fraction of requests answered with error_status
+    error_status: int = 500
+    malformed_rate: float = 0.0         # fraction of completions truncated mid-JSON
+    hang_rate: float = 0.0              # fraction of requests that stall for hang_seconds
+    hang_seconds: float = 130.0
+    seed: Optional[int] = None
+    fixtures: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def sample_latency(spec: str, rnd: random.Random) -> float:
+    """Seconds from a spec such as fixed:200, uniform:100,400, normal:500,100 or lognormal:800,0.5 (ms)."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        ms = values[0] if values else 0.0
+    elif kind == "uniform":
+        ms = rnd.uniform(values[0], values[1])
+    elif kind == "normal":
+        ms = rnd.gauss(values[0], values[1])
+    elif kind == "lognormal":
+        # Median and sigma of the underlying normal: long right tail like real inference
+        ms = rnd.lognormvariate(0, values[1]) * values[0]
+    else:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    return max(ms, 0.0) / 1000
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def split_tokens(text: str) -> List[str]:
+    return re.findall(r"\S+\s*|\s+", text) or [""]
+
+
+# --- Built-in responders ---
+
+def _between(prompt: str, start: str, end: str) -> str:
+    head, _, rest = prompt.partition(start)
+    return rest.partition(end)[0] if rest else ""
+
+
+def _lines(text: str) -> List[str]:
+    return [line.strip(" -*\t") for line in text.splitlines() if line.strip(" -*\t")]
+
+
+def _item_type(line: str) -> str:
+    words = line.lower().split()
+    if "?" in line:
+        return "question"
+    if words and words[0] in ACTION_VERBS:
+        return "task"
+    if words and words[0] in {"decided", "agreed"}:
+        return "decision"
+    if words and words[0] in {"maybe", "could", "might"}:
+        return "idea"
+    return "note"
+
+
+def brain_dump_response(prompt: str) -> Dict[str, Any]:
+    groups, items, group = [], [], None
+    for line in _lines(_between(prompt, "=== RAW BRAIN DUMP ===", "=== END BRAIN DUMP ===")):
+        if line.endswith(":") or (line.isupper() and len(line) < 40):
+            group = line.rstrip(":").strip().title()
+            groups.append({"name": group, "type": "service", "parent": None, "confidence": 0.85,
+                           "reason": "Header in brain dump", "merged_from": [], "items_count": 0,
+                           "integrates_with": []})
+            continue
+        if group is None:
+            group = "General"
+            groups.append({"name": group, "type": "service", "parent": None, "confidence": 0.6,
+                           "reason": "Items without a header", "merged_from": [], "items_count": 0,
+                           "integrates_with": []})
+        groups[-1]["items_count"] += 1
+        items.append({"type": _item_type(line), "text": line, "original": line, "group": group,
+                      "person": None, "priority": "medium", "tags": []})
+    return {
+        "groups": groups, "hierarchy": [], "items": items, "ambiguous": [], "people_mentioned": [],
+        "typos_fixed": [], "garbage_filtered": [],
+        "summary": {"total_raw_lines": len(items) + len(groups), "total_useful_items": len(items),
+                    "garbage_removed": 0, "typos_fixed": 0, "groups_found": len(groups), "groups_merged": 0}
+    }
+
+
+def cluster_response(prompt: str) -> Dict[str, Any]:
+    body = _between(prompt, "---\n", "\n---")
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()] or [body.strip() or "Empty"]
+    return {"clusters": [
+        {"title": _lines(p)[0][:60] if _lines(p) else f"Topic {i + 1}", "content": p,
+         "type": "Note", "keywords": sorted(set(re.findall(r"[a-z]{5,}", p.lower())))[:5]}
+        for i, p in enumerate(paragraphs)
+    ]}
+
+
+def task_extraction_response(prompt: str) -> Dict[str, Any]:
+    body = _between(prompt, "---\n", "\n---")
+    return {"tasks": [
+        {"action": line[0].upper() + line[1:], "original_text": line, "context": "", "is_ambiguous": False,
+         "priority": "medium", "estimated_duration_minutes": 30}
+        for line in _lines(body) if _item_type(line) == "task"
+    ]}
+
+
+def routing_response(prompt: str) -> Dict[str, Any]:
+    domains = re.findall(r"^- ([\w/.-]+):", _between(prompt, "Available domains:", "Note:"), re.M)
+    note = _between(prompt, "Note:", "Output JSON:").lower()
+    chosen = next((d for d in domains if d.split("/")[-1] in note), domains[0] if domains else "personal")
+    return {"domain": chosen, "confidence": 0.8, "reasoning": "Fake backend routing"}
+
+
+def batch_routing_response(prompt: str) -> Dict[str, Any]:
+    domains = re.findall(r"^- ([\w/.-]+):", _between(prompt, "Available domains:", "Notes:"), re.M)
+    results = []
+    for index, block in re.findall(r"^\[(\d+)\] (.*?)(?=^\[\d+\] |^Output JSON|\Z)", prompt, re.S | re.M):
+        chosen = next((d for d in domains if d.split("/")[-1] in block.lower()), domains[0] if domains else "personal")
+        results.append({"index": int(index), "domain": chosen, "confidence": 0.8, "reasoning": "Fake backend routing"})
+    return {"results": results}
+
+
+def project_response(prompt: str) -> Dict[str, Any]:
+    projects = re.findall(r"^- (.+?):", _between(prompt, "Available projects in", "If it clearly"), re.M)
+    if projects:
+        return {"project": projects[0], "confidence": 0.75}
+    return {"project": None, "new_project": "New Project", "confidence": 0.0}
+
+
+def email_triage_response(prompt: str) -> List[Dict[str, Any]]:
+    results = []
+    for index, block in re.findall(r"--- EMAIL INDEX: (\d+) ---\n(.*?)(?=--- EMAIL INDEX:|\Z)", prompt, re.S):
+        subject = _between(block, "Subject:", "\n").strip()
+        amount = re.search(r"\$\s?([\d,]+(?:\.\d{2})?)", block)
+        if amount:
+            results.append({"index": int(index), "item_type": "bill", "vendor": (subject.split()[0] if subject else "VENDOR").upper(),
+                            "amount_due": float(amount.group(1).replace(",", "")), "due_date": None,
+                            "urgency": "medium", "is_autopay": False})
+        else:
+            results.append({"index": int(index), "item_type": "action", "action": f"Reply to: {subject}",
+                            "priority": "medium", "deadline": None})
+    return results
+
+
+BUILT_IN = [
+    ("=== RAW BRAIN DUMP ===", brain_dump_response),
+    ("Break this brain dump into distinct topics", cluster_response),
+    ("Assign this note to the correct PARA domain", routing_response),
+    ("Assign each note below to the correct PARA domain", batch_routing_response),
+    ("which project does it belong to", project_response),
+    ("--- EMAIL INDEX:", email_triage_response),
+    ('"tasks": [', task_extraction_response),
+    ("What project or initiative", lambda prompt: "General Project"),
+]
+
+
+def respond(prompt: str, fixtures: List[Dict[str, Any]], wants_json: bool) -> str:
+    """Completion text for a prompt: fixtures first, then built-ins, then a generic answer."""
+    for fixture in fixtures:
+        if re.search(fixture["match"], prompt, re.S):
+            response = fixture["response"]
+            return response if isinstance(response, str) else json.dumps(response)
+    for marker, responder in BUILT_IN:
+        if marker in prompt:
+            response = responder(prompt)
+            return response if isinstance(response, str) else json.dumps(response)
+    return "{}" if wants_json else "ok"
+
+
+# --- Server ---
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeLLMServer"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/api/tags":
+            self._send_json({"models": [
+                {"name": m, "model": m, "modified_at": "2024-01-01T00:00:00Z", "size": 4_000_000_000,
+                 "digest": f"fake-{i}", "details": {"format": "gguf", "family": m.split(":")[0]}}
+                for i, m in enumerate(self.server.models)
+            ]})
+        elif path == "/__fake/stats":
+            self._send_json(self.server.stats_snapshot())
+        elif path in ("/", "/api/version"):
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+    
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        body = self._read_json()
+        if path == "/__fake/config":
+            self.server.update_config(body)
+            self._send_json(asdict(self.server.config))
+            return
+        
+        if path == "/api/chat":
+            api, prompt = "ollama_chat", "\n".join(m.get("content", "") for m in body.get("messages", []))
+            wants_json = body.get("format") == "json"
+            stream = body.get("stream", True)
+        elif path == "/api/generate":
+            api, prompt = "ollama_generate", f"{body.get('system') or ''}\n{body.get('prompt', '')}"
+            wants_json = body.get("format") == "json"
+            stream = body.get("stream", True)
+        elif re.fullmatch(r"/openai/deployments/[^/]+/chat/completions", path):
+            api, prompt = "azure_chat", "\n".join(m.get("content", "") for m in body.get("messages", []))
+            wants_json = "JSON" in prompt
+            stream = body.get("stream", False)
+        else:
+            self._send_json({"error": f"unknown endpoint {path}"}, 404)
+            return
+        
+        config, rnd = self.server.config, self.server.rnd
+        with self.server.lock:
+            error, malformed, hang = (rnd.random() < config.error_rate, rnd.random() < config.malformed_rate,
+                                      rnd.random() < config.hang_rate)
+            delay = sample_latency(config.latency, rnd)
+        self.server.record(api, "hang" if hang else "error" if error else "ok")
+        
+        if hang:
+            time.sleep(config.hang_seconds)
+        time.sleep(delay)
+        if error:
+            self._send_json({"error": {"message": "injected failure", "code": config.error_status}}, config.error_status)
+            return
+        
+        text = respond(prompt, config.fixtures, wants_json)
+        if malformed:
+            text = text[:max(1, len(text) // 2)]
+        usage = (count_tokens(prompt), count_tokens(text))
+        model = body.get("model") or (path.split("/")[3] if api == "azure_chat" else MODELS[0])
+        
+        if stream:
+            self._stream(api, model, text, usage)
+        else:
+            if config.tokens_per_second:
+                time.sleep(usage[1] / config.tokens_per_second)
+            self._send_json(self._payload(api, model, text, usage, delay))
+    
+    def _payload(self, api: str, model: str, text: str, usage: Tuple[int, int], delay: float) -> Dict[str, Any]:
+        if api == "azure_chat":
+            return {
+                "id": f"chatcmpl-fake-{int(time.time() * 1000)}", "object": "chat.completion",
+                "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)},
+            }
+        payload = {
+            "model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": True,
+            "done_reason": "stop", "total_duration": int(delay * 1e9), "prompt_eval_count": usage[0],
+            "eval_count": usage[1],
+        }
+        if api == "ollama_chat":
+            payload["message"] = {"role": "assistant", "content": text}
+        else:
+            payload["response"] = text
+        return payload
+    
+    def _stream(self, api: str, model: str, text: str, usage: Tuple[int, int]):
+        azure = api == "azure_chat"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if azure else "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        pause = 1 / self.server.config.tokens_per_second if self.server.config.tokens_per_second else 0
+        for token in split_tokens(text):
+            if azure:
+                chunk = {"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            elif api == "ollama_chat":
+                chunk = {"model": model, "message": {"role": "assistant", "content": token}, "done": False}
+            else:
+                chunk = {"model": model, "response": token, "done": False}
+            self._write_chunk(chunk, azure)
+            if pause:
+                time.sleep(pause)
+        
+        if azure:
+            self._write_chunk({"object": "chat.completion.chunk", "model": model,
+                               "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}, azure)
+            self._write_raw(b"data: [DONE]\n\n")
+        else:
+            final = self._payload(api, model, "", usage, 0)
+            if api == "ollama_chat":
+                final["message"] = {"role": "assistant", "content": ""}
+            self._write_chunk(final, azure)
+        self._write_raw(b"")
+    
+    def _write_chunk(self, chunk: Dict[str, Any], sse: bool):
+        line = json.dumps(chunk)
+        self._write_raw((f"data: {line}\n\n" if sse else f"{line}\n").encode())
+    
+    def _write_raw(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+    
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            return {}
+    
+    def _send_json(self, payload: Any, status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Threaded fake backend; use start()/stop() to run it inside another process."""
+    
+    daemon_threads = True
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 11434, config: Optional[FakeConfig] = None,
+                 models: Optional[List[str]] = None):
+        super().__init__((host, port), FakeLLMHandler)
+        self.config = config or FakeConfig()
+        self.models = models or MODELS
+        self.rnd = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def record(self, api: str, outcome: str):
+        with self.lock:
+            counts = self.stats.setdefault(api, {"ok": 0, "error": 0, "hang": 0})
+            counts[outcome] += 1
+    
+    def stats_snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"requests": {api: dict(c) for api, c in self.stats.items()}, "config": asdict(self.config)}
+    
+    def update_config(self, changes: Dict[str, Any]):
+        with self.lock:
+            for key, value in changes.items():
+                if hasattr(self.config, key):
+                    setattr(self.config, key, value)
+            if "latency" in changes:
+                sample_latency(self.config.latency, self.rnd)  # validate now, not on the next request
+            if changes.get("seed") is not None:
+                self.rnd.seed(changes["seed"])
+    
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama / Azure OpenAI server for offline load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="time to first token in ms: fixed:200, uniform:100,400, normal:500,100, lognormal:800,0.5")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=130.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--fixtures", help='JSON file: [{"match": "regex", "response": "text" | {...}}]')
+    args = parser.parse_args()
+    
+    fixtures = []
+    if args.fixtures:
+        with open(args.fixtures, encoding="utf-8") as f:
+            fixtures = json.load(f)
+    config = FakeConfig(
+        latency=args.latency, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+        error_status=args.error_status, malformed_rate=args.malformed_rate, hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds, seed=args.seed, fixtures=fixtures
+    )
+    sample_latency(config.latency, random.Random())
+    
+    server = FakeLLMServer(args.host, args.port, config)
+    print(f"fake LLM listening on {server.url} (latency {config.latency}, errors {config.error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Deterministic synthetic data for benchmarks.
+
+generate() builds a scratch SQLite database with the production schema and
+fills it with notes, tasks (open and completed history), domains, a project
+hierarchy, bills, subscriptions and loans. The same seed and scale always
+produce the same rows, so timings are comparable across commits.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+
+from scripts.init_database import (
+    init_database, add_projects_table, add_email_task_support, add_financial_tables
+)
+from src.storage.database import connect
+
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+DOMAINS = [
+    ("work/marriott", "Marriott", "blue", 60, "consent,privacy,dpo,vendor,audit"),
+    ("work/konstellate", "Konstellate", "purple", 20, "deploy,api,roadmap,sprint,release"),
+    ("personal", "Personal", "green", 10, "family,gym,doctor,house,trip"),
+    ("learning", "Learning", "yellow", 5, "course,book,paper,rust,notes"),
+    ("admin", "Admin", "gray", 5, "invoice,tax,insurance,bank,renewal"),
+]
+
+WORDS = [
+    "sync", "budget", "review", "deploy", "consent", "roadmap", "invoice", "meeting", "draft", "api",
+    "vendor", "audit", "release", "family", "tax", "course", "privacy", "sprint", "doctor", "renewal",
+]
+VERBS = ["Review", "Draft", "Email", "Call", "Fix", "Schedule", "Prepare", "Update", "Pay", "Read"]
+
+
+def _sentence(rnd: random.Random, n: int) -> str:
+    return " ".join(rnd.choices(WORDS, k=n))
+
+
+def generate(db_path: str, n: int, seed: int = 42, now: datetime = None) -> Dict[str, int]:
+    """Create db_path and fill it for a scale of n; returns row counts per table.
+    
+    n is the number of tasks; notes match it, projects and bills scale at
+    roughly 1% and completion history covers the last 90 days.
+    """
+    for create in (init_database, add_projects_table, add_email_task_support, add_financial_tables):
+        create(db_path)
+    
+    rnd = random.Random(seed)
+    now = now or datetime.now().replace(microsecond=0)
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_domains (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            domain_path TEXT UNIQUE NOT NULL,
+            display_name TEXT NOT NULL,
+            color TEXT,
+            target_percentage REAL DEFAULT 0,
+            learned_keywords TEXT,
+            active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.executemany("""
+        INSERT INTO user_domains (domain_path, display_name, color, target_percentage, learned_keywords)
+        VALUES (?, ?, ?, ?, ?)
+    """, DOMAINS)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS profile_data (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("INSERT OR REPLACE INTO profile_data (key, value) VALUES ('company', 'Marriott')")
+    
+    domains = [d[0] for d in DOMAINS]
+    keywords = {d[0]: d[4].split(",") for d in DOMAINS}
+    
+    # Projects: top-level per domain with one level of sub-projects
+    n_projects = max(len(domains) * 2, n // 100)
+    project_domains = []
+    for i in range(n_projects):
+        domain = domains[i % len(domains)]
+        parent = None
+        if i >= len(domains) * 2 and rnd.random() < 0.5:
+            # Parent is an earlier project in the same domain
+            parent = rnd.randrange(i % len(domains), i, len(domains)) + 1
+        cursor.execute("""
+            INSERT INTO projects (name, domain, description, status, keywords, parent_project_id, created_at)
+            VALUES (?, ?, ?, 'active', ?, ?, ?)
+        """, (f"Project {i} {rnd.choice(WORDS)}", domain, _sentence(rnd, 8),
+              ",".join(rnd.sample(keywords[domain], 3) + rnd.sample(WORDS, 2)), parent,
+              (now - timedelta(days=rnd.uniform(30, 365))).strftime("%Y-%m-%d %H:%M:%S")))
+        project_domains.append(domain)
+    
+    notes = []
+    for i in range(n):
+        domain = rnd.choice(domains)
+        created = (now - timedelta(days=rnd.uniform(0, 365))).strftime("%Y-%m-%d %H:%M:%S")
+        notes.append((f"Note {i} {rnd.choice(WORDS)}", _sentence(rnd, rnd.randint(20, 120)), domain,
+                      rnd.choice(["Project", "Area", "Note"]), f"{domain}/notes/note-{i}.md", created, created))
+    cursor.executemany("""
+        INSERT INTO notes (title, content, domain, type, file_path, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, notes)
+    
+    # Tasks: ~40% open, the rest completed over the last 90 days
+    tasks = []
+    for i in range(n):
+        project_id = rnd.randrange(n_projects) + 1 if rnd.random() < 0.6 else None
+        domain = project_domains[project_id - 1] if project_id else rnd.choice(domains)
+        action = f"{rnd.choice(VERBS)} {_sentence(rnd, rnd.randint(2, 6))}"
+        created = now - timedelta(days=rnd.uniform(0, 120))
+        completed_at = None
+        status = "open"
+        if rnd.random() < 0.6:
+            status = "completed"
+            completed_at = min(created + timedelta(days=rnd.uniform(0, 30)), now).strftime("%Y-%m-%d %H:%M:%S")
+        elif rnd.random() < 0.05:
+            status = "pending_clarification"
+        metadata = json.dumps({"source": "email"}) if rnd.random() < 0.1 else None
+        tasks.append((f"{action} ({i})", action, status, rnd.choice(["high", "medium", "low"]),
+                      rnd.choice([5, 15, 30, 60, 90, 120]), domain, project_id, metadata,
+                      completed_at, created.strftime("%Y-%m-%d %H:%M:%S")))
+    cursor.executemany("""
+        INSERT INTO tasks (text, action, status, priority, estimated_duration_minutes, domain,
+                           project_id, metadata, completed_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, tasks)
+    
+    today = now.date()
+    n_bills = max(20, n // 50)
+    bills = []
+    for i in range(n_bills):
+        due = today + timedelta(days=rnd.randint(-60, 60))
+        paid = due < today and rnd.random() < 0.8
+        amount = round(rnd.uniform(15, 900), 2)
+        bills.append((f"Bill {i}", amount, due.isoformat(), rnd.choice(["utilities", "medical", "insurance", "other"]),
+                      f"Vendor {i % 40}", "paid" if paid else "pending",
+                      due.isoformat() if paid else None, amount if paid else None, "email"))
+    cursor.executemany("""
+        INSERT INTO bills (name, amount, due_date, category, vendor, status, paid_date, paid_amount, source)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, bills)
+    
+    n_subs = max(10, n // 500)
+    cursor.executemany("""
+        INSERT INTO subscriptions (name, amount, frequency, category, vendor, status, start_date, next_due_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(f"Subscription {i}", round(rnd.uniform(3, 60), 2), rnd.choice(["monthly", "yearly", "weekly"]),
+           "software", f"Vendor {i}", "active" if rnd.random() < 0.8 else "cancelled",
+           (today - timedelta(days=rnd.randint(30, 700))).isoformat(),
+           (today + timedelta(days=rnd.randint(0, 30))).isoformat()) for i in range(n_subs)])
+    
+    n_loans = max(3, n // 5000)
+    cursor.executemany("""
+        INSERT INTO loans (name, lender, loan_type, original_principal, current_balance, interest_rate,
+                           term_months, start_date, monthly_payment, payment_due_day, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'active')
+    """, [(f"Loan {i}", f"Lender {i}", rnd.choice(["auto", "student", "mortgage"]),
+           principal, round(principal * rnd.uniform(0.2, 0.9), 2), round(rnd.uniform(2, 9), 2),
+           rnd.choice([36, 60, 120, 360]), (today - timedelta(days=rnd.randint(100, 2000))).isoformat(),
+           round(principal / 60, 2), rnd.randint(1, 28))
+          for i, principal in enumerate(round(rnd.uniform(5_000, 300_000), 2) for _ in range(n_loans))])
+    
+    conn.commit()
+    counts = {table: cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ("notes", "tasks", "projects", "user_domains", "bills", "subscriptions", "loans")}
+    conn.close()
+    return counts
@@ -0,0 +1,277 @@
+"""Replay a realistic traffic mix against the API and report latency per route.
+
+    python -m benchmarks.load_test --concurrency 20 --duration 60 --report load.json
+    python -m benchmarks.load_test --url http://localhost:8000 --mix dashboard=90,brain_dump=10
+    python -m benchmarks.load_test --compare load-before.json --report load-after.json
+
+Each virtual user loops: pick a scenario by weight, run it, wait an
+exponentially distributed think time. Scenarios:
+
+    dashboard    GET /api/plan/daily, /api/stats/today and /api/tasks together, like the UI poll
+    brain_dump   POST /api/brain-dump/analyze, then /api/brain-dump/save with its result
+    email_batch  POST /api/tasks/from-email/batch with a few BillBrain-style tasks
+
+Without --url the app runs in-process (ASGI, like a single uvicorn worker)
+against a generated database and the fake LLM backend from fake_llm.py.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+
+BRAIN_DUMPS = [
+    "ECMP:\nfix consent banner bug\nwhat about RAG keys?\nreview vendor audit with Chris\n\nPERSONAL:\nbook dentist\npay insurance",
+    "KONSTELLATE:\ndraft roadmap for Q3\nschedule sprint review\nmaybe move api to v2\ndecided to drop legacy sync",
+    "follow up with legal on DPO contract\nsend budget to finance\nnotes from privacy meeting: retention is 90 days",
+]
+EMAIL_SUBJECTS = ["Contract renewal", "Invoice question", "Meeting follow-up", "Audit request", "Access review"]
+
+
+class Recorder:
+    """Latency samples and outcomes per route."""
+    
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+    
+    def add(self, route: str, elapsed_ms: float, status: str, ok: bool):
+        self.samples.setdefault(route, []).append(elapsed_ms)
+        self.errors[route] = self.errors.get(route, 0) + (not ok)
+        counts = self.statuses.setdefault(route, {})
+        counts[status] = counts.get(status, 0) + 1
+    
+    def summary(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            samples = sorted(samples)
+            routes[route] = {
+                "requests": len(samples),
+                "errors": self.errors[route],
+                "error_rate": round(self.errors[route] / len(samples), 4),
+                "throughput_rps": round(len(samples) / duration, 2),
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+                "max_ms": round(samples[-1], 1),
+                "statuses": self.statuses[route],
+            }
+        return routes
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return round(sorted_samples[int(rank) - 1], 1)
+
+
+async def request(client: httpx.AsyncClient, recorder: Recorder, method: str, route: str, url: str,
+                  **kwargs) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.add(f"{method} {route}", (time.perf_counter() - start) * 1000, type(e).__name__, False)
+        return None
+    recorder.add(f"{method} {route}", (time.perf_counter() - start) * 1000, str(response.status_code),
+                 response.status_code < 400)
+    return response
+
+
+# --- Scenarios ---
+
+async def dashboard(client: httpx.AsyncClient, recorder: Recorder, rnd: random.Random):
+    await asyncio.gather(
+        request(client, recorder, "GET", "/api/plan/daily", "/api/plan/daily"),
+        request(client, recorder, "GET", "/api/stats/today", "/api/stats/today"),
+        request(client, recorder, "GET", "/api/tasks", "/api/tasks", params={"status": "open"}),
+    )
+
+
+async def brain_dump(client: httpx.AsyncClient, recorder: Recorder, rnd: random.Random):
+    domain = rnd.choice(["work/marriott", "work/konstellate", "personal"])
+    response = await request(client, recorder, "POST", "/api/brain-dump/analyze", "/api/brain-dump/analyze",
+                             json={"content": rnd.choice(BRAIN_DUMPS), "domain": domain})
+    if response is None or response.status_code >= 400:
+        return
+    analysis = response.json()
+    groups = analysis.get("detected_organization", {}).get("groups", [])
+    await request(client, recorder, "POST", "/api/brain-dump/save", "/api/brain-dump/save", json={
+        "domain": domain,
+        "items": analysis.get("items", []),
+        "organization_choices": {"create_projects": [g["name"] for g in groups]},
+    })
+
+
+async def email_batch(client: httpx.AsyncClient, recorder: Recorder, rnd: random.Random):
+    tasks = [{
+        "action": f"{rnd.choice(['Reply to', 'Review', 'Approve'])} {rnd.choice(EMAIL_SUBJECTS)} #{rnd.randrange(10_000)}",
+        "sender": f"person{rnd.randrange(50)}@example.com",
+        "subject": rnd.choice(EMAIL_SUBJECTS),
+        "priority": rnd.choice(["high", "medium", "low"]),
+        "source_email_id": f"load-{rnd.getrandbits(48):x}",
+    } for _ in range(rnd.randint(2, 8))]
+    await request(client, recorder, "POST", "/api/tasks/from-email/batch", "/api/tasks/from-email/batch",
+                  json={"tasks": tasks})
+
+
+SCENARIOS: Dict[str, Callable] = {"dashboard": dashboard, "brain_dump": brain_dump, "email_batch": email_batch}
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def user(client: httpx.AsyncClient, recorder: Recorder, mix: Dict[str, float], deadline: float,
+               think_ms: float, seed: int):
+    rnd = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await SCENARIOS[rnd.choices(names, weights)[0]](client, recorder, rnd)
+        if think_ms:
+            await asyncio.sleep(rnd.expovariate(1000 / think_ms))
+
+
+async def run(args, mix: Dict[str, float], transport: Optional[httpx.AsyncBaseTransport]) -> Dict[str, Any]:
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=args.url or "http://loadtest", transport=transport,
+                                 timeout=args.timeout) as client:
+        # Warm-up pass so lazy imports and caches don't land in the measurement
+        for name in mix:
+            await SCENARIOS[name](client, Recorder(), random.Random(0))
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            user(client, recorder, mix, start + args.duration, args.think_ms, args.seed + i)
+            for i in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+    
+    routes = recorder.summary(elapsed)
+    total = sum(r["requests"] for r in routes.values())
+    return {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "target": args.url or "in-process",
+            "concurrency": args.concurrency, "duration_s": round(elapsed, 1), "think_ms": args.think_ms,
+            "mix": mix, "scale": None if args.url else args.scale,
+            "llm_latency": None if args.url else args.llm_latency,
+        },
+        "totals": {
+            "requests": total,
+            "errors": sum(r["errors"] for r in routes.values()),
+            "throughput_rps": round(total / elapsed, 2),
+        },
+        "routes": routes,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    meta, totals = report["meta"], report["totals"]
+    print(f"\n{meta['target']} @ {meta['git_revision'] or '?'}: {meta['concurrency']} users, {meta['duration_s']}s, "
+          f"{totals['requests']} requests, {totals['throughput_rps']} req/s, {totals['errors']} errors")
+    print(f"{'route':<36} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50':>9} {'p95':>9} {'p99':>9}"
+          + ("  p95 vs baseline" if baseline else ""))
+    for route, r in report["routes"].items():
+        line = (f"{route:<36} {r['requests']:>6} {r['error_rate'] * 100:>5.1f}% {r['throughput_rps']:>7} "
+                f"{r['p50_ms']:>7}ms {r['p95_ms']:>7}ms {r['p99_ms']:>7}ms")
+        before = (baseline or {}).get("routes", {}).get(route)
+        if before and before["p95_ms"]:
+            line += f"  {(r['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100:+.0f}%"
+        print(line)
+
+
+def setup_in_process(args):
+    """Generated database + fake LLM backend + the ASGI app, all in this process."""
+    from benchmarks.fake_llm import FakeLLMServer, FakeConfig
+    
+    fake = FakeLLMServer(port=0, config=FakeConfig(latency=args.llm_latency, seed=args.seed)).start()
+    scratch = tempfile.mkdtemp(prefix="load_test_")
+    db_path = os.path.join(scratch, "load.db")
+    # Must be set before src is imported: services bind settings at import time.
+    # Both providers point at the fake; generate_json is Azure-only.
+    os.environ.update({
+        "SQLITE_DB_PATH": db_path, "VAULT_PATH": os.path.join(scratch, "vault"), "VAULT_WATCH_ENABLED": "false",
+        "OLLAMA_HOST": fake.url, "AZURE_OPENAI_ENDPOINT": fake.url, "AZURE_OPENAI_API_KEY": "fake",
+    })
+    
+    from loguru import logger
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    
+    from benchmarks.generator import SCALES, generate
+    generate(db_path, SCALES[args.scale])
+    from src.api import app
+    return httpx.ASGITransport(app=app), fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with a realistic traffic mix.")
+    parser.add_argument("--url", help="running server to target (default: in-process app)")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean pause between scenarios per user")
+    parser.add_argument("--mix", default="dashboard=70,brain_dump=20,email_batch=10")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", default="1k", choices=["1k", "10k", "100k"], help="in-process data scale")
+    parser.add_argument("--llm-latency", default="lognormal:800,0.5", help="fake LLM latency (see fake_llm.py)")
+    parser.add_argument("--report", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare p95 against")
+    args = parser.parse_args()
+    
+    mix = parse_mix(args.mix)
+    transport, fake = (None, None) if args.url else setup_in_process(args)
+    try:
+        report = asyncio.run(run(args, mix, transport))
+    finally:
+        if fake:
+            fake.stop()
+    if fake:
+        report["llm_backend"] = fake.stats_snapshot()["requests"]
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark suites.
+
+Each suite takes the generated database's counts and returns a zero-argument
+callable to time, or raises Skip. Services are imported inside the suites
+because they bind settings.sqlite_db_path at import time.
+"""
+
+import asyncio
+import random
+from datetime import datetime
+from typing import Callable, Dict
+
+
+class Skip(Exception):
+    """Suite can't run in this environment."""
+
+
+def list_tasks(counts: Dict[str, int]) -> Callable:
+    from src.api import list_tasks
+    
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(list_tasks(status="open"))
+
+
+def get_domain_hierarchy(counts: Dict[str, int]) -> Callable:
+    from src.api import get_domain_hierarchy
+    
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(get_domain_hierarchy("work/marriott"))
+
+
+def get_today_stats(counts: Dict[str, int]) -> Callable:
+    from src.api import get_today_stats
+    
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(get_today_stats())
+
+
+def generate_plan(counts: Dict[str, int]) -> Callable:
+    from src.services.daily_planning_service import daily_planning_service
+    
+    now = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+    return lambda: daily_planning_service.generate_plan(now=now)
+
+
+def get_financial_summary(counts: Dict[str, int]) -> Callable:
+    from src.services.financial_service import financial_service
+    
+    return lambda: financial_service.get_financial_summary(cached=False)
+
+
+def check_duplicate(counts: Dict[str, int]) -> Callable:
+    try:
+        from src.services.email_task_service import email_task_service
+    except ImportError as e:
+        raise Skip(f"embedding model unavailable ({e})")
+    
+    # Load the model outside the timed region
+    email_task_service.model
+    return lambda: email_task_service._check_duplicate("Review vendor consent audit draft")
+
+
+def project_keyword_match(counts: Dict[str, int]) -> Callable:
+    from src.services.project_service import project_service
+    
+    projects = project_service.get_all_projects()
+    content = "Need to review the consent audit with the vendor before the sprint release and budget sync"
+    return lambda: project_service._keyword_match(content, projects)
+
+
+def route_keyword_match(counts: Dict[str, int]) -> Callable:
+    from src.models.workflow_state import ClusterNote, NoteType
+    from src.services.domain_service import domain_service
+    from src.services.route_service import route_service
+    from benchmarks.generator import WORDS
+    
+    domains = domain_service.get_all_domains()
+    rnd = random.Random(7)
+    clusters = [
+        ClusterNote(title=f"Cluster {i}", content=" ".join(rnd.choices(WORDS, k=200)),
+                    type=NoteType.NOTE, keywords=rnd.sample(WORDS, 4))
+        for i in range(100)
+    ]
+    
+    def run():
+        for cluster in clusters:
+            route_service._keyword_match(cluster, domains)
+    return run
+
+
+# name -> (suite, work units per call, unit)
+SUITES = {
+    "list_tasks": (list_tasks, 1, "call"),
+    "get_domain_hierarchy": (get_domain_hierarchy, 1, "call"),
+    "get_today_stats": (get_today_stats, 1, "call"),
+    "generate_plan": (generate_plan, 1, "call"),
+    "get_financial_summary": (get_financial_summary, 1, "call"),
+    "_check_duplicate": (check_duplicate, 1, "call"),
+    "project._keyword_match": (project_keyword_match, 1, "call"),
+    "route._keyword_match": (route_keyword_match, 100, "note"),
+}
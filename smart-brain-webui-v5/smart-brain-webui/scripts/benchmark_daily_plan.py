@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark daily plan generation against a large synthetic task list."""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+TARGET_MS = 100.0
+
+
+def build_database(db_path: str, n_tasks: int, seed: int = 42):
+    """Create a scratch database with n_tasks open tasks."""
+    from scripts.init_database import init_database
+    
+    init_database(db_path)
+    
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS profile_data (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("INSERT OR REPLACE INTO profile_data (key, value) VALUES ('company', 'Marriott')")
+    
+    rnd = random.Random(seed)
+    now = datetime.now()
+    rows = []
+    for i in range(n_tasks):
+        created = now - timedelta(days=rnd.uniform(0, 30))
+        rows.append((
+            f"Task {i}", f"Do task {i}", 'open',
+            rnd.choice(['high', 'medium', 'low']),
+            rnd.choice([5, 15, 30, 60, 90, 120]),
+            rnd.choice(['work/marriott', 'work/konstellate', 'personal', 'admin']),
+            created.isoformat()
+        ))
+    cursor.executemany("""
+        INSERT INTO tasks (text, action, status, priority, estimated_duration_minutes, domain, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    
+    tmp_dir = tempfile.mkdtemp(prefix="plan_bench_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    # Services bind settings.sqlite_db_path at import time
+    os.environ["SQLITE_DB_PATH"] = db_path
+    build_database(db_path, args.tasks)
+    
+    from src.services.daily_planning_service import daily_planning_service
+    
+    now = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+    plan = daily_planning_service.generate_plan(now=now)
+    
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        again = daily_planning_service.generate_plan(now=now)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert again == plan, "plan output is not deterministic"
+    
+    median = statistics.median(timings)
+    print(f"open tasks:  {args.tasks}")
+    print(f"scheduled:   {len(plan['upcoming']) + (1 if plan['current_task'] else 0)}")
+    print(f"median:      {median:.1f} ms")
+    print(f"p95:         {sorted(timings)[int(0.95 * (len(timings) - 1))]:.1f} ms")
+    print(f"target:      {TARGET_MS:.0f} ms -> {'OK' if median < TARGET_MS else 'SLOW'}")
+    for task in [plan['current_task']] + plan['upcoming']:
+        if task:
+            print(f"  {task['suggested_time']:>8}  {task['duration']:>4}m  {task['priority']:<6}  "
+                  f"score={task['score']:<6} energy={task['energy']}  {task['action']}")
+
+
+if __name__ == "__main__":
+    main()
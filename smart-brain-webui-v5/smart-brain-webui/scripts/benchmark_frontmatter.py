@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Benchmark reading vault note frontmatter over a large generated vault."""
+
+import argparse
+import importlib.util
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+DOMAINS = ['work/marriott', 'work/konstellate', 'personal', 'learning', 'admin']
+SUBDIRS = {'Project': 'projects', 'Area': 'areas', 'Note': 'notes'}
+
+
+def build_vault(vault: Path, n_notes: int, seed: int = 42) -> list:
+    """Write n_notes in FileStorageService's markdown format."""
+    from src.models.workflow_state import RoutedNote, NoteType
+    from src.storage.file_system import FileStorageService
+    
+    storage = FileStorageService()
+    rnd = random.Random(seed)
+    words = ["sync", "budget", "review", "deploy", "consent", "roadmap", "invoice", "meeting", "draft", "api"]
+    paths = []
+    for i in range(n_notes):
+        note_type = rnd.choice(list(NoteType))
+        note = RoutedNote(
+            title=f"Note {i} {rnd.choice(words)}",
+            content="\n".join(" ".join(rnd.choices(words, k=12)) for _ in range(rnd.randint(5, 80))),
+            domain=rnd.choice(DOMAINS),
+            type=note_type,
+            keywords=rnd.sample(words, 3)
+        )
+        path = vault / note.domain / SUBDIRS[note_type.value] / f"note-{i}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(storage._generate_markdown(note), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+def read_text_yaml(paths):
+    """Baseline: whole file into memory, header through yaml.safe_load."""
+    import yaml
+    
+    for path in paths:
+        text = Path(path).read_text(encoding="utf-8")
+        _, header, body = text.split("---\n", 2)
+        yaml.safe_load(header)
+
+
+def read_frontmatter(paths):
+    from src.storage.frontmatter import read_note
+    
+    for path in paths:
+        read_note(path)
+
+
+def read_frontmatter_and_body(paths):
+    from src.storage.frontmatter import read_note
+    
+    for path in paths:
+        read_note(path).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="keep the generated vault")
+    args = parser.parse_args()
+    
+    vault = Path(tempfile.mkdtemp(prefix="vault_bench_"))
+    start = time.perf_counter()
+    paths = build_vault(vault, args.notes)
+    size_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+    print(f"generated {len(paths)} notes ({size_mb:.0f} MB) in {time.perf_counter() - start:.1f}s at {vault}")
+    
+    suites = [("frontmatter (mmap)", read_frontmatter), ("frontmatter + body", read_frontmatter_and_body)]
+    if importlib.util.find_spec("yaml"):
+        suites.insert(0, ("read_text + yaml", read_text_yaml))
+    else:
+        print("pyyaml not installed, skipping baseline")
+    
+    # Warm the page cache so every suite reads from memory
+    read_frontmatter_and_body(paths)
+    
+    for name, fn in suites:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            fn(paths)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(f"{name:<22} {best:6.2f}s  {len(paths) / best:>9,.0f} notes/s")
+    
+    if not args.keep:
+        shutil.rmtree(vault)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Regression checks for the amortization engine's payoff month and final balance."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.services.amortization_service import AmortizationService
+
+
+# (principal, annual rate %, term months)
+CASES = [
+    (250000.0, 6.5, 360),
+    (300000.0, 7.1, 360),
+    (180000.0, 3.25, 180),
+    (20000.0, 5.0, 24),
+    (10000.0, 0.0, 12),
+]
+
+
+def main():
+    engine = AmortizationService()
+    failures = 0
+    
+    for principal, rate, term in CASES:
+        # Pay the loan's own cent-rounded payment; it must retire the loan on schedule
+        payment = engine.monthly_payment(principal, rate, term)
+        result = engine.simulate([principal], [rate], [payment])
+        payoff = int(result["payoff_month"][0])
+        repaid = float(result["principal"][0].sum())
+        final = float(result["balance"][0, term - 1]) if result["balance"].shape[1] >= term else None
+        
+        ok = payoff == term and abs(repaid - principal) < 0.01 and final == 0.0
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {principal:>10.2f} @ {rate:5.2f}% x {term:3d}: "
+              f"payment {payment:.2f}, payoff month {payoff}, principal repaid {repaid:.2f}")
+    
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 """FastAPI backend for Smart Second Brain."""
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import sqlite3
+import asyncio
+import time
 from loguru import logger
-import uuid
 
 from src.config import settings
+from src.storage.database import connect
+from src.services.metrics_service import metrics, HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT
 from src.services.cluster_service import cluster_service
 from src.services.route_service import route_service
 from src.storage.file_system import file_storage
@@ -27,6 +30,108 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency, status counts and in-flight requests."""
+    HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - start, request.method, path)
+        HTTP_REQUESTS.inc(request.method, path, str(status))
+        HTTP_IN_FLIGHT.dec()
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """With profiling enabled, ?profile=1 returns a cProfile summary instead of the response."""
+    if not settings.profiling_enabled or request.query_params.get("profile") != "1":
+        return await call_next(request)
+    
+    from src.services.profiler_service import profiler_service, ProfilerBusy
+    
+    start = time.perf_counter()
+    try:
+        with profiler_service.profile_request() as profiles:
+            response = await call_next(request)
+            # Drain the body so streamed work is profiled too
+            async for _ in response.body_iterator:
+                pass
+    except ProfilerBusy as e:
+        return JSONResponse({"detail": str(e)}, status_code=409)
+    
+    summary = profiler_service.summarize(profiles, sort=request.query_params.get("profile_sort", "cumulative"))
+    return PlainTextResponse(summary, headers={
+        "X-Profiled-Status": str(response.status_code),
+        "X-Profiled-Duration-Ms": f"{(time.perf_counter() - start) * 1000:.1f}"
+    })
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text exposition of in-process metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+async def install_profiling_executor():
+    """Let ?profile=1 see work the endpoints hand to asyncio.to_thread."""
+    if settings.profiling_enabled:
+        from src.services.profiler_service import ProfilingExecutor
+        asyncio.get_running_loop().set_default_executor(ProfilingExecutor(thread_name_prefix="asyncio"))
+
+
+@app.on_event("startup")
+def start_vault_watcher():
+    """Pick up notes edited outside the app (e.g. in Obsidian)."""
+    if settings.vault_watch_enabled:
+        from src.storage.vault_index import vault_indexer
+        vault_indexer.start_watcher()
+
+
+@app.on_event("shutdown")
+def stop_vault_watcher():
+    if settings.vault_watch_enabled:
+        from src.storage.vault_index import vault_indexer
+        vault_indexer.stop_watcher()
+
+
+_background_tasks: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def start_priority_learning():
+    """Fold in completions recorded outside /api/tasks/{id}/complete on a timer."""
+    if settings.priority_learning_interval_seconds <= 0:
+        return
+    from src.services.priority_learning_service import priority_learning
+    
+    async def learn_periodically():
+        while True:
+            await asyncio.sleep(settings.priority_learning_interval_seconds)
+            try:
+                await asyncio.to_thread(priority_learning.learn_from_completions)
+            except Exception as e:
+                logger.error(f"Periodic priority learning failed: {e}")
+    
+    _background_tasks.append(asyncio.create_task(learn_periodically()))
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+
+
+
 # Request/Response Models
 class NoteCreate(BaseModel):
     content: str
@@ -44,11 +149,19 @@ async def llm_status():
     if llm_service.azure:
         azure_configured = getattr(llm_service.azure, 'is_configured', False)
     
+    from src.llm.circuit_breaker import circuit_breakers
+    from src.llm.scheduler import llm_scheduler
+    from src.llm.prompt_builder import prompt_stats
+    
     return {
         "use_azure_setting": use_azure,
         "azure_configured": azure_configured,
         "azure_client": llm_service.azure is not None,
-        "ollama_client": llm_service.ollama is not None
+        "ollama_client": llm_service.ollama is not None,
+        "routing": [f"{provider}/{model}" for provider, model in llm_service.route()],
+        "breakers": circuit_breakers.snapshot(),
+        "scheduler": llm_scheduler.snapshot(),
+        "prompts": prompt_stats()
     }
     
 class NoteProcessed(BaseModel):
@@ -60,6 +173,17 @@ class NoteProcessed(BaseModel):
     keywords: List[str]
 
 
+class NoteBatch(BaseModel):
+    notes: List[NoteCreate]
+    # Split each note into topics with the clustering service before routing
+    cluster: bool = False
+
+
+class BatchNoteProcessed(NoteProcessed):
+    source_index: int
+    reasoning: str
+
+
 class NoteResponse(BaseModel):
     id: int
     title: str
@@ -106,8 +230,8 @@ async def process_note(note: NoteCreate):
             keywords=[]
         )
         
-        # Route to domain - returns dict
-        routed = route_service.route(cluster)
+        # Route to domain - returns dict; off the event loop so the LLM scheduler can queue it
+        routed = await asyncio.to_thread(route_service.route, cluster)
         
         # Find linked notes (search for [[wikilinks]] or similar notes)
         linked = _find_linked_notes(note.content)
@@ -127,6 +251,49 @@ async def process_note(note: NoteCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/notes/process/batch")
+async def process_notes_batch(batch: NoteBatch):
+    """
+    Process several notes without saving.
+    Keyword/local matches are routed first; the rest share one LLM prompt.
+    """
+    try:
+        clusters, sources = [], []
+        for index, note in enumerate(batch.notes):
+            if batch.cluster:
+                # Clustering is an LLM call per note; keep it off the event loop
+                note_clusters = await asyncio.to_thread(cluster_service.cluster, note.content)
+            else:
+                title = note.title
+                if not title:
+                    first_line = note.content.split('\n')[0].strip('#').strip()
+                    title = first_line[:100] if first_line else "Untitled Note"
+                note_clusters = [ClusterNote(title=title, content=note.content, type=NoteType.NOTE, keywords=[])]
+            clusters.extend(note_clusters)
+            sources.extend([index] * len(note_clusters))
+        
+        routed = await asyncio.to_thread(route_service.route_many, clusters)
+        
+        results = [
+            BatchNoteProcessed(
+                source_index=index,
+                suggested_domain=r.get("domain", "personal"),
+                suggested_title=c.title,
+                suggested_type=c.type.value,
+                confidence=r.get("confidence", 0.5),
+                reasoning=r.get("reasoning", ""),
+                linked_notes=_find_linked_notes(c.content),
+                keywords=c.keywords
+            )
+            for index, c, r in zip(sources, clusters, routed)
+        ]
+        return {"results": results, "count": len(results)}
+        
+    except Exception as e:
+        logger.error(f"Batch processing failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 class TaskClarification(BaseModel):
     task_index: int
     action: str
@@ -162,30 +329,14 @@ async def create_note(note: NoteSave):
         )
         
         # Write to vault
-        file_path = file_storage.write_note(routed, source_file="web-ui")
-        
-        # Get from database
-        conn = sqlite3.connect(settings.sqlite_db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, title, content, domain, type, file_path, created_at, updated_at
-            FROM notes WHERE file_path = ?
-        """, (str(file_path),))
-        
-        row = cursor.fetchone()
-        
-        if not row:
-            conn.close()
-            raise HTTPException(status_code=500, detail="Note saved but not found in DB")
-        
-        note_id = row[0]
-        conn.close()
+        stored = await file_storage.write_note_async(routed, source_file="web-ui")
+        note_id = stored["id"]
         
         # Extract tasks - now returns (tasks, questions)
         tasks, questions = task_extraction_service.extract_tasks(note.content, note_id, note.domain)
         
         # Store tasks temporarily (with pending status if they need clarification)
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         for task in tasks:
@@ -216,14 +367,14 @@ async def create_note(note: NoteSave):
         conn.close()
         
         note_response = NoteResponse(
-            id=row[0],
-            title=row[1],
-            content=row[2],
-            domain=row[3],
-            type=row[4],
-            file_path=row[5],
-            created_at=row[6],
-            updated_at=row[7]
+            id=note_id,
+            title=note.title,
+            content=note.content,
+            domain=note.domain,
+            type=note.type,
+            file_path=stored["file_path"],
+            created_at=stored["created_at"],
+            updated_at=stored["created_at"]
         )
         
         clarifications = [
@@ -254,7 +405,7 @@ async def create_note(note: NoteSave):
 async def apply_clarifications(note_id: int, data: ClarificationAnswers):
     """Apply clarification answers to pending tasks."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         # Get pending tasks for this note, ordered by id (same order as extracted)
@@ -298,7 +449,7 @@ async def apply_clarifications(note_id: int, data: ClarificationAnswers):
 async def list_notes(domain: Optional[str] = None, limit: int = 50):
     """List all notes, optionally filtered by domain."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         if domain:
@@ -340,7 +491,7 @@ async def list_notes(domain: Optional[str] = None, limit: int = 50):
 async def get_note(note_id: int):
     """Get single note by ID."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, title, content, domain, type, file_path, created_at, updated_at
@@ -423,7 +574,7 @@ class TaskResponse(BaseModel):
 async def list_tasks(status: Optional[str] = None, domain: Optional[str] = None):
     """List tasks, optionally filtered by status and domain."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         query = "SELECT id, text, action, status, priority, estimated_duration_minutes, domain, source_note_id, created_at FROM tasks WHERE 1=1"
@@ -467,7 +618,7 @@ async def get_daily_plan():
     """Get focused daily plan with 3-5 prioritized tasks."""
     try:
         from src.services.daily_planning_service import daily_planning_service
-        plan = daily_planning_service.generate_plan()
+        plan = daily_planning_service.get_plan()
         return plan
     except Exception as e:
         logger.error(f"Daily plan failed: {e}")
@@ -561,6 +712,10 @@ async def answer_question(question_id: int, answer: Dict[str, str]):
                 answer.get("suggested_domain", ""),
                 answer.get("answer")
             )
+            
+            # Retrain the local routing classifier with the new feedback
+            from src.services.route_classifier_service import route_classifier
+            route_classifier.invalidate()
         
         return {"status": "ok"}
     except Exception as e:
@@ -568,6 +723,21 @@ async def answer_question(question_id: int, answer: Dict[str, str]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/routing/classifier")
+async def routing_classifier_report(evaluate: bool = False):
+    """Local routing classifier stats; ?evaluate=1 adds a held-out threshold sweep."""
+    try:
+        from src.services.route_classifier_service import route_classifier
+        
+        report = route_classifier.report()
+        if evaluate:
+            report["evaluation"] = await asyncio.to_thread(route_classifier.evaluate)
+        return report
+    except Exception as e:
+        logger.error(f"Routing classifier report failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/tasks/{task_id}/complete")
 async def complete_task(task_id: int):
     """Mark task as complete and log patterns."""
@@ -577,7 +747,7 @@ async def complete_task(task_id: int):
         
         completed_at = datetime.now()
         
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -589,9 +759,9 @@ async def complete_task(task_id: int):
         conn.commit()
         conn.close()
         
-        # Log completion for learning
+        # Log completion for learning; the incremental fit runs off the event loop
         energy_pattern_service.log_completion(task_id, completed_at)
-        priority_learning.learn_from_completions()
+        await asyncio.to_thread(priority_learning.learn_from_completions)
         
         return {"status": "ok"}
     except Exception as e:
@@ -648,6 +818,18 @@ async def get_priority_weights():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/priority-weights/learn")
+async def learn_priority_weights(full: bool = False):
+    """Refit priority weights from completions (incremental unless full=true)."""
+    try:
+        from src.services.priority_learning_service import priority_learning
+        learned = priority_learning.learn_from_completions(full=full)
+        return {"learned": learned, "weights": priority_learning.get_all_weights()}
+    except Exception as e:
+        logger.error(f"Learn priority weights failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 def _find_linked_notes(content: str) -> List[str]:
     """Extract wikilinks and find similar notes."""
     import re
@@ -680,7 +862,7 @@ async def get_today_stats():
     """Get today's gamification stats."""
     from datetime import datetime, timedelta
     
-    conn = sqlite3.connect(settings.sqlite_db_path)
+    conn = connect(settings.sqlite_db_path)
     cursor = conn.cursor()
     
     today = datetime.now().date().isoformat()
@@ -796,7 +978,7 @@ async def create_project(project: ProjectCreate):
 @app.get("/api/projects/{project_id}/tasks")
 async def get_project_tasks(project_id: int):
     """Get tasks for a specific project."""
-    conn = sqlite3.connect(settings.sqlite_db_path)
+    conn = connect(settings.sqlite_db_path)
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -849,7 +1031,7 @@ async def get_domain_hierarchy(domain: str):
     """Get full hierarchy: domain -> projects -> tasks."""
     from src.services.project_service import project_service
     
-    conn = sqlite3.connect(settings.sqlite_db_path)
+    conn = connect(settings.sqlite_db_path)
     cursor = conn.cursor()
     
     projects = project_service.get_projects(domain)
@@ -992,24 +1174,27 @@ async def create_tasks_from_email_batch(batch: EmailTaskBatchCreate):
     """
     try:
         from src.services.email_task_service import email_task_service
+        from src.llm.scheduler import llm_priority, BACKGROUND
         
         results = []
         created = 0
         duplicates = 0
         
         for task in batch.tasks:
-            result = email_task_service.create_task_from_email(
-                action=task.action,
-                sender=task.sender,
-                subject=task.subject,
-                priority=task.priority,
-                domain_hint=task.domain_hint,
-                deadline=task.deadline,
-                context=task.context,
-                first_step=task.first_step,
-                estimated_minutes=task.estimated_minutes,
-                source_email_id=task.source_email_id
-            )
+            with llm_priority(BACKGROUND):
+                result = await asyncio.to_thread(
+                    email_task_service.create_task_from_email,
+                    action=task.action,
+                    sender=task.sender,
+                    subject=task.subject,
+                    priority=task.priority,
+                    domain_hint=task.domain_hint,
+                    deadline=task.deadline,
+                    context=task.context,
+                    first_step=task.first_step,
+                    estimated_minutes=task.estimated_minutes,
+                    source_email_id=task.source_email_id
+                )
             
             results.append(EmailTaskResponse(**result))
             
@@ -1131,6 +1316,18 @@ class LoanPaymentCreate(BaseModel):
     extra_principal: float = 0
 
 
+class PayoffScenario(BaseModel):
+    name: str
+    extra_monthly: float = 0
+    lump_sums: Dict[int, float] = {}  # payment number -> extra principal
+    interest_rate: Optional[float] = None  # refinance rate
+    term_months: Optional[int] = None  # refinance term, recomputes the payment
+
+
+class PayoffRequest(BaseModel):
+    scenarios: List[PayoffScenario] = []
+
+
 # --- Bills Endpoints ---
 
 @app.post("/api/financial/bills", response_model=BillResponse)
@@ -1278,20 +1475,163 @@ async def get_amortization(loan_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/financial/loans/payoff")
+async def simulate_all_loans_payoff(request: PayoffRequest):
+    """Compare payoff dates and interest saved for what-if scenarios across all active loans."""
+    try:
+        from src.services.financial_service import financial_service
+        return financial_service.simulate_payoff([s.model_dump() for s in request.scenarios])
+    except Exception as e:
+        logger.error(f"Simulate payoff failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/financial/loans/{loan_id}/payoff")
+async def simulate_loan_payoff(loan_id: int, request: PayoffRequest):
+    """Compare payoff dates and interest saved for what-if scenarios on one loan."""
+    try:
+        from src.services.financial_service import financial_service
+        result = financial_service.simulate_payoff([s.model_dump() for s in request.scenarios], loan_id=loan_id)
+        if not result["loans"]:
+            raise HTTPException(status_code=404, detail="Active loan not found")
+        return result["loans"][0]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Simulate loan payoff failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # --- Financial Dashboard ---
 
 @app.get("/api/financial/summary")
-async def financial_summary():
+async def financial_summary(cached: bool = True):
     """Get overall financial summary."""
     try:
         from src.services.financial_service import financial_service
-        summary = financial_service.get_financial_summary()
+        summary = financial_service.get_financial_summary(cached=cached)
         return summary
     except Exception as e:
         logger.error(f"Financial summary failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/financial/cashflow")
+async def financial_cashflow(days: int = 90):
+    """Get pending bills and projected subscription/loan payments for the next N days."""
+    try:
+        from src.services.projection_service import projection_service
+        return projection_service.get_cashflow(days=days)
+    except Exception as e:
+        logger.error(f"Financial cashflow failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- Transactions ---
+
+@app.post("/api/financial/transactions/import")
+async def import_transactions(request: Request, format: Optional[str] = None,
+                              account: Optional[str] = None, path: Optional[str] = None):
+    """Import a CSV/OFX bank statement from the raw request body, or a path inside settings.import_path."""
+    import os
+    import tempfile
+    from fastapi.concurrency import run_in_threadpool
+    from src.services.transaction_import_service import transaction_import_service
+    
+    tmp_path = None
+    try:
+        if path:
+            path = transaction_import_service.resolve_import_path(path)
+        else:
+            if not format:
+                raise HTTPException(status_code=400, detail="format is required for uploads (csv or ofx)")
+            # Spool the upload to disk so large statements never sit in memory
+            with tempfile.NamedTemporaryFile(suffix=f".{format}", delete=False) as tmp:
+                tmp_path = tmp.name
+                async for block in request.stream():
+                    tmp.write(block)
+        
+        return await run_in_threadpool(
+            transaction_import_service.import_file, path or tmp_path, format, account
+        )
+    except HTTPException:
+        raise
+    except (ValueError, FileNotFoundError, IsADirectoryError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Transaction import failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+
+# --- Reconciliation ---
+
+class ExternalBill(BaseModel):
+    id: str
+    vendor: Optional[str] = None
+    amount: float
+    due_date: str
+
+
+class ExternalReconcileRequest(BaseModel):
+    source: str
+    bills: List[ExternalBill]
+
+
+@app.post("/api/financial/reconcile")
+async def reconcile_bills(auto_mark: bool = True):
+    """Match pending bills to imported transactions; confident matches are marked paid."""
+    try:
+        from src.services.reconciliation_service import reconciliation_service
+        return reconciliation_service.reconcile_bills(auto_mark=auto_mark)
+    except Exception as e:
+        logger.error(f"Reconcile bills failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/financial/reconcile/external")
+async def reconcile_external_bills(request: ExternalReconcileRequest):
+    """Match bills tracked by another app (e.g. BillBrain) to imported transactions."""
+    try:
+        from src.services.reconciliation_service import reconciliation_service
+        return reconciliation_service.reconcile_external(request.source, [b.model_dump() for b in request.bills])
+    except Exception as e:
+        logger.error(f"Reconcile external bills failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/financial/reconcile/review")
+async def reconciliation_review_queue(source: Optional[str] = None):
+    """Get low-confidence matches waiting for review."""
+    try:
+        from src.services.reconciliation_service import reconciliation_service
+        queue = reconciliation_service.get_review_queue(source=source)
+        return {"matches": queue, "count": len(queue)}
+    except Exception as e:
+        logger.error(f"Get reconciliation queue failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/financial/reconcile/review/{match_id}")
+async def resolve_reconciliation_match(match_id: int, accept: bool = True):
+    """Confirm or reject a queued match."""
+    try:
+        from src.services.reconciliation_service import reconciliation_service, TransactionAlreadyMatched
+        result = reconciliation_service.resolve_review(match_id, accept)
+        if not result:
+            raise HTTPException(status_code=404, detail="Match not found or already reviewed")
+        return result
+    except HTTPException:
+        raise
+    except TransactionAlreadyMatched as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Resolve reconciliation match failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================
 # BRAIN DUMP PROCESSING
 # ============================================================
@@ -1323,11 +1663,16 @@ async def analyze_brain_dump(request: BrainDumpRequest):
         except Exception as e:
             logger.warning(f"Could not get existing projects: {e}")
         
-        result = brain_dump_service.process_brain_dump(
-            request.content, 
-            request.domain,
-            existing_projects=existing_projects
-        )
+        from src.llm.scheduler import llm_priority, BACKGROUND
+        
+        # Bulk analysis yields LLM slots to interactive requests
+        with llm_priority(BACKGROUND):
+            result = await asyncio.to_thread(
+                brain_dump_service.process_brain_dump,
+                request.content,
+                request.domain,
+                existing_projects=existing_projects
+            )
         return result
     except Exception as e:
         logger.error(f"Brain dump analysis failed: {e}")
@@ -1359,6 +1704,7 @@ async def suggest_projects_from_dump(request: BrainDumpRequest):
 async def save_brain_dump_items(data: Dict[str, Any]):
     try:
         from src.services.project_service import project_service
+        from src.models.workflow_state import RoutedNote
         
         # 1. Clean Top-Level Domain
         raw_domain = data.get("domain", "personal")
@@ -1394,68 +1740,86 @@ async def save_brain_dump_items(data: Dict[str, Any]):
                 # Flatten p_id if it's a list
                 project_map[p_name] = p_id[0] if isinstance(p_id, list) else p_id
         
-        conn = sqlite3.connect(settings.sqlite_db_path)
-        cursor = conn.cursor()
-        
-        # Apply hierarchies (using flattened IDs)
-        for hier in hierarchies:
-            child_id = project_map.get(hier.get("child_project"))
-            parent_id = project_map.get(hier.get("parent_project"))
-            if child_id and parent_id:
-                cursor.execute("UPDATE projects SET parent_project_id = ? WHERE id = ?", 
-                             (parent_id[0] if isinstance(parent_id, list) else parent_id, 
-                              child_id[0] if isinstance(child_id, list) else child_id))
-        
-        saved_counts = {"task": 0, "note": 0, "idea": 0, "question": 0, "decision": 0, "reference": 0}
-        
-        for item in items:
-            item_type = item.get("item_type", "task")
-            action = item.get("action", "")
-            original_text = item.get("original_text", "")
-
-            # --- RESOLVE & FLATTEN PROJECT ID ---
-            raw_proj_name = item.get("project") or item.get("project_name") or ""
-            if isinstance(raw_proj_name, list): raw_proj_name = raw_proj_name[0] if raw_proj_name else ""
+        # The whole write transaction runs on one worker thread: awaiting while it is open
+        # would leave the lock held while other handlers block the loop on it
+        def save_items() -> Dict[str, int]:
+            conn = connect(settings.sqlite_db_path)
+            cursor = conn.cursor()
             
-            final_proj_name = name_mapping.get(str(raw_proj_name).lower(), raw_proj_name)
-            current_project_id = project_map.get(final_proj_name)
+            # Apply hierarchies (using flattened IDs)
+            for hier in hierarchies:
+                child_id = project_map.get(hier.get("child_project"))
+                parent_id = project_map.get(hier.get("parent_project"))
+                if child_id and parent_id:
+                    cursor.execute("UPDATE projects SET parent_project_id = ? WHERE id = ?", 
+                                 (parent_id[0] if isinstance(parent_id, list) else parent_id, 
+                                  child_id[0] if isinstance(child_id, list) else child_id))
             
-            # FINAL INSURANCE: If current_project_id is still a list, extract the first element
-            if isinstance(current_project_id, list):
-                current_project_id = current_project_id[0] if current_project_id else None
-
-            if item_type == "task":
-                # Priority/Duration Sanitization (Already good in your code)
-                priority_val = item.get("priority", "medium")
-                if isinstance(priority_val, list): priority_val = priority_val[0]
-                
-                duration_val = item.get("estimated_minutes", 30)
-                if isinstance(duration_val, list): duration_val = duration_val[0]
-                try: duration_val = int(duration_val)
-                except: duration_val = 30
-
-                cursor.execute("""
-                    INSERT INTO tasks (text, action, status, priority, estimated_duration_minutes, domain, project_id, metadata)
-                    VALUES (?, ?, 'open', ?, ?, ?, ?, ?)
-                """, (original_text, action, str(priority_val), duration_val, domain, current_project_id, str({"item_type": "task", "from_brain_dump": True})))
-                saved_counts["task"] += 1
+            saved_counts = {"task": 0, "note": 0, "idea": 0, "question": 0, "decision": 0, "reference": 0}
+            vault_notes = []
+            
+            for item in items:
+                item_type = item.get("item_type", "task")
+                action = item.get("action", "")
+                original_text = item.get("original_text", "")
+
+                # --- RESOLVE & FLATTEN PROJECT ID ---
+                raw_proj_name = item.get("project") or item.get("project_name") or ""
+                if isinstance(raw_proj_name, list): raw_proj_name = raw_proj_name[0] if raw_proj_name else ""
                 
-            elif item_type == "idea":
-                # THIS IS WHERE PARAMETER 4 WAS FAILING
-                cursor.execute("""
-                    INSERT INTO tasks (text, action, status, priority, domain, project_id, metadata)
-                    VALUES (?, ?, 'open', 'low', ?, ?, ?)
-                """, (original_text, action, domain, current_project_id, str({"item_type": "idea", "tags": ["idea"], "from_brain_dump": True})))
-                saved_counts["idea"] += 1
+                final_proj_name = name_mapping.get(str(raw_proj_name).lower(), raw_proj_name)
+                current_project_id = project_map.get(final_proj_name)
                 
-            # ... (rest of your note/question/decision blocks remain the same) ...
-            elif item_type == "note":
-                cursor.execute("INSERT INTO notes (title, content, domain, type, file_path, source_file) VALUES (?, ?, ?, 'Note', ?, 'brain_dump')",
-                             (action[:100], action, domain, f"bd_{uuid.uuid4().hex[:8]}.md"))
-                saved_counts["note"] += 1
-
-        conn.commit()
-        conn.close()
+                # FINAL INSURANCE: If current_project_id is still a list, extract the first element
+                if isinstance(current_project_id, list):
+                    current_project_id = current_project_id[0] if current_project_id else None
+
+                if item_type == "task":
+                    # Priority/Duration Sanitization (Already good in your code)
+                    priority_val = item.get("priority", "medium")
+                    if isinstance(priority_val, list): priority_val = priority_val[0]
+                    
+                    duration_val = item.get("estimated_minutes", 30)
+                    if isinstance(duration_val, list): duration_val = duration_val[0]
+                    try: duration_val = int(duration_val)
+                    except: duration_val = 30
+
+                    cursor.execute("""
+                        INSERT INTO tasks (text, action, status, priority, estimated_duration_minutes, domain, project_id, metadata)
+                        VALUES (?, ?, 'open', ?, ?, ?, ?, ?)
+                    """, (original_text, action, str(priority_val), duration_val, domain, current_project_id, str({"item_type": "task", "from_brain_dump": True})))
+                    saved_counts["task"] += 1
+                    
+                elif item_type == "idea":
+                    # THIS IS WHERE PARAMETER 4 WAS FAILING
+                    cursor.execute("""
+                        INSERT INTO tasks (text, action, status, priority, domain, project_id, metadata)
+                        VALUES (?, ?, 'open', 'low', ?, ?, ?)
+                    """, (original_text, action, domain, current_project_id, str({"item_type": "idea", "tags": ["idea"], "from_brain_dump": True})))
+                    saved_counts["idea"] += 1
+                    
+                # ... (rest of your note/question/decision blocks remain the same) ...
+                elif item_type == "note":
+                    vault_notes.append(RoutedNote(
+                        title=action[:100], content=action, domain=domain, type=NoteType.NOTE,
+                        keywords=[str(t) for t in item.get("tags") or []]
+                    ))
+                    saved_counts["note"] += 1
+
+            # Notes go through the vault like any other note, in one batch, inside the
+            # tasks' transaction: a vault failure leaves nothing saved, so a retry is safe
+            try:
+                stored = file_storage.write_notes(vault_notes, source_file="brain_dump", conn=conn)
+                try:
+                    conn.commit()
+                except Exception:
+                    file_storage.discard(stored)
+                    raise
+            finally:
+                conn.close()
+            return saved_counts
+        
+        saved_counts = await asyncio.to_thread(save_items)
         return {"saved": saved_counts, "total": sum(saved_counts.values())}
         
     except Exception as e:
@@ -1516,7 +1880,7 @@ async def consolidate_projects(data: Dict[str, Any]):
                 
                 # Move tasks from variant projects to target
                 if target_id and variant_ids:
-                    conn = sqlite3.connect(settings.sqlite_db_path)
+                    conn = connect(settings.sqlite_db_path)
                     cursor = conn.cursor()
                     
                     for vid in variant_ids:
@@ -1560,7 +1924,7 @@ async def consolidate_projects(data: Dict[str, Any]):
 async def get_tasks_by_person(domain: Optional[str] = None):
     """Get tasks grouped by associated person."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         query = """
@@ -1620,7 +1984,7 @@ async def get_tasks_by_person(domain: Optional[str] = None):
 async def get_ambiguous_tasks():
     """Get tasks that were marked as ambiguous and may need clarification."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -1660,7 +2024,7 @@ async def get_ambiguous_tasks():
 async def list_questions(status: Optional[str] = None, domain: Optional[str] = None):
     """List all questions, optionally filtered."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         query = """
@@ -1706,7 +2070,7 @@ async def list_questions(status: Optional[str] = None, domain: Optional[str] = N
 async def answer_open_question(question_id: int, data: Dict[str, str]):
     """Answer an open question from brain dump."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -1728,7 +2092,7 @@ async def answer_open_question(question_id: int, data: Dict[str, str]):
 async def list_decisions(domain: Optional[str] = None):
     """List all decisions, optionally filtered by domain."""
     try:
-        conn = sqlite3.connect(settings.sqlite_db_path)
+        conn = connect(settings.sqlite_db_path)
         cursor = conn.cursor()
         
         query = """
@@ -1887,3 +2251,98 @@ async def get_unconfirmed_entities():
     except Exception as e:
         logger.error(f"Get unconfirmed entities failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/vault/sync")
+async def sync_vault():
+    """Rescan the vault and upsert changed notes."""
+    from fastapi.concurrency import run_in_threadpool
+    try:
+        from src.storage.vault_index import vault_indexer
+        return await run_in_threadpool(vault_indexer.scan)
+    except Exception as e:
+        logger.error(f"Vault sync failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/vault/sync/status")
+async def vault_sync_status():
+    """Result of the most recent vault sync."""
+    from src.storage.vault_index import vault_indexer
+    return {
+        "watching": vault_indexer.is_watching(),
+        "last_sync": vault_indexer.last_sync
+    }
+
+
+@app.get("/api/debug/queries")
+async def get_query_stats(sort: str = "total_ms", limit: int = 50, slow_only: bool = False):
+    """Per-statement SQLite timings, with query plans for slow statements."""
+    from src.storage.database import query_stats
+    
+    if sort not in ("total_ms", "avg_ms", "max_ms", "count", "slow_count", "rows"):
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    statements = query_stats.snapshot(sort=sort, limit=limit, slow_only=slow_only)
+    return {
+        "slow_query_ms": settings.slow_query_ms,
+        "statements": statements,
+        "full_scans": [s["statement"] for s in statements if s["full_scan"]]
+    }
+
+
+@app.delete("/api/debug/queries")
+async def reset_query_stats():
+    """Clear collected query stats."""
+    from src.storage.database import query_stats
+    query_stats.reset()
+    return {"status": "ok"}
+
+
+@app.get("/api/debug/profile")
+async def run_sampling_profile(seconds: float = 10.0, interval_ms: float = 5.0, format: str = "speedscope",
+                               include_idle: bool = False):
+    """Sample every thread for N seconds; returns a speedscope file or collapsed stacks."""
+    from src.services.profiler_service import profiler_service, ProfilerBusy
+    
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (set PROFILING_ENABLED=true)")
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be 'speedscope' or 'collapsed'")
+    if not 0 < seconds <= settings.profile_max_seconds or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {settings.profile_max_seconds}], "
+                                                    "interval_ms in [1, 1000]")
+    try:
+        # Off the event loop, so the requests being profiled keep being served
+        result = await asyncio.to_thread(profiler_service.sample, seconds, interval_ms, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if format == "collapsed":
+        return PlainTextResponse(profiler_service.to_collapsed(result), headers={
+            "Content-Disposition": f'attachment; filename="profile-{stamp}.folded"'
+        })
+    return JSONResponse(profiler_service.to_speedscope(result, name=f"smart-brain {stamp}"), headers={
+        "Content-Disposition": f'attachment; filename="profile-{stamp}.speedscope.json"'
+    })
+
+
+@app.get("/api/llm/traces")
+async def get_llm_traces(limit: int = 50):
+    """Most recent LLM calls with tokens, latency, retries and fallbacks."""
+    from src.services.llm_trace_service import llm_trace_service
+    return {"traces": llm_trace_service.get_recent(limit)}
+
+
+@app.get("/api/llm/traces/stats")
+async def get_llm_trace_stats(by: str = "stage", days: int = 7):
+    """LLM call totals grouped by stage (task_type), provider, model or day."""
+    from src.services.llm_trace_service import llm_trace_service, GROUPINGS
+    
+    if by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {sorted(GROUPINGS)}")
+    try:
+        return {"by": by, "days": days, "groups": llm_trace_service.get_stats(by, days)}
+    except Exception as e:
+        logger.error(f"LLM trace stats failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
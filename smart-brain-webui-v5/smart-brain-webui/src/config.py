@@ -37,6 +37,8 @@ class Settings(BaseSettings):
     inbox_path: str = Field(default="inbox")
     archive_path: str = Field(default="archive")
     log_path: str = Field(default="data/logs")
+    # Statements imported by ?path= must be inside this directory
+    import_path: str = Field(default="data/imports")
     
     # Domains
     domains: str = Field(default="work/marriott,work/konstellate,personal,learning,admin,financial")
@@ -46,6 +48,74 @@ class Settings(BaseSettings):
     min_clusters: int = Field(default=3)
     task_dedupe_threshold: float = Field(default=0.85)
     
+    # Daily planning
+    planning_day_start_hour: int = Field(default=9)
+    planning_day_end_hour: int = Field(default=18)
+    planning_slot_minutes: int = Field(default=30)
+    planning_max_tasks: int = Field(default=5)
+    planning_candidate_pool: int = Field(default=50)
+    # Refit priority weights from new completions this often (0 disables the timer)
+    priority_learning_interval_seconds: float = Field(default=3600.0)
+    
+    # Financial projections
+    projection_horizon_days: int = Field(default=365)
+    
+    # Bill reconciliation
+    reconcile_auto_threshold: float = Field(default=0.85)
+    reconcile_review_threshold: float = Field(default=0.55)
+    reconcile_days_before: int = Field(default=15)
+    reconcile_days_after: int = Field(default=7)
+    
+    # Vault sync
+    vault_watch_enabled: bool = Field(default=True)
+    vault_poll_interval_seconds: float = Field(default=5.0)
+    
+    # LLM tracing
+    llm_trace_buffer_size: int = Field(default=1000)
+    azure_prompt_cost_per_1k: float = Field(default=0.0)
+    azure_completion_cost_per_1k: float = Field(default=0.0)
+    
+    # LLM circuit breakers and routing
+    llm_breaker_window_seconds: float = Field(default=60.0)
+    llm_breaker_min_calls: int = Field(default=5)
+    llm_breaker_error_threshold: float = Field(default=0.5)
+    llm_breaker_slow_call_ms: float = Field(default=60000.0)
+    llm_breaker_cooldown_seconds: float = Field(default=30.0)
+    llm_prefer_faster_provider: bool = Field(default=True)
+    llm_json_ollama_fallback: bool = Field(default=True)
+    
+    # LLM scheduling ("provider=N" caps all calls to a provider, "provider/model=N" one model within it)
+    llm_concurrency_limits: str = Field(default="ollama=2,azure=8")
+    llm_interactive_reserved_slots: int = Field(default=1)
+    llm_queue_timeout_interactive_seconds: float = Field(default=30.0)
+    llm_queue_timeout_background_seconds: float = Field(default=600.0)
+    
+    # Prompt budgets (windows are "provider=N" or "provider/model=N" tokens; Ollama gets num_ctx from here)
+    llm_context_windows: str = Field(default="ollama=8192,azure=128000")
+    llm_prompt_output_reserve: int = Field(default=2048)
+    llm_prompt_max_tokens: int = Field(default=12000)
+    
+    # Local routing classifier (nearest domain centroid; below the margin threshold the LLM decides)
+    route_classifier_enabled: bool = Field(default=True)
+    route_classifier_threshold: float = Field(default=0.5)
+    route_classifier_min_similarity: float = Field(default=0.1)
+    route_classifier_min_examples: int = Field(default=3)
+    route_classifier_max_notes: int = Field(default=5000)
+    route_classifier_refresh_seconds: float = Field(default=600.0)
+    # Notes per multi-note LLM routing prompt (RouteService.route_many)
+    route_batch_size: int = Field(default=20)
+    
+    # Coalesce identical in-flight LLM and embedding calls
+    single_flight_enabled: bool = Field(default=True)
+    
+    # Query diagnostics
+    query_stats_enabled: bool = Field(default=True)
+    slow_query_ms: float = Field(default=100.0)
+    
+    # Profiling (/api/debug/profile and ?profile=1)
+    profiling_enabled: bool = Field(default=False)
+    profile_max_seconds: float = Field(default=60.0)
+    
     # Logging
     log_level: str = Field(default="INFO")
     debug: bool = Field(default=False)
@@ -66,6 +136,7 @@ class Settings(BaseSettings):
             self.inbox_path,
             self.archive_path,
             self.log_path,
+            self.import_path,
             Path(self.sqlite_db_path).parent,
             self.chromadb_path,
         ]:
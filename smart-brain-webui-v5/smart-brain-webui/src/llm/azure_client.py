@@ -1,11 +1,17 @@
 """Azure OpenAI client."""
 
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
 import httpx
 from loguru import logger
 
 from src.config import settings
+from src.llm.circuit_breaker import circuit_breakers
+from src.llm.json_stream import parse_json
+from src.services.llm_trace_service import note_attempt, note_usage
+
+
+JSON_INSTRUCTION = "\n\nRespond ONLY with valid JSON. No markdown, no explanation."
 
 
 class AzureOpenAIClient:
@@ -38,7 +44,8 @@ class AzureOpenAIClient:
         messages.append({"role": "user", "content": prompt})
         
         try:
-            with httpx.Client(timeout=120.0) as client:
+            with circuit_breakers.get("azure", self.deployment).guard(), httpx.Client(timeout=120.0) as client:
+                note_attempt()
                 response = client.post(
                     self._get_url(),
                     headers={
@@ -53,6 +60,8 @@ class AzureOpenAIClient:
                 )
                 response.raise_for_status()
                 data = response.json()
+                usage = data.get("usage") or {}
+                note_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
                 return data["choices"][0]["message"]["content"]
         except Exception as e:
             logger.error(f"Azure OpenAI request failed: {e}")
@@ -66,7 +75,7 @@ class AzureOpenAIClient:
     ) -> Dict[str, Any]:
         """Generate JSON response."""
         # Add JSON instruction to system prompt
-        json_system = (system or "") + "\n\nRespond ONLY with valid JSON. No markdown, no explanation."
+        json_system = (system or "") + JSON_INSTRUCTION
         
         response = self.generate(
             prompt=prompt,
@@ -74,21 +83,64 @@ class AzureOpenAIClient:
             temperature=temperature
         )
         
-        # Clean response
-        response = response.strip()
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.startswith("```"):
-            response = response[3:]
-        if response.endswith("```"):
-            response = response[:-3]
-        response = response.strip()
-        
         try:
-            return json.loads(response)
-        except json.JSONDecodeError as e:
+            return parse_json(response)
+        except ValueError:
             logger.error(f"Failed to parse JSON: {response[:500]}")
-            raise ValueError(f"Invalid JSON response: {e}")
+            raise
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.2,
+        max_tokens: int = 16000,
+        json_mode: bool = True
+    ) -> Iterator[str]:
+        """Stream completion text from Azure OpenAI (server-sent events)."""
+        if json_mode:
+            system = (system or "") + JSON_INSTRUCTION
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        
+        try:
+            with circuit_breakers.get("azure", self.deployment).guard(), httpx.Client(timeout=120.0) as client:
+                note_attempt()
+                with client.stream(
+                    "POST",
+                    self._get_url(),
+                    headers={
+                        "api-key": self.api_key,
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "messages": messages,
+                        "temperature": temperature,
+                        "max_tokens": max_tokens,
+                        "stream": True,
+                        "stream_options": {"include_usage": True}
+                    }
+                ) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        event = json.loads(data)
+                        usage = event.get("usage")
+                        if usage:
+                            note_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                        for choice in event.get("choices") or []:
+                            content = (choice.get("delta") or {}).get("content")
+                            if content:
+                                yield content
+        except Exception as e:
+            logger.error(f"Azure OpenAI stream failed: {e}")
+            raise
     
     def test_connection(self) -> bool:
         """Test Azure OpenAI connection."""
@@ -0,0 +1,173 @@
+"""Per provider/model circuit breakers for LLM calls.
+
+Each breaker keeps a rolling window of recent call outcomes. When enough
+calls in the window failed (errors, or successes slower than the slow-call
+limit) it opens and calls fail fast with CircuitOpenError instead of
+waiting on timeouts and retries. After a cooldown it lets a single probe
+through (half-open); the probe's outcome closes or re-opens it.
+
+Breakers also keep an EWMA of successful call latency, which LLMService
+uses to prefer the faster healthy provider.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.config import settings
+from src.services.metrics_service import LLM_BREAKER_STATE, LLM_BREAKER_TRIPS
+
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Weight of the newest sample in the latency EWMA
+LATENCY_ALPHA = 0.2
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Rolling-window breaker for one provider/model."""
+    
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.latency_ms: Optional[float] = None
+        self.trips = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._calls = deque()  # (timestamp, failed)
+        self._probing = False
+        self._lock = threading.Lock()
+        LLM_BREAKER_STATE.set(0, provider, model)
+    
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; claims the probe slot when half-open."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < settings.llm_breaker_cooldown_seconds:
+                    self.rejected += 1
+                    return False
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+    
+    def available(self) -> bool:
+        """Like allow() but without side effects, for routing decisions."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= settings.llm_breaker_cooldown_seconds
+            return not (self.state == HALF_OPEN and self._probing)
+    
+    def record(self, ok: bool, latency_ms: float, error: Optional[str] = None):
+        failed = not ok or latency_ms > settings.llm_breaker_slow_call_ms
+        now = time.monotonic()
+        with self._lock:
+            if ok:
+                self.latency_ms = latency_ms if self.latency_ms is None else (
+                    LATENCY_ALPHA * latency_ms + (1 - LATENCY_ALPHA) * self.latency_ms)
+            if error:
+                self.last_error = error[:300]
+            
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self._calls.clear()
+                    self._set_state(CLOSED)
+                return
+            
+            self._calls.append((now, failed))
+            cutoff = now - settings.llm_breaker_window_seconds
+            while self._calls and self._calls[0][0] < cutoff:
+                self._calls.popleft()
+            
+            if self.state == CLOSED and len(self._calls) >= settings.llm_breaker_min_calls:
+                failures = sum(1 for _, f in self._calls if f)
+                if failures / len(self._calls) >= settings.llm_breaker_error_threshold:
+                    self._open(now)
+    
+    @contextmanager
+    def guard(self):
+        """Run one call through the breaker; raises CircuitOpenError if it's open.
+        
+        Every exit records an outcome, or a half-open breaker would keep its
+        probe slot forever. A stream closed before it finished (GeneratorExit)
+        counts as a failure.
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit open for {self.provider}/{self.model}")
+        start = time.perf_counter()
+        ok, error = False, None
+        try:
+            yield
+            ok = True
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            self.record(ok, (time.perf_counter() - start) * 1000, error)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            failures = sum(1 for _, f in self._calls if f)
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, settings.llm_breaker_cooldown_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "provider": self.provider, "model": self.model, "state": self.state,
+                "window_calls": len(self._calls), "window_failures": failures,
+                "error_rate": round(failures / len(self._calls), 3) if self._calls else 0.0,
+                "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                "trips": self.trips, "rejected": self.rejected,
+                "retry_in_seconds": round(retry_in, 1), "last_error": self.last_error
+            }
+    
+    def _open(self, now: float):
+        self.opened_at = now
+        self.trips += 1
+        self._calls.clear()
+        self._set_state(OPEN)
+        LLM_BREAKER_TRIPS.inc(self.provider, self.model)
+    
+    def _set_state(self, state: str):
+        self.state = state
+        LLM_BREAKER_STATE.set(STATE_VALUES[state], self.provider, self.model)
+
+
+class CircuitBreakers:
+    """Registry of breakers keyed by (provider, model)."""
+    
+    def __init__(self):
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        key = (provider, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(provider, model)
+        return breaker
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [b.snapshot() for _, b in sorted(self._breakers.items())]
+
+
+# Global instance
+circuit_breakers = CircuitBreakers()
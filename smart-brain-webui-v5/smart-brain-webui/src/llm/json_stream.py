@@ -0,0 +1,219 @@
+"""Incremental JSON parsing for streamed LLM responses.
+
+JSONStreamParser is fed the response text chunk by chunk and hands back
+each element of a result array as soon as its closing bracket arrives:
+elements of a top-level array (key None), or of any array that is a value
+of the top-level object (key = that property, e.g. "tasks" or "items").
+Anything before the first { or [ (a ```json fence, "Here is the JSON:")
+and anything after the document closes is ignored.
+
+JSONStream runs the provider stream on a worker thread, so the LLM slot is
+released when generation ends even if the consumer is still busy with the
+elements, e.g. making its own LLM calls for them.
+"""
+
+import contextvars
+import json
+import queue
+import re
+import threading
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from src.services.profiler_service import profiled
+
+
+# Characters that change parser state; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'[\[\]{}",:]')
+_IN_STRING = re.compile(r'["\\]')
+
+Element = Tuple[Optional[str], Any]
+
+
+class JSONStreamParser:
+    """Scan a JSON document chunk by chunk, emitting completed array elements."""
+    
+    def __init__(self):
+        # Unconsumed tail of the response; _base is its offset in the whole document
+        self._text = ""
+        self._base = 0
+        self._parts: List[str] = []
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._element_start: Optional[int] = None
+    
+    @property
+    def done(self) -> bool:
+        return self._end is not None
+    
+    def feed(self, chunk: str) -> List[Element]:
+        """Add text; returns the (key, element) pairs completed by it."""
+        if self.done:
+            return []
+        self._parts.append(chunk)
+        self._text += chunk
+        out: List[Element] = []
+        text = self._text
+        
+        if self._start is None:
+            match = re.search(r"[\[{]", text)
+            if match is None:
+                self._pos = len(text)
+                self._compact()
+                return out
+            self._pos = match.start()
+            self._start = self._base + self._pos
+        
+        while not self.done:
+            if self._in_string:
+                match = _IN_STRING.search(text, self._pos)
+                if match is None:
+                    self._pos = len(text)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(text):
+                        # Escape split across chunks; resume at the backslash
+                        self._pos = match.start()
+                        break
+                    self._pos = match.end() + 1
+                    continue
+                self._in_string = False
+                self._pos = match.end()
+                if self._stack == ["{"]:
+                    self._last_string = text[self._string_start:self._pos]
+                continue
+            
+            match = _STRUCTURAL.search(text, self._pos)
+            if match is None:
+                self._pos = len(text)
+                break
+            char, at = match.group(), match.start()
+            self._pos = match.end()
+            
+            if char == '"':
+                self._in_string = True
+                self._string_start = at
+            elif char == ":":
+                if self._stack == ["{"] and self._last_string is not None:
+                    self._key = json.loads(self._last_string)
+            elif char in "[{":
+                if char == "[" and self._stack in ([], ["{"]):
+                    self._array_key = self._key if self._stack else None
+                    self._element_start = at + 1
+                self._stack.append(char)
+            elif char in "]}":
+                at_array_level = self._at_array_level()
+                if at_array_level and char == "]":
+                    self._emit_scalar(at, out)
+                    self._element_start = None
+                self._stack.pop()
+                if not self._stack:
+                    self._end = self._base + at
+                elif self._at_array_level() and self._element_start is not None:
+                    # A container element just closed
+                    out.append((self._array_key, self._loads(text[self._element_start:at + 1])))
+                    self._element_start = None
+            elif char == "," and self._at_array_level():
+                self._emit_scalar(at, out)
+                self._element_start = at + 1
+        
+        self._compact()
+        return out
+    
+    def value(self) -> Any:
+        """The whole document; raises ValueError if it never closed."""
+        document = "".join(self._parts)
+        if not self.done:
+            raise ValueError(f"Incomplete JSON response: {document[:200]!r}")
+        return self._loads(document[self._start:self._end + 1])
+    
+    def _compact(self):
+        """Drop the scanned prefix no open element or string still needs, rebasing offsets.
+        
+        Keeps each feed() proportional to the chunk (plus any element still
+        open) instead of copying the whole response so far.
+        """
+        keep = self._pos
+        if self._element_start is not None:
+            keep = min(keep, self._element_start)
+        if self._in_string:
+            keep = min(keep, self._string_start)
+        if keep <= 0:
+            return
+        self._text = self._text[keep:]
+        self._base += keep
+        self._pos -= keep
+        self._string_start -= keep
+        if self._element_start is not None:
+            self._element_start -= keep
+    
+    def _at_array_level(self) -> bool:
+        return self._stack in (["["], ["{", "["])
+    
+    def _emit_scalar(self, end: int, out: List[Element]):
+        if self._element_start is None:
+            return
+        raw = self._text[self._element_start:end].strip()
+        if raw:
+            out.append((self._array_key, self._loads(raw)))
+    
+    @staticmethod
+    def _loads(raw: str) -> Any:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON response: {e}") from e
+
+
+def parse_json(text: str) -> Any:
+    """Parse a complete response, tolerating fences and text around the JSON."""
+    parser = JSONStreamParser()
+    parser.feed(text)
+    return parser.value()
+
+
+class JSONStream:
+    """Iterate (key, element) pairs from streamed chunks; .value holds the document afterwards."""
+    
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = chunks
+        self.parser = JSONStreamParser()
+        self.value: Any = None
+    
+    def __iter__(self) -> Iterator[Element]:
+        items: queue.Queue = queue.Queue()
+        
+        def produce():
+            try:
+                for chunk in self._chunks:
+                    for element in self.parser.feed(chunk):
+                        items.put(("item", element))
+                self.value = self.parser.value()
+                items.put(("done", None))
+            except BaseException as e:
+                # Close the provider stream now rather than leaving it suspended until GC
+                close = getattr(self._chunks, "close", None)
+                try:
+                    if close is not None:
+                        close()
+                finally:
+                    items.put(("error", e))
+        
+        # Copy the context so the worker keeps the caller's LLM priority (and request profile)
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(profiled(produce),), name="llm-stream", daemon=True).start()
+        
+        while True:
+            kind, payload = items.get()
+            if kind == "item":
+                yield payload
+            elif kind == "error":
+                raise payload
+            else:
+                return
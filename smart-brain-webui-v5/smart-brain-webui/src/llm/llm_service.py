@@ -1,9 +1,27 @@
-"""Unified LLM service - uses Azure OpenAI if configured, falls back to Ollama."""
+"""Unified LLM service - uses Azure OpenAI if configured, falls back to Ollama.
 
-from typing import Optional, Dict, Any
+Providers are tried in routing order, skipping any whose circuit breaker
+is open. With llm_prefer_faster_provider the lower-latency one goes first
+once both have latency data; otherwise Azure stays first.
+
+Identical generate()/generate_json() calls that overlap in time share one
+provider request (single flight), e.g. a double-submitted note.
+stream_json() streams instead and hands back result array elements as
+they complete.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
 from loguru import logger
 
 from src.config import settings
+from src.llm.circuit_breaker import circuit_breakers, CircuitOpenError
+from src.llm.json_stream import JSONStream
+from src.llm.scheduler import llm_scheduler, QueueTimeout
+from src.llm.single_flight import SingleFlight
+from src.services.metrics_service import LLM_REQUESTS, LLM_LATENCY
+from src.services.llm_trace_service import llm_trace_service, note_cache_hit
 
 
 class LLMService:
@@ -12,6 +30,8 @@ class LLMService:
     def __init__(self):
         self._azure = None
         self._ollama = None
+        self._text_flight = SingleFlight("llm_generate")
+        self._json_flight = SingleFlight("llm_generate_json", copy_result=True)
     
     @property
     def azure(self):
@@ -39,29 +59,152 @@ class LLMService:
         task_type: Optional[str] = None
     ) -> str:
         """Generate text using best available LLM."""
-        if self.using_azure:
-            try:
-                return self.azure.generate(prompt, system, temperature)
-            except Exception as e:
-                logger.warning(f"Azure failed, falling back to Ollama: {e}")
+        def call(provider: str, model: str, fallback: bool) -> str:
+            if provider == "azure":
+                return self._timed("azure", model, task_type, self.azure.generate, prompt, system, temperature,
+                                   fallback=fallback)
+            return self._timed("ollama", model, task_type, self.ollama.generate, fallback=fallback,
+                               prompt=prompt, system=system, temperature=temperature, task_type=task_type)
         
-        return self.ollama.generate(
-            prompt=prompt,
-            system=system,
-            temperature=temperature,
-            task_type=task_type
-        )
+        return self._coalesced(self._text_flight, (prompt, system, temperature, task_type),
+                               lambda: self._with_fallback(self.route(task_type), call), task_type)
     
     def generate_json(self, prompt: str, task_type: str = None, system: str = None):
-        """Generate JSON, Azure only - no Ollama fallback."""
-        if self.azure:
+        """Generate JSON; Ollama is only used when llm_json_ollama_fallback is set."""
+        def call(provider: str, model: str, fallback: bool):
+            if provider == "azure":
+                return self._timed("azure", model, task_type, self.azure.generate_json, prompt, system=system,
+                                   fallback=fallback)
+            return self._timed("ollama", model, task_type, self.ollama.generate_json, fallback=fallback,
+                               prompt=prompt, task_type=task_type, system=system)
+        
+        def run():
+            candidates = self.route(task_type, json_mode=True)
+            if not candidates and not self.using_azure:
+                raise ValueError("Azure not configured")
+            return self._with_fallback(candidates, call)
+        
+        return self._coalesced(self._json_flight, (prompt, system, task_type), run, task_type, json_mode=True)
+    
+    def stream_json(self, prompt: str, task_type: str = None, system: str = None) -> JSONStream:
+        """Stream JSON: iterate for (key, element) as result array elements complete; .value afterwards.
+        
+        Falls back to the next provider only if the stream fails before its first chunk.
+        """
+        def chunks() -> Iterator[str]:
+            candidates = self.route(task_type, json_mode=True)
+            if not candidates:
+                if not self.using_azure:
+                    raise ValueError("Azure not configured")
+                raise CircuitOpenError("All LLM providers are unavailable (circuits open)")
+            
+            for i, (provider, model) in enumerate(candidates):
+                if provider == "azure":
+                    stream = self.azure.generate_stream(prompt, system=system)
+                else:
+                    stream = self.ollama.generate_stream(prompt, task_type=task_type, system=system)
+                started = False
+                try:
+                    for chunk in self._timed_stream(provider, model, task_type, stream, fallback=i > 0):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started or i == len(candidates) - 1:
+                        logger.error(f"{provider.title()} stream failed: {e}")
+                        raise
+                    logger.warning(f"{provider.title()} failed, falling back to {candidates[i + 1][0].title()}: {e}")
+        
+        return JSONStream(chunks())
+    
+    def _coalesced(self, flight: SingleFlight, key: Tuple, run: Callable, task_type: Optional[str],
+                   json_mode: bool = False):
+        if not settings.single_flight_enabled:
+            return run()
+        return flight.do(key, run, follower=lambda: self._shared_result(task_type, json_mode))
+    
+    @contextmanager
+    def _shared_result(self, task_type: Optional[str], json_mode: bool):
+        """Trace a single-flight follower: served another caller's result, no provider call."""
+        provider, model = (self.route(task_type, json_mode) or [("none", None)])[0]
+        with llm_trace_service.trace(provider, model, task_type):
+            note_cache_hit()
+            yield
+    
+    def route(self, task_type: Optional[str] = None, json_mode: bool = False) -> List[Tuple[str, str]]:
+        """(provider, model) pairs to try, in order; providers with an open breaker are left out."""
+        candidates = []
+        if self.using_azure:
+            candidates.append(("azure", self.azure.deployment))
+        if not json_mode or settings.llm_json_ollama_fallback:
+            model = self.ollama.get_model_for_task(task_type) if task_type else settings.ollama_routing_model
+            candidates.append(("ollama", model))
+        
+        # A breaker past its cooldown keeps its place, so the preferred provider gets probed
+        available = [c for c in candidates if self._available(*c)]
+        if not settings.llm_prefer_faster_provider:
+            return available
+        
+        def latency(candidate):
+            # Without latency data keep the configured order
+            latency_ms = circuit_breakers.get(*candidate).latency_ms
+            return latency_ms if latency_ms is not None else float("inf")
+        
+        # sorted() is stable, so ties keep Azure first
+        return sorted(available, key=latency)
+    
+    def _available(self, provider: str, model: str) -> bool:
+        if circuit_breakers.get(provider, model).available():
+            return True
+        # OllamaClient falls back to its fallback model on its own
+        return provider == "ollama" and circuit_breakers.get("ollama", self.ollama.fallback_model).available()
+    
+    def _with_fallback(self, candidates: List[Tuple[str, str]], call: Callable):
+        if not candidates:
+            raise CircuitOpenError("All LLM providers are unavailable (circuits open)")
+        
+        for i, (provider, model) in enumerate(candidates):
             try:
-                return self.azure.generate_json(prompt, system=system)
+                return call(provider, model, i > 0)
             except Exception as e:
-                logger.error(f"Azure failed: {e}")
-                raise  # Don't fall back to Ollama
-        
-        raise ValueError("Azure not configured")
+                if i == len(candidates) - 1:
+                    logger.error(f"{provider.title()} failed: {e}")
+                    raise
+                logger.warning(f"{provider.title()} failed, falling back to {candidates[i + 1][0].title()}: {e}")
+    
+    def _timed(self, provider: str, model: str, task_type: Optional[str], call: Callable, /, *args,
+               fallback: bool = False, **kwargs):
+        """Run one provider call in a scheduler slot, recording latency, outcome and a trace."""
+        with self._instrumented(provider, model, task_type, fallback):
+            return call(*args, **kwargs)
+    
+    def _timed_stream(self, provider: str, model: str, task_type: Optional[str], stream: Iterator[str],
+                      fallback: bool = False) -> Iterator[str]:
+        """Like _timed, holding the slot until the stream is exhausted."""
+        with self._instrumented(provider, model, task_type, fallback):
+            yield from stream
+    
+    @contextmanager
+    def _instrumented(self, provider: str, model: str, task_type: Optional[str], fallback: bool):
+        labels = (provider, model, task_type or "default")
+        try:
+            with llm_scheduler.slot(provider, model, task_type or "default"):
+                start = time.perf_counter()
+                try:
+                    with llm_trace_service.trace(provider, model, task_type, fallback=fallback):
+                        yield
+                finally:
+                    LLM_LATENCY.observe(time.perf_counter() - start, *labels)
+        except QueueTimeout:
+            LLM_REQUESTS.inc(*labels, "queue_timeout")
+            raise
+        except CircuitOpenError:
+            LLM_REQUESTS.inc(*labels, "rejected")
+            raise
+        except Exception:
+            LLM_REQUESTS.inc(*labels, "error")
+            raise
+        LLM_REQUESTS.inc(*labels, "ok")
     
     def test_connection(self) -> Dict[str, bool]:
         """Test all LLM connections."""
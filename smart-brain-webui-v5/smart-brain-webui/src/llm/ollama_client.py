@@ -1,12 +1,15 @@
 """Ollama LLM client."""
 
-import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterator, List
 import ollama
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from src.config import settings
+from src.llm.circuit_breaker import circuit_breakers, CircuitOpenError
+from src.llm.json_stream import parse_json
+from src.llm.prompt_builder import context_window
+from src.services.llm_trace_service import note_attempt, note_usage, note_fallback
 
 
 class OllamaClient:
@@ -26,7 +29,9 @@ class OllamaClient:
         }
         return model_map.get(task_type, settings.ollama_routing_model)
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    # An open breaker won't close within the backoff, so don't retry on it
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10),
+           retry=retry_if_not_exception_type(CircuitOpenError))
     def generate(
         self,
         prompt: str,
@@ -52,14 +57,18 @@ class OllamaClient:
             
             logger.debug(f"Generating with {selected_model} (task: {task_type}): {prompt[:100]}...")
             
-            response = self.client.chat(
-                model=selected_model,
-                messages=messages,
-                options={"temperature": temperature},
-                format=format
-            )
+            with circuit_breakers.get("ollama", selected_model).guard():
+                note_attempt()
+                response = self.client.chat(
+                    model=selected_model,
+                    messages=messages,
+                    # Match the window prompts are budgeted for; Ollama's default is much smaller
+                    options={"temperature": temperature, "num_ctx": context_window("ollama", selected_model)},
+                    format=format
+                )
             
             result = response['message']['content']
+            note_usage(response.get('prompt_eval_count'), response.get('eval_count'))
             logger.debug(f"Generated {len(result)} chars")
             return result
             
@@ -67,6 +76,7 @@ class OllamaClient:
             logger.warning(f"Model {selected_model} failed: {e}")
             if selected_model != self.fallback_model:
                 logger.info(f"Falling back to {self.fallback_model}")
+                note_fallback(self.fallback_model)
                 return self.generate(
                     prompt=prompt,
                     model=self.fallback_model,
@@ -89,20 +99,51 @@ class OllamaClient:
             system=system, temperature=0.3, format="json"
         )
         
-        response = response.strip()
-        if response.startswith("```json"):
-            response = response[7:]
-        if response.startswith("```"):
-            response = response[3:]
-        if response.endswith("```"):
-            response = response[:-3]
-        response = response.strip()
-        
         try:
-            return json.loads(response)
-        except json.JSONDecodeError as e:
+            return parse_json(response)
+        except ValueError:
             logger.error(f"Failed to parse JSON: {response[:200]}")
-            raise ValueError(f"Invalid JSON response: {e}")
+            raise
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        task_type: Optional[str] = None,
+        system: Optional[str] = None,
+        temperature: float = 0.3,
+        format: Optional[str] = "json"
+    ) -> Iterator[str]:
+        """Stream completion text; falls back to the fallback model only before the first chunk."""
+        selected_model = model or (self.get_model_for_task(task_type) if task_type else settings.ollama_routing_model)
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        
+        started = False
+        try:
+            with circuit_breakers.get("ollama", selected_model).guard():
+                note_attempt()
+                for part in self.client.chat(
+                    model=selected_model,
+                    messages=messages,
+                    options={"temperature": temperature, "num_ctx": context_window("ollama", selected_model)},
+                    format=format,
+                    stream=True
+                ):
+                    if part.get('done'):
+                        note_usage(part.get('prompt_eval_count'), part.get('eval_count'))
+                    content = part['message']['content']
+                    if content:
+                        started = True
+                        yield content
+        except Exception as e:
+            if started or selected_model == self.fallback_model:
+                raise
+            logger.warning(f"Model {selected_model} failed, streaming from {self.fallback_model}: {e}")
+            note_fallback(self.fallback_model)
+            yield from self.generate_stream(prompt, self.fallback_model, task_type, system, temperature, format)
     
     def test_connection(self) -> bool:
         """Test Ollama connection and check models."""
@@ -0,0 +1,196 @@
+"""Token-budgeted prompt assembly.
+
+Prompts are built from named sections. build() estimates tokens locally,
+drops lines an optional section repeats from a higher-priority one (the
+same boilerplate pasted into two context blocks, say), and when the prompt
+is over budget trims optional sections line by line, lowest priority first,
+noting how much was cut. Required sections (instructions, the user's text) are
+never cut: if they alone exceed the budget build() raises PromptTooLarge, and
+the caller splits its input into smaller requests (room_for() says how much
+fits).
+
+The budget is the smallest context window among the providers the call may
+be routed to (settings.llm_context_windows), less llm_prompt_output_reserve
+for the response, capped at llm_prompt_max_tokens.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+from src.config import settings
+from src.llm.scheduler import parse_limits
+from src.services.metrics_service import LLM_PROMPT_TOKENS, LLM_PROMPT_TRIMMED_TOKENS
+
+
+# Words, numbers and single symbols; BPE vocabularies average ~4 characters per word piece
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_CHARS_PER_TOKEN = 4
+
+_windows = parse_limits(settings.llm_context_windows)
+
+_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+class PromptTooLarge(ValueError):
+    """Required sections alone exceed the prompt budget."""
+    
+    def __init__(self, stage: str, tokens: int, budget: int):
+        super().__init__(f"Prompt for {stage} needs {tokens} tokens for required sections, budget is {budget}")
+        self.stage = stage
+        self.tokens = tokens
+        self.budget = budget
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count without a tokenizer."""
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        count += -(-len(piece) // _CHARS_PER_TOKEN) if piece[0].isalnum() or piece[0] == "_" else 1
+    return count
+
+
+def context_window(provider: str, model: str) -> int:
+    """Configured context window for a provider/model, in tokens."""
+    return _windows.get(f"{provider}/{model}", _windows.get(provider, 8192))
+
+
+def prompt_budget(task_type: Optional[str], json_mode: bool = True) -> int:
+    """Prompt token budget for a call that may go to any routed provider."""
+    from src.llm.llm_service import llm_service
+    
+    windows = [context_window(provider, model) for provider, model in llm_service.route(task_type, json_mode)]
+    window = min(windows) if windows else context_window("ollama", settings.ollama_routing_model)
+    return max(256, min(settings.llm_prompt_max_tokens, window - settings.llm_prompt_output_reserve))
+
+
+def prompt_stats() -> Dict[str, Dict[str, Any]]:
+    """Prompt sizes per stage since startup."""
+    with _stats_lock:
+        return {stage: dict(s) for stage, s in sorted(_stats.items())}
+
+
+@dataclass
+class Section:
+    name: str
+    text: str
+    priority: int = 0
+    required: bool = False
+    # Hard cap regardless of the overall budget; optional sections only
+    max_tokens: Optional[int] = None
+    # Kept above the section's lines, dropped with them if nothing survives
+    header: str = ""
+
+
+class PromptBuilder:
+    """Collect sections in prompt order, then fit them to a token budget."""
+    
+    def __init__(self, stage: str, task_type: Optional[str] = None, budget: Optional[int] = None,
+                 json_mode: bool = True):
+        self.stage = stage
+        self.budget = budget if budget is not None else prompt_budget(task_type or stage, json_mode)
+        self.sections: List[Section] = []
+    
+    def add(self, name: str, text: str, priority: int = 0, required: bool = False,
+            max_tokens: Optional[int] = None, header: str = "") -> "PromptBuilder":
+        self.sections.append(Section(name, text, priority, required, max_tokens, header))
+        return self
+    
+    def build(self) -> str:
+        kept = {s.name: self._dedupe(s) for s in self.sections}
+        for s in self.sections:
+            if s.max_tokens is not None and not s.required:
+                kept[s.name] = self._trim(s, kept[s.name], s.max_tokens)
+        
+        sizes = {name: estimate_tokens("\n".join(lines)) for name, lines in kept.items()}
+        required = sum(sizes[s.name] for s in self.sections if s.required)
+        if required > self.budget:
+            raise PromptTooLarge(self.stage, required, self.budget)
+        over = sum(sizes.values()) - self.budget
+        
+        # Only optional sections are trimmed, lowest priority first
+        order = sorted((s for s in self.sections if not s.required), key=lambda s: s.priority)
+        for s in order:
+            if over <= 0:
+                break
+            target = max(0, sizes[s.name] - over)
+            kept[s.name] = self._trim(s, kept[s.name], target)
+            new_size = estimate_tokens("\n".join(kept[s.name]))
+            over -= sizes[s.name] - new_size
+            sizes[s.name] = new_size
+        
+        parts = []
+        for s in self.sections:
+            lines = kept[s.name]
+            if lines:
+                parts.append("\n".join(([s.header] if s.header else []) + lines))
+        prompt = "\n\n".join(parts)
+        self._report(prompt)
+        return prompt
+    
+    def room_for(self, name: str) -> int:
+        """Tokens section `name` may use next to the other required sections."""
+        others = sum(estimate_tokens(s.text.strip("\n")) for s in self.sections if s.required and s.name != name)
+        return self.budget - others
+    
+    def _dedupe(self, section: Section) -> List[str]:
+        """Optional section's lines minus repeats of a section that is trimmed after it."""
+        lines = section.text.strip("\n").split("\n")
+        if section.required:
+            return lines
+        rank = (section.required, section.priority)
+        seen = set()
+        for i, other in enumerate(self.sections):
+            # Same rank: the earlier section keeps the line
+            if other is not section and (
+                    (other.required, other.priority) > rank
+                    or ((other.required, other.priority) == rank and i < self.sections.index(section))):
+                seen.update(_norm(line) for line in other.text.split("\n"))
+        out = []
+        for line in lines:
+            key = _norm(line)
+            if key and key in seen:
+                continue
+            seen.add(key)
+            out.append(line)
+        return out if any(line.strip() for line in out) else []
+    
+    def _trim(self, section: Section, lines: List[str], target: int) -> List[str]:
+        """Keep leading lines up to `target` tokens; a single long line is cut by characters."""
+        total = estimate_tokens("\n".join(lines))
+        if total <= target:
+            return lines
+        
+        if len(lines) == 1:
+            text = lines[0][:max(0, target * _CHARS_PER_TOKEN - 20)]
+            out = [text + " [...truncated]"] if text else []
+        else:
+            out, used = [], 0
+            for line in lines:
+                cost = estimate_tokens(line) + 1
+                if used + cost > target - 10:
+                    break
+                out.append(line)
+                used += cost
+            if out and len(out) < len(lines):
+                out.append(f"(... {len(lines) - len(out)} more omitted)")
+        
+        LLM_PROMPT_TRIMMED_TOKENS.inc(self.stage, section.name,
+                                      amount=total - estimate_tokens("\n".join(out)))
+        return out
+    
+    def _report(self, prompt: str):
+        tokens = estimate_tokens(prompt)
+        LLM_PROMPT_TOKENS.observe(tokens, self.stage)
+        with _stats_lock:
+            s = _stats.setdefault(self.stage, {"builds": 0, "last_tokens": 0, "max_tokens": 0, "budget": 0})
+            s["builds"] += 1
+            s["last_tokens"] = tokens
+            s["max_tokens"] = max(s["max_tokens"], tokens)
+            s["budget"] = self.budget
+
+
+def _norm(line: str) -> str:
+    return " ".join(line.strip(" -*\t").lower().split())
@@ -0,0 +1,224 @@
+"""Concurrency caps and priority queuing for LLM calls.
+
+Every provider has a fixed number of slots (settings.llm_concurrency_limits),
+shared by all of its models: "ollama=2" means two concurrent calls to the
+Ollama server whichever models they use. A "provider/model" entry caps that
+model's lane within the provider's slots. Calls take a slot or queue for
+one. Freed slots go to interactive callers first; background callers never
+take the last llm_interactive_reserved_slots slots, so a bulk job can't
+leave a user-facing request queued behind it. Within a priority class,
+models and then stages (task_type) are served round-robin, so one bulk
+stage can't starve another.
+
+The priority comes from a ContextVar, so endpoints set it once and every
+LLM call beneath them inherits it (asyncio.to_thread copies the context):
+
+    with llm_priority(BACKGROUND):
+        await asyncio.to_thread(brain_dump_service.process_brain_dump, ...)
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Tuple
+
+from src.config import settings
+from src.services.metrics_service import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT, LLM_QUEUE_TIMEOUTS, LLM_SLOTS_IN_USE
+
+
+INTERACTIVE, BACKGROUND = "interactive", "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    """Run the block's LLM calls at the given priority class."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QueueTimeout(Exception):
+    """Waited longer than the priority's queue timeout for an LLM slot."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "granted")
+    
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+
+
+def _limit(capacity: int, priority: str) -> int:
+    """Slots a priority class may fill; background leaves the reserved ones free."""
+    if priority == BACKGROUND:
+        return capacity - min(settings.llm_interactive_reserved_slots, capacity - 1)
+    return capacity
+
+
+class _Lane:
+    def __init__(self, provider: str, model: str, capacity: int):
+        self.provider = provider
+        self.model = model
+        self.capacity = capacity
+        self.active = 0
+        # priority -> stage -> waiters; stages rotate to the back when served
+        self.queues: Dict[str, OrderedDict] = {p: OrderedDict() for p in PRIORITIES}
+    
+    def depth(self, priority: str) -> int:
+        return sum(len(q) for q in self.queues[priority].values())
+
+
+class _Pool:
+    """A provider's slots, shared by its model lanes."""
+    
+    def __init__(self, provider: str, capacity: int):
+        self.provider = provider
+        self.capacity = capacity
+        self.active = 0
+        # model -> lane; lanes rotate to the back when served
+        self.lanes: OrderedDict = OrderedDict()
+    
+    def can_start(self, lane: _Lane, priority: str) -> bool:
+        return (lane.active < _limit(lane.capacity, priority)
+                and self.active < _limit(self.capacity, priority))
+    
+    def depth(self, priority: str) -> int:
+        return sum(lane.depth(priority) for lane in self.lanes.values())
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """'ollama=2,azure=8,ollama/qwen2.5:14b=1' -> {key: slots}."""
+    limits = {}
+    for part in spec.split(","):
+        key, _, value = part.strip().rpartition("=")
+        if key:
+            limits[key.strip()] = max(1, int(value))
+    return limits
+
+
+class LLMScheduler:
+    """Per-provider slots, subdivided per model, with interactive-first, round-robin queuing."""
+    
+    def __init__(self):
+        self._pools: Dict[str, _Pool] = {}
+        self._lock = threading.Lock()
+        self._limits = parse_limits(settings.llm_concurrency_limits)
+    
+    def _lane(self, provider: str, model: str) -> Tuple[_Pool, _Lane]:
+        pool = self._pools.get(provider)
+        if pool is None:
+            pool = self._pools[provider] = _Pool(provider, self._limits.get(provider, 4))
+        lane = pool.lanes.get(model)
+        if lane is None:
+            capacity = min(self._limits.get(f"{provider}/{model}", pool.capacity), pool.capacity)
+            lane = pool.lanes[model] = _Lane(provider, model, capacity)
+            # Not served yet, so ahead of the lanes that have been
+            pool.lanes.move_to_end(model, last=False)
+        return pool, lane
+    
+    @contextmanager
+    def slot(self, provider: str, model: str, stage: str = "default"):
+        """Hold one of the provider's slots (within the model's cap) for the duration of the block."""
+        priority = _priority.get()
+        waiter = _Waiter(priority)
+        start = time.perf_counter()
+        
+        with self._lock:
+            pool, lane = self._lane(provider, model)
+            # Go straight in only if nobody of equal or higher priority is already waiting for this model
+            ahead = any(lane.depth(p) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+            if not ahead and pool.can_start(lane, priority):
+                self._start(pool, lane)
+                waiter.granted = True
+            else:
+                lane.queues[priority].setdefault(stage, deque()).append(waiter)
+            self._publish(pool)
+        
+        if not waiter.granted:
+            timeout = (settings.llm_queue_timeout_interactive_seconds if priority == INTERACTIVE
+                       else settings.llm_queue_timeout_background_seconds)
+            waiter.event.wait(timeout)
+            with self._lock:
+                if not waiter.granted:
+                    self._remove(lane, priority, stage, waiter)
+                    self._publish(pool)
+                    LLM_QUEUE_TIMEOUTS.inc(provider, model, priority)
+                    raise QueueTimeout(f"No {provider}/{model} slot within {timeout:.0f}s ({priority})")
+        LLM_QUEUE_WAIT.observe(time.perf_counter() - start, provider, model, priority)
+        
+        try:
+            yield
+        finally:
+            with self._lock:
+                lane.active -= 1
+                pool.active -= 1
+                self._dispatch(pool)
+                self._publish(pool)
+    
+    @staticmethod
+    def _start(pool: _Pool, lane: _Lane):
+        lane.active += 1
+        pool.active += 1
+        pool.lanes.move_to_end(lane.model)
+    
+    def _dispatch(self, pool: _Pool):
+        """Hand free slots to waiters: interactive first, then models and stages round-robin."""
+        for priority in PRIORITIES:
+            served = True
+            while served:
+                served = False
+                for lane in list(pool.lanes.values()):
+                    queues = lane.queues[priority]
+                    if not queues or not pool.can_start(lane, priority):
+                        continue
+                    stage, waiters = next(iter(queues.items()))
+                    waiter = waiters.popleft()
+                    if waiters:
+                        queues.move_to_end(stage)
+                    else:
+                        del queues[stage]
+                    self._start(pool, lane)
+                    waiter.granted = True
+                    waiter.event.set()
+                    served = True
+                    break
+    
+    @staticmethod
+    def _remove(lane: _Lane, priority: str, stage: str, waiter: _Waiter):
+        waiters = lane.queues[priority].get(stage)
+        if waiters is not None:
+            waiters.remove(waiter)
+            if not waiters:
+                del lane.queues[priority][stage]
+    
+    @staticmethod
+    def _publish(pool: _Pool):
+        for lane in pool.lanes.values():
+            LLM_SLOTS_IN_USE.set(lane.active, lane.provider, lane.model)
+            for priority in PRIORITIES:
+                LLM_QUEUE_DEPTH.set(lane.depth(priority), lane.provider, lane.model, priority)
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{
+                "provider": pool.provider, "capacity": pool.capacity, "in_use": pool.active,
+                "models": [{
+                    "model": lane.model, "capacity": lane.capacity, "in_use": lane.active,
+                    "queued": {p: {stage: len(w) for stage, w in lane.queues[p].items()} for p in PRIORITIES}
+                } for _, lane in sorted(pool.lanes.items())]
+            } for _, pool in sorted(self._pools.items())]
+
+
+# Global instance
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,60 @@
+"""Single-flight deduplication for identical in-flight model calls.
+
+The first caller for a key runs the call; callers that arrive with the same
+key while it is still running wait on its Future and get the same result (or
+exception) instead of sending a duplicate request. Nothing is kept once the
+call finishes, so this is not a cache: a later identical call runs again.
+A caller can pass a `follower` context manager factory to wrap the wait when
+it is served someone else's result, e.g. to trace it as a cache hit.
+"""
+
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, ContextManager, Dict, Hashable, Optional
+
+from src.services.metrics_service import SINGLE_FLIGHT_CALLS
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key."""
+    
+    def __init__(self, name: str, copy_result: bool = False):
+        self.name = name
+        # Hand followers a deep copy when callers may mutate the result (parsed JSON)
+        self.copy_result = copy_result
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: Hashable, fn: Callable[[], Any],
+           follower: Optional[Callable[[], ContextManager]] = None) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(self.name, "coalesced")
+            if follower is None:
+                result = future.result()
+            else:
+                with follower():
+                    result = future.result()
+            return copy.deepcopy(result) if self.copy_result else result
+        
+        SINGLE_FLIGHT_CALLS.inc(self.name, "executed")
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+    
+    def _finish(self, key: Hashable):
+        # Drop the key before publishing, so a caller arriving now starts a fresh call
+        with self._lock:
+            self._inflight.pop(key, None)
@@ -1,10 +1,10 @@
 """Adaptive onboarding with dynamic question flow."""
 
-import sqlite3
 from typing import List, Dict, Optional
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 class AdaptiveOnboardingService:
@@ -16,7 +16,7 @@ class AdaptiveOnboardingService:
     
     def _ensure_tables(self):
         """Create onboarding tables."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -132,7 +132,7 @@ class AdaptiveOnboardingService:
         """Save onboarding answers and setup system."""
         logger.info(f"Saving onboarding answers: {list(answers.keys())}")
         
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Save answers
@@ -183,7 +183,7 @@ class AdaptiveOnboardingService:
     
     def is_complete(self) -> bool:
         """Check if onboarding done."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT completed FROM onboarding_state WHERE id = 1")
         row = cursor.fetchone()
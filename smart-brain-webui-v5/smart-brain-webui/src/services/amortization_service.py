@@ -0,0 +1,186 @@
+"""Vectorized loan amortization and what-if payoff simulation.
+
+Balances follow the closed form
+    B_k = B_0 (1+r)^k - P ((1+r)^k - 1) / r - sum_{m<=k} L_m (1+r)^(k-m)
+so a whole batch of schedules (loans x scenarios) is computed as one set
+of array operations instead of a month-by-month loop.
+"""
+
+import calendar
+from datetime import date
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+# Hard cap on schedule length (50 years) for payments that never amortize
+MAX_MONTHS = 600
+
+
+def add_months(start: date, months: int, day: Optional[int] = None) -> date:
+    """Shift a date by whole months, clamping to the end of shorter months."""
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    day = day or start.day
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def next_payment_date(due_day: Optional[int], today: date) -> date:
+    """First payment on or after today on the given day of month."""
+    due_day = due_day or 1
+    candidate = add_months(today.replace(day=1), 0, due_day)
+    return candidate if candidate >= today else add_months(today.replace(day=1), 1, due_day)
+
+
+class AmortizationService:
+    """Batch amortization engine backed by NumPy."""
+    
+    def monthly_payment(self, principal: float, annual_rate: float, term_months: int) -> float:
+        """Standard fixed payment that retires principal in term_months."""
+        if annual_rate == 0:
+            return round(principal / term_months, 2)
+        
+        monthly_rate = annual_rate / 100 / 12
+        growth = (1 + monthly_rate) ** term_months
+        return round(principal * monthly_rate * growth / (growth - 1), 2)
+    
+    def simulate(self, balances, annual_rates, payments,
+                 lump_sums: Optional[np.ndarray] = None, max_months: int = MAX_MONTHS) -> Dict[str, np.ndarray]:
+        """Compute schedules for a batch of rows at once.
+        
+        lump_sums is an optional (rows, months) array of one-off principal
+        payments applied after month k's regular payment. Returns per-row
+        payoff month (-1 if not paid off within max_months), total interest
+        and the (rows, months) interest/principal/balance matrices.
+        """
+        B = np.asarray(balances, dtype=float)[:, None]
+        r = np.asarray(annual_rates, dtype=float)[:, None] / 100 / 12
+        P = np.asarray(payments, dtype=float)[:, None]
+        
+        months = self._horizon(B, r, P, max_months)
+        k = np.arange(1, months + 1)[None, :]
+        growth = (1 + r) ** k
+        annuity = np.where(r > 0, (growth - 1) / np.where(r > 0, r, 1), k)
+        raw = B * growth - P * annuity
+        
+        if lump_sums is not None:
+            lumps = np.zeros((len(B), months))
+            width = min(months, lump_sums.shape[1])
+            lumps[:, :width] = lump_sums[:, :width]
+            raw -= growth * np.cumsum(lumps / growth, axis=1)
+        
+        # Payments are rounded to the cent, so the closed form can leave a few
+        # cents (up to half a cent per payment, grown with interest) at the end
+        # of the term. Anything within that tolerance is paid in that month,
+        # folded into its principal.
+        tolerance = 0.005 * (annuity + 1)
+        done = raw <= tolerance
+        paid_off = done.any(axis=1)
+        payoff = np.where(paid_off, done.argmax(axis=1) + 1, -1)
+        active = k <= np.where(paid_off, payoff, months)[:, None]
+        
+        balance = np.where(active & ~done, raw, 0.0)
+        opening = np.hstack([B, balance[:, :-1]])
+        interest = np.where(active, opening * r, 0.0)
+        principal = np.where(active, opening - balance, 0.0)
+        
+        return {
+            "payoff_month": payoff,
+            "total_interest": interest.sum(axis=1),
+            "interest": interest,
+            "principal": principal,
+            "balance": balance,
+        }
+    
+    def _horizon(self, B: np.ndarray, r: np.ndarray, P: np.ndarray, max_months: int) -> int:
+        """Longest payoff in the batch without lump sums (lump sums only shorten it)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = 1 - r * B / P
+            n = np.where(r > 0, -np.log(ratio) / np.log1p(r), B / P)
+        n = np.where(np.isfinite(n) & (P > 0), np.ceil(n), max_months)
+        return int(min(max(n.max(), 1), max_months))
+    
+    def compare_scenarios(self, loans: List[Dict[str, Any]], scenarios: List[Dict[str, Any]],
+                          today: Optional[date] = None) -> Dict[str, Any]:
+        """Run the baseline plus every scenario for every loan in a single batch.
+        
+        Scenarios accept: name, extra_monthly, lump_sums ({month: amount}),
+        interest_rate (refinance rate) and term_months (refinance term,
+        recomputes the payment).
+        """
+        today = today or date.today()
+        runs = [{"name": "baseline"}] + list(scenarios)
+        
+        rows = []
+        for loan in loans:
+            for run in runs:
+                rate = run.get("interest_rate")
+                rate = loan["interest_rate"] if rate is None else rate
+                payment = loan["monthly_payment"] or 0.0
+                if run.get("term_months"):
+                    payment = self.monthly_payment(loan["current_balance"], rate, run["term_months"])
+                rows.append((loan["current_balance"] or 0.0, rate, payment + (run.get("extra_monthly") or 0.0)))
+        
+        balances, rates, payments = (np.array(col, dtype=float) for col in zip(*rows))
+        
+        lump_months = [int(m) for run in runs for m in (run.get("lump_sums") or {})]
+        lump_sums = None
+        if lump_months:
+            lump_sums = np.zeros((len(rows), min(max(lump_months), MAX_MONTHS)))
+            for i in range(len(rows)):
+                for month, amount in (runs[i % len(runs)].get("lump_sums") or {}).items():
+                    if 1 <= int(month) <= lump_sums.shape[1]:
+                        lump_sums[i, int(month) - 1] += amount
+        
+        result = self.simulate(balances, rates, payments, lump_sums)
+        payoff = result["payoff_month"].reshape(len(loans), len(runs))
+        interest = result["total_interest"].reshape(len(loans), len(runs))
+        monthly = payments.reshape(len(loans), len(runs))
+        
+        loan_results = []
+        for i, loan in enumerate(loans):
+            first_payment = next_payment_date(loan.get("payment_due_day"), today)
+            base_months, base_interest = payoff[i, 0], interest[i, 0]
+            outcomes = []
+            for j, run in enumerate(runs):
+                months = int(payoff[i, j])
+                outcomes.append({
+                    "name": run.get("name") or f"scenario_{j}",
+                    "monthly_payment": round(float(monthly[i, j]), 2),
+                    "months": months if months > 0 else None,
+                    "payoff_date": add_months(first_payment, months - 1, loan.get("payment_due_day")).isoformat() if months > 0 else None,
+                    "total_interest": round(float(interest[i, j]), 2),
+                    "interest_saved": round(float(base_interest - interest[i, j]), 2),
+                    "months_saved": int(base_months - months) if months > 0 and base_months > 0 else None,
+                })
+            loan_results.append({
+                "loan_id": loan["id"],
+                "name": loan["name"],
+                "current_balance": loan["current_balance"],
+                "baseline": outcomes[0],
+                "scenarios": outcomes[1:],
+            })
+        
+        totals = []
+        for j, run in enumerate(runs[1:], start=1):
+            paid = payoff[:, j] > 0
+            last = max((r["scenarios"][j - 1]["payoff_date"] for r in loan_results if r["scenarios"][j - 1]["payoff_date"]), default=None)
+            totals.append({
+                "name": run.get("name") or f"scenario_{j}",
+                "interest_saved": round(float((interest[:, 0] - interest[:, j]).sum()), 2),
+                "debt_free_date": last if paid.all() else None,
+            })
+        
+        baseline_dates = [r["baseline"]["payoff_date"] for r in loan_results]
+        return {
+            "loans": loan_results,
+            "baseline": {
+                "total_interest": round(float(interest[:, 0].sum()), 2),
+                "debt_free_date": max(baseline_dates) if baseline_dates and all(baseline_dates) else None,
+            },
+            "scenarios": totals,
+        }
+
+
+# Global instance
+amortization_service = AmortizationService()
@@ -13,6 +13,92 @@ from loguru import logger
 
 from src.llm.llm_service import llm_service as llm
 from src.config import settings
+from src.storage.database import connect
+from src.llm.prompt_builder import PromptBuilder, PromptTooLarge, estimate_tokens
+
+
+# Static part of the prompt; group definitions live in step 2 only, not repeated as separate rules
+BRAIN_DUMP_INSTRUCTIONS = """Analyze this completely and return a structured JSON response.
+
+YOUR TASKS:
+1. IDENTIFY GROUPS - Find organizational headers
+2. CLASSIFY GROUPS using this hierarchy:
+   - PLATFORM: User owns/builds, top-level, has sub-components (like iOS, ECMP)
+   - MODULE: User owns, major subsystem with children, part of a platform (ECMP AI under ECMP)
+   - SERVICE: User owns, leaf-level capability (RAG, Consent, Messaging)
+   - SYSTEM: External tool/service user integrates WITH but doesn't own (TIP.AI, AEM, Syniverse, GXP)
+   - PERSON: Human being
+3. DETECT HIERARCHY - "ECMP AI" under "ECMP", "ECMP RAG" under "ECMP AI"
+4. MERGE DUPLICATES - "ECMP NOTES" and "ECMP" are the same
+5. FILTER GARBAGE - Skip "---", "yes", meaningless items
+6. FIX TYPOS - Clean up obvious typos
+7. CLASSIFY ITEMS - task, note, idea, question, decision, reference
+
+ITEM TYPE RULES:
+- TASK: Has action verb (need to, should, must, talk to, create, fix, send)
+- NOTE: Pure fact/info (is, has, will, uses, supports)
+- QUESTION: Contains "?" or "what if"
+- IDEA: Exploration (could, might, maybe)
+- DECISION: "decided", "agreed", "we will"
+- REFERENCE: URLs, doc links
+
+RETURN THIS JSON STRUCTURE:
+{
+  "groups": [
+    {
+      "name": "Canonical Name",
+      "type": "platform|module|service|system|person",
+      "parent": "Parent group name or null",
+      "confidence": 0.85,
+      "reason": "Why this classification",
+      "merged_from": ["ECMP NOTES", "ECMP"],
+      "items_count": 14,
+      "integrates_with": ["TIP.AI"]
+    }
+  ],
+  "hierarchy": [
+    {
+      "child": "ECMP AI",
+      "parent": "ECMP",
+      "reason": "ECMP AI is a module within ECMP platform"
+    }
+  ],
+  "items": [
+    {
+      "type": "task|note|idea|question|decision|reference",
+      "text": "Cleaned up text",
+      "original": "Original messy text",
+      "group": "Which group this belongs to",
+      "person": "Person mentioned or null",
+      "priority": "high|medium|low",
+      "tags": ["relevant", "tags"]
+    }
+  ],
+  "ambiguous": [
+    {
+      "text": "vague text",
+      "question": "What is this?",
+      "suggestions": ["option 1", "option 2"]
+    }
+  ],
+  "people_mentioned": [
+    {"name": "Chris Hunter", "context": "Owns AEM integration"}
+  ],
+  "typos_fixed": [
+    {"from": "synbiverse", "to": "Syniverse"}
+  ],
+  "garbage_filtered": ["---", "yes"],
+  "summary": {
+    "total_raw_lines": 50,
+    "total_useful_items": 42,
+    "garbage_removed": 8,
+    "typos_fixed": 3,
+    "groups_found": 5,
+    "groups_merged": 2
+  }
+}
+
+Be thorough. Return ONLY valid JSON."""
 
 
 class EntityCache:
@@ -24,7 +110,7 @@ class EntityCache:
     
     def _ensure_tables(self):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path)
             
             # Learned entities table
             conn.execute("""
@@ -69,7 +155,7 @@ class EntityCache:
     
     def get_all(self) -> Dict[str, Dict]:
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path)
             cursor = conn.execute("SELECT name, entity_type, canonical_name, user_corrected FROM learned_entities")
             result = {}
             for row in cursor:
@@ -85,7 +171,7 @@ class EntityCache:
     
     def save(self, name: str, entity_type: str, canonical_name: str = None, user_corrected: bool = False):
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path)
             conn.execute("""
                 INSERT INTO learned_entities (name, entity_type, canonical_name, user_corrected)
                 VALUES (?, ?, ?, ?)
@@ -115,6 +201,39 @@ class EntityCache:
             logger.info(f"Learned: {name} -> {entity_type}")
 
 
+DUMP_MARKERS = "=== RAW BRAIN DUMP ===\n{content}\n=== END BRAIN DUMP ==="
+
+
+def _split_content(content: str, max_tokens: int) -> List[str]:
+    """Split a brain dump into parts of at most max_tokens.
+    
+    Breaks at blank lines where possible so a header stays with its items,
+    then at line ends, then between words.
+    """
+    if max_tokens < 50:
+        raise ValueError(f"No room for brain dump content ({max_tokens} tokens)")
+    
+    def pieces(text: str, separators: List[str]) -> List[str]:
+        if estimate_tokens(text) <= max_tokens or not separators:
+            return [text]
+        sep, rest = separators[0], separators[1:]
+        chunks = text.split(sep)
+        out = []
+        for i, chunk in enumerate(chunks):
+            out.extend(pieces(chunk + sep if i < len(chunks) - 1 else chunk, rest))
+        return out
+    
+    parts, current = [], ""
+    for piece in pieces(content, ["\n\n", "\n", " "]):
+        if current and estimate_tokens(current + piece) > max_tokens:
+            parts.append(current)
+            current = ""
+        current += piece
+    if current.strip():
+        parts.append(current)
+    return parts
+
+
 class BrainDumpService:
     """LLM-first brain dump processing with hierarchy support."""
     
@@ -133,121 +252,27 @@ class BrainDumpService:
         existing_names = [p.get('name', str(p)) if isinstance(p, dict) else str(p) 
                         for p in (existing_projects or [])]
         
-        known_context = ""
-        if known_entities:
-            known_context = "Previously learned entities:\n"
-            for name, info in list(known_entities.items())[:20]:
-                known_context += f"  - {name}: {info['entity_type']}"
-                if info['user_corrected']:
-                    known_context += " (user confirmed)"
-                known_context += "\n"
+        # User-confirmed entities first, so they survive trimming
+        entities = sorted(known_entities.items(), key=lambda kv: not kv[1]['user_corrected'])
+        known_lines = [
+            f"  - {name}: {info['entity_type']}" + (" (user confirmed)" if info['user_corrected'] else "")
+            for name, info in entities
+        ]
         
-        existing_context = ""
-        if existing_names:
-            existing_context = f"Existing projects in system: {', '.join(existing_names)}\n"
-        
-        prompt = f"""You are processing a messy brain dump for a productivity system.
-
-DOMAIN: {domain}
-
-{known_context}
-{existing_context}
-
-=== RAW BRAIN DUMP ===
-{content}
-=== END BRAIN DUMP ===
-
-Analyze this completely and return a structured JSON response.
-
-YOUR TASKS:
-1. IDENTIFY GROUPS - Find organizational headers
-2. CLASSIFY GROUPS using this hierarchy:
-   - PLATFORM: Top-level thing user owns/builds (like iOS, ECMP)
-   - MODULE: Major subsystem that can have children (ECMP AI under ECMP)
-   - SERVICE: Leaf-level capability (RAG, Consent, Messaging)
-   - SYSTEM: External tool user integrates WITH but doesn't own (TIP.AI, AEM, Syniverse, GXP)
-   - PERSON: Human being
-3. DETECT HIERARCHY - "ECMP AI" under "ECMP", "ECMP RAG" under "ECMP AI"
-4. MERGE DUPLICATES - "ECMP NOTES" and "ECMP" are the same
-5. FILTER GARBAGE - Skip "---", "yes", meaningless items
-6. FIX TYPOS - Clean up obvious typos
-7. CLASSIFY ITEMS - task, note, idea, question, decision, reference
-
-CLASSIFICATION RULES:
-- PLATFORM: User owns/builds, top-level, has sub-components
-- MODULE: User owns, has children, part of a platform
-- SERVICE: User owns, leaf-level capability
-- SYSTEM: External tool/service user integrates WITH (TIP.AI, AEM, Syniverse)
-- PERSON: Human being
-
-ITEM TYPE RULES:
-- TASK: Has action verb (need to, should, must, talk to, create, fix, send)
-- NOTE: Pure fact/info (is, has, will, uses, supports)
-- QUESTION: Contains "?" or "what if"
-- IDEA: Exploration (could, might, maybe)
-- DECISION: "decided", "agreed", "we will"
-- REFERENCE: URLs, doc links
-
-RETURN THIS JSON STRUCTURE:
-{{
-  "groups": [
-    {{
-      "name": "Canonical Name",
-      "type": "platform|module|service|system|person",
-      "parent": "Parent group name or null",
-      "confidence": 0.85,
-      "reason": "Why this classification",
-      "merged_from": ["ECMP NOTES", "ECMP"],
-      "items_count": 14,
-      "integrates_with": ["TIP.AI"]
-    }}
-  ],
-  "hierarchy": [
-    {{
-      "child": "ECMP AI",
-      "parent": "ECMP",
-      "reason": "ECMP AI is a module within ECMP platform"
-    }}
-  ],
-  "items": [
-    {{
-      "type": "task|note|idea|question|decision|reference",
-      "text": "Cleaned up text",
-      "original": "Original messy text",
-      "group": "Which group this belongs to",
-      "person": "Person mentioned or null",
-      "priority": "high|medium|low",
-      "tags": ["relevant", "tags"]
-    }}
-  ],
-  "ambiguous": [
-    {{
-      "text": "vague text",
-      "question": "What is this?",
-      "suggestions": ["option 1", "option 2"]
-    }}
-  ],
-  "people_mentioned": [
-    {{"name": "Chris Hunter", "context": "Owns AEM integration"}}
-  ],
-  "typos_fixed": [
-    {{"from": "synbiverse", "to": "Syniverse"}}
-  ],
-  "garbage_filtered": ["---", "yes"],
-  "summary": {{
-    "total_raw_lines": 50,
-    "total_useful_items": 42,
-    "garbage_removed": 8,
-    "typos_fixed": 3,
-    "groups_found": 5,
-    "groups_merged": 2
-  }}
-}}
-
-Be thorough. Return ONLY valid JSON."""
-
         try:
-            result = llm.generate_json(prompt, task_type='task_extraction')
+            builder = self._prompt(content, domain, known_lines, existing_names)
+            try:
+                prompts = [builder.build()]
+            except PromptTooLarge as e:
+                # The dump is never truncated; a long one goes to the LLM in parts
+                room = builder.room_for("brain_dump") - estimate_tokens(DUMP_MARKERS)
+                parts = _split_content(content, room)
+                logger.info(f"Brain dump needs {e.tokens} tokens, budget is {e.budget}; "
+                            f"processing it in {len(parts)} parts")
+                prompts = [self._prompt(part, domain, known_lines, existing_names).build() for part in parts]
+            
+            results = [llm.generate_json(prompt, task_type='task_extraction') for prompt in prompts]
+            result = results[0] if len(results) == 1 else self._merge_results(results)
             
             for group in result.get("groups", []):
                 self.cache.save(
@@ -257,11 +282,47 @@ Be thorough. Return ONLY valid JSON."""
                 )
             
             return self._transform_result(result, existing_projects)
-            
+        
         except Exception as e:
             logger.error(f"LLM processing failed: {e}")
             return self._fallback_response(content)
     
+    def _prompt(self, content: str, domain: str, known_lines: List[str],
+                existing_names: List[str]) -> PromptBuilder:
+        builder = PromptBuilder("brain_dump", task_type='task_extraction')
+        builder.add("intro", f"You are processing a messy brain dump for a productivity system.\n\nDOMAIN: {domain}",
+                    required=True)
+        builder.add("known_entities", "\n".join(known_lines), priority=1, max_tokens=400,
+                    header="Previously learned entities:")
+        builder.add("existing_projects", "\n".join(f"  - {name}" for name in existing_names), priority=2,
+                    max_tokens=600, header="Existing projects in system:")
+        builder.add("brain_dump", DUMP_MARKERS.format(content=content), required=True)
+        builder.add("instructions", BRAIN_DUMP_INSTRUCTIONS, required=True)
+        return builder
+    
+    def _merge_results(self, results: List[Dict]) -> Dict:
+        """Combine the LLM results for the parts of a split brain dump."""
+        merged = {key: [] for key in ("groups", "hierarchy", "items", "ambiguous",
+                                      "people_mentioned", "typos_fixed", "garbage_filtered")}
+        merged["summary"] = {}
+        groups = {}
+        
+        for result in results:
+            for group in result.get("groups", []):
+                key = group["name"].lower()
+                if key in groups:
+                    groups[key]["items_count"] = groups[key].get("items_count", 0) + group.get("items_count", 0)
+                    continue
+                groups[key] = dict(group)
+                merged["groups"].append(groups[key])
+            for key in ("hierarchy", "items", "ambiguous", "people_mentioned", "typos_fixed", "garbage_filtered"):
+                merged[key].extend(result.get(key, []))
+            for key, value in result.get("summary", {}).items():
+                if isinstance(value, (int, float)):
+                    merged["summary"][key] = merged["summary"].get(key, 0) + value
+        
+        return merged
+    
     def _transform_result(self, llm_result: Dict, existing_projects: List[Dict] = None) -> Dict:
         groups = llm_result.get("groups", [])
         items = llm_result.get("items", [])
@@ -1,11 +1,11 @@
 """Confidence scoring system for routing and entity recognition."""
 
-import sqlite3
 from typing import Dict, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 class ConfidenceService:
@@ -17,7 +17,7 @@ class ConfidenceService:
     
     def _ensure_tables(self):
         """Create confidence tracking tables."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -46,7 +46,7 @@ class ConfidenceService:
     
     def check_domain_confidence(self, keywords: str, suggested_domain: str) -> float:
         """Check confidence for domain routing."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -71,7 +71,7 @@ class ConfidenceService:
     
     def record_routing_feedback(self, keywords: str, suggested_domain: str, actual_domain: str):
         """Record user's routing decision."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         is_correct = suggested_domain == actual_domain
@@ -103,7 +103,7 @@ class ConfidenceService:
     
     def check_entity(self, name: str) -> Tuple[bool, Optional[Dict]]:
         """Check if entity (person, project) is known."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -131,7 +131,7 @@ class ConfidenceService:
     
     def add_entity(self, name: str, entity_type: str, metadata: str):
         """Add entity to knowledge base."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -1,77 +1,360 @@
-"""Enhanced daily planning service using profile data."""
+"""Enhanced daily planning service using profile data.
 
-import sqlite3
-from datetime import datetime
-from typing import List, Dict, Any
-from loguru import logger
+All open tasks are scored in one vectorized pass with the learned weights.
+The best candidates are packed into the remaining working day with a small
+knapsack (bounded by planning_max_tasks), then placed into time slots by a
+greedy pass that puts higher-scored tasks into higher-energy windows while
+checking the rest of the selection still fits.
+
+Plans are cached per day in daily_plan_cache. Triggers bump a data version
+on every write that can change the plan, so dashboard polling is served from
+the cache until tasks, weights, thresholds or the profile actually change.
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 
 from src.config import settings
+from src.storage.database import connect
+from src.services.metrics_service import CACHE_REQUESTS
+
+
+# Writes that invalidate the cached plan: (trigger suffix, event, table)
+VERSION_TRIGGERS = [
+    ('task_insert', 'INSERT', 'tasks'),
+    ('task_update', 'UPDATE OF status, priority, estimated_duration_minutes, domain, action', 'tasks'),
+    ('task_delete', 'DELETE', 'tasks'),
+    ('weights_update', 'UPDATE OF weight', 'learned_weights'),
+    ('thresholds_update', 'UPDATE OF value', 'learned_thresholds'),
+    ('profile_insert', 'INSERT', 'profile_data'),
+    ('profile_update', 'UPDATE', 'profile_data'),
+]
 
 
 class DailyPlanningService:
     def __init__(self):
         self.db_path = settings.sqlite_db_path
+        self._ensure_tables()
+    
+    def _ensure_tables(self):
+        # Trigger targets are owned by these services; make sure they exist first
+        from src.services.priority_learning_service import priority_learning
+        from src.services.threshold_service import threshold_service
+        from src.services.adaptive_onboarding_service import adaptive_onboarding
+        priority_learning._ensure_table()
+        threshold_service._ensure_table()
+        adaptive_onboarding._ensure_tables()
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS plan_data_version (
+                id INTEGER PRIMARY KEY DEFAULT 1,
+                version INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO plan_data_version (id, version) VALUES (1, 0)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_plan_cache (
+                plan_date TEXT PRIMARY KEY,
+                data_version INTEGER,
+                window_start TEXT,
+                plan TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        for suffix, event, table in VERSION_TRIGGERS:
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS plan_version_{suffix}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE plan_data_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+        conn.commit()
+        conn.close()
     
-    def generate_plan(self) -> Dict[str, Any]:
+    def get_plan(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Return today's plan from cache, recomputing only after relevant writes."""
+        now = now or datetime.now()
+        window_start, _ = self._window(now)
+        plan_date = window_start.date().isoformat()
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM plan_data_version WHERE id = 1")
+        version = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT plan FROM daily_plan_cache
+            WHERE plan_date = ? AND data_version = ? AND window_start = ?
+        """, (plan_date, version, window_start.isoformat()))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            CACHE_REQUESTS.inc("daily_plan", "hit")
+            return json.loads(row[0])
+        CACHE_REQUESTS.inc("daily_plan", "miss")
+        
+        # Stored under the version read before computing: a write that lands
+        # mid-computation leaves the entry stale rather than wrongly current.
+        plan = self.generate_plan(now)
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO daily_plan_cache (plan_date, data_version, window_start, plan, created_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (plan_date, version, window_start.isoformat(), json.dumps(plan)))
+        cursor.execute("DELETE FROM daily_plan_cache WHERE plan_date < ?", (plan_date,))
+        conn.commit()
+        conn.close()
+        return plan
+    
+    def generate_plan(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        now = now or datetime.now()
         profile = self._get_profile()
-        tasks = self._get_candidate_tasks()
+        candidates = self._get_candidate_tasks(profile, now)
         
-        if not tasks:
+        if len(candidates['id']) == 0:
             return {"current_task": None, "upcoming": [], "message": "All clear!", "insights": []}
         
-        scored = self._score_tasks(tasks, profile)
-        daily_tasks = scored[:5]
-        scheduled = self._schedule_tasks(daily_tasks, profile)
+        scores = self._score_tasks(candidates, profile)
+        slots, energy = self._build_slots(now)
+        pool = self._top_candidates(candidates['id'], scores)
+        chosen = self._pack(pool, candidates, scores, len(slots))
+        scheduled = self._schedule_tasks(chosen, candidates, scores, slots, energy)
         
         return {
             "current_task": scheduled[0] if scheduled else None,
             "upcoming": scheduled[1:],
             "total_time_minutes": sum(t['duration'] for t in scheduled),
             "message": f"Focus on {len(scheduled)} tasks today.",
-            "insights": self._generate_insights()
+            "insights": self._generate_insights(scheduled, len(candidates['id']))
         }
     
     def _get_profile(self) -> Dict[str, str]:
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT key, value FROM profile_data")
         profile = {row[0]: row[1] for row in cursor.fetchall()}
         conn.close()
         return profile
     
-    def _get_candidate_tasks(self) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
+    def _get_candidate_tasks(self, profile: Dict, now: datetime) -> Dict[str, np.ndarray]:
+        """Load every open task as numeric columns (id, priority, duration, age, company match).
+        
+        Age is measured from `now`, not the database clock, so the same `now`
+        always gives the same plan. created_at is UTC (CURRENT_TIMESTAMP), so
+        `now` (local if naive) is converted to UTC first.
+        """
+        company = (profile.get('company') or '').lower()
+        now_utc = now.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT id, action, priority, estimated_duration_minutes, domain, created_at
+            SELECT id,
+                   CASE priority WHEN 'high' THEN 0 WHEN 'low' THEN 2 ELSE 1 END,
+                   COALESCE(estimated_duration_minutes, 30),
+                   COALESCE(julianday(?) - julianday(created_at), 0),
+                   CASE WHEN ? != '' AND instr(lower(COALESCE(domain, '')), ?) > 0 THEN 1 ELSE 0 END
             FROM tasks WHERE status = 'open'
-            ORDER BY created_at ASC LIMIT 20
-        """)
+        """, (now_utc, company, company))
         rows = cursor.fetchall()
         conn.close()
         
-        return [{'id': r[0], 'action': r[1], 'priority': r[2], 'duration': r[3] or 30, 
-                 'domain': r[4], 'created_at': r[5]} for r in rows]
+        data = np.array(rows, dtype=float).reshape(-1, 5)
+        return {
+            'id': data[:, 0].astype(np.int64),
+            'priority': data[:, 1].astype(np.int64),
+            'duration': np.maximum(data[:, 2], 1),
+            'age_days': data[:, 3],
+            'company': data[:, 4].astype(bool),
+        }
+    
+    def _score_tasks(self, tasks: Dict[str, np.ndarray], profile: Dict) -> np.ndarray:
+        from src.services.priority_learning_service import priority_learning
+        from src.services.threshold_service import threshold_service
+        
+        weights = priority_learning.get_all_weights()
+        quick_win = threshold_service.get('quick_win_minutes')
+        
+        priority_weights = np.array([
+            weights.get('priority_high', 10.0),
+            weights.get('priority_medium', 5.0),
+            weights.get('priority_low', 0.0),
+        ])
+        age = tasks['age_days']
+        
+        scores = priority_weights[tasks['priority']]
+        scores += weights.get('quick_win_boost', 0.0) * (tasks['duration'] <= quick_win)
+        scores += weights.get('age_7day_boost', 0.0) * (age >= 7)
+        scores += weights.get('age_3day_boost', 0.0) * ((age >= 3) & (age < 7))
+        scores += weights.get('main_company_boost', 0.0) * tasks['company']
+        return scores
+    
+    def _top_candidates(self, ids: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """Indices of the best-scored tasks, ordered by score desc then id asc."""
+        pool_size = min(settings.planning_candidate_pool, len(ids))
+        if pool_size < len(ids):
+            # Widen the cut to include every task tied with the boundary score
+            threshold = np.partition(scores, len(scores) - pool_size)[len(scores) - pool_size]
+            idx = np.flatnonzero(scores >= threshold)
+        else:
+            idx = np.arange(len(ids))
+        order = np.lexsort((ids[idx], -scores[idx]))
+        return idx[order][:pool_size]
+    
+    def _window(self, now: datetime) -> Tuple[datetime, datetime]:
+        """Plannable window from the next slot boundary, rolling to tomorrow if the day is over."""
+        slot = timedelta(minutes=settings.planning_slot_minutes)
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_start = day + timedelta(hours=settings.planning_day_start_hour)
+        day_end = day + timedelta(hours=settings.planning_day_end_hour)
+        
+        elapsed = max(now - day_start, timedelta(0))
+        start = day_start + slot * -(-elapsed // slot)
+        if start + slot > day_end:
+            return day_start + timedelta(days=1), day_end + timedelta(days=1)
+        return start, day_end
+    
+    def _build_slots(self, now: datetime) -> Tuple[List[datetime], np.ndarray]:
+        """Time slots for the plannable window with their expected energy."""
+        from src.services.energy_pattern_service import energy_pattern_service
+        
+        slot = timedelta(minutes=settings.planning_slot_minutes)
+        start, day_end = self._window(now)
+        n_slots = int((day_end - start) / slot)
+        slots = [start + slot * i for i in range(n_slots)]
+        hourly = energy_pattern_service.get_hourly_energy()
+        energy = np.array([hourly[s.hour] for s in slots])
+        return slots, energy
     
-    def _score_tasks(self, tasks: List[Dict], profile: Dict) -> List[Dict]:
-        company = profile.get('company', '').lower()
-        for task in tasks:
-            score = {'high': 10, 'medium': 5, 'low': 0}.get(task['priority'], 5)
-            if company and company in (task.get('domain') or ''):
-                score += 5
-            task['score'] = score
-        return sorted(tasks, key=lambda t: t['score'], reverse=True)
+    def _pack(self, pool: np.ndarray, tasks: Dict[str, np.ndarray], scores: np.ndarray,
+              capacity: int) -> List[int]:
+        """Pick the highest-value subset that fits the day (0/1 knapsack with a task cap)."""
+        max_tasks = settings.planning_max_tasks
+        widths = np.ceil(tasks['duration'][pool] / settings.planning_slot_minutes).astype(int)
+        # Shift values positive so every fitting task is worth scheduling
+        values = scores[pool] - scores[pool].min() + 1.0
+        
+        if capacity <= 0:
+            return [int(pool[0])]
+        
+        neg = -np.inf
+        best = np.full((max_tasks + 1, capacity + 1), neg)
+        best[0, :] = 0.0
+        take = np.zeros((len(pool), max_tasks + 1, capacity + 1), dtype=bool)
+        
+        for i, (w, v) in enumerate(zip(widths, values)):
+            if w > capacity:
+                continue
+            for m in range(max_tasks, 0, -1):
+                candidate = best[m - 1, :capacity + 1 - w] + v
+                improved = candidate > best[m, w:]
+                best[m, w:][improved] = candidate[improved]
+                take[i, m, w:][improved] = True
+        
+        m = int(np.argmax(best[:, capacity]))
+        if best[m, capacity] == neg or m == 0:
+            # Nothing fits in the remaining day - still surface the top task
+            return [int(pool[0])]
+        
+        chosen = []
+        c = capacity
+        for i in range(len(pool) - 1, -1, -1):
+            if m > 0 and take[i, m, c]:
+                chosen.append(int(pool[i]))
+                c -= widths[i]
+                m -= 1
+        return chosen[::-1]
     
-    def _schedule_tasks(self, tasks: List[Dict], profile: Dict) -> List[Dict]:
-        hour = datetime.now().hour + 1
+    def _schedule_tasks(self, chosen: List[int], tasks: Dict[str, np.ndarray], scores: np.ndarray,
+                        slots: List[datetime], energy: np.ndarray) -> List[Dict]:
+        """Place chosen tasks into the highest-energy windows, keeping the rest placeable."""
+        n = len(slots)
+        if n == 0:
+            return []
+        widths = {i: max(1, int(np.ceil(tasks['duration'][i] / settings.planning_slot_minutes))) for i in chosen}
+        order = sorted(chosen, key=lambda i: (-scores[i], tasks['id'][i]))
+        free = np.ones(n, dtype=bool)
+        starts = {}
+        
+        for pos, i in enumerate(order):
+            w = min(widths[i], n)
+            remaining = [widths[j] for j in order[pos + 1:]]
+            best_start, best_energy = None, -1.0
+            for s in range(n - w + 1):
+                if not free[s:s + w].all():
+                    continue
+                window = energy[s:s + w].mean()
+                if window <= best_energy:
+                    continue
+                free[s:s + w] = False
+                fits = self._fits(free, remaining)
+                free[s:s + w] = True
+                if fits:
+                    best_start, best_energy = s, window
+            if best_start is None:
+                continue
+            free[best_start:best_start + w] = False
+            starts[i] = best_start
+        
+        details = self._get_task_details([int(tasks['id'][i]) for i in starts])
         scheduled = []
-        for task in tasks:
-            scheduled.append({**task, 'suggested_time': f"{hour % 12 or 12}:00 {'PM' if hour >= 12 else 'AM'}"})
-            hour += (task['duration'] + 59) // 60
+        for i in sorted(starts, key=lambda i: starts[i]):
+            task_id = int(tasks['id'][i])
+            when = slots[starts[i]]
+            scheduled.append({
+                **details.get(task_id, {'id': task_id}),
+                'duration': int(tasks['duration'][i]),
+                'score': round(float(scores[i]), 2),
+                'energy': round(float(energy[starts[i]:starts[i] + widths[i]].mean()), 2),
+                'start': when.isoformat(),
+                'suggested_time': f"{when.hour % 12 or 12}:{when.minute:02d} {'PM' if when.hour >= 12 else 'AM'}"
+            })
         return scheduled
     
-    def _generate_insights(self) -> List[str]:
-        return []
+    def _fits(self, free: np.ndarray, widths: List[int]) -> bool:
+        """Lookahead: can the remaining widths still be placed (best-fit decreasing)?"""
+        if not widths:
+            return True
+        edges = np.diff(np.concatenate(([0], free.astype(np.int8), [0])))
+        runs = list(np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1))
+        for w in sorted(widths, reverse=True):
+            fitting = [r for r in runs if r >= w]
+            if not fitting:
+                return False
+            r = min(fitting)
+            runs.remove(r)
+            runs.append(r - w)
+        return True
+    
+    def _get_task_details(self, task_ids: List[int]) -> Dict[int, Dict]:
+        if not task_ids:
+            return {}
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT id, action, priority, domain, created_at
+            FROM tasks WHERE id IN ({','.join('?' * len(task_ids))})
+        """, task_ids)
+        details = {r[0]: {'id': r[0], 'action': r[1], 'priority': r[2], 'domain': r[3], 'created_at': r[4]}
+                   for r in cursor.fetchall()}
+        conn.close()
+        return details
+    
+    def _generate_insights(self, scheduled: List[Dict], open_count: int) -> List[str]:
+        insights = []
+        if open_count > len(scheduled):
+            insights.append(f"Picked {len(scheduled)} of {open_count} open tasks.")
+        peak = [t for t in scheduled if t['energy'] >= 0.9]
+        if peak:
+            insights.append(f"{len(peak)} task(s) placed in your peak energy hours.")
+        return insights
 
 
 daily_planning_service = DailyPlanningService()
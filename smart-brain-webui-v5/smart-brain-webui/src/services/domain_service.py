@@ -1,10 +1,10 @@
 """Dynamic domain management service."""
 
-import sqlite3
 from typing import List, Dict
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 class DomainService:
@@ -16,7 +16,7 @@ class DomainService:
     
     def _ensure_table(self):
         """Create domains table."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -39,7 +39,7 @@ class DomainService:
         """Setup domains from onboarding profile."""
         logger.info(f"Setting up domains with profile: {profile}")
         
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Parse work balance percentages (handle both formats)
@@ -105,7 +105,7 @@ class DomainService:
     
     def get_all_domains(self) -> List[Dict]:
         """Get all active domains."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -130,7 +130,7 @@ class DomainService:
     
     def add_learned_keyword(self, domain_path: str, keyword: str):
         """Add learned keyword to domain."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -167,7 +167,7 @@ class DomainService:
     
     def _create_defaults_from_settings(self):
         """Create default domains from settings."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         default_colors = {
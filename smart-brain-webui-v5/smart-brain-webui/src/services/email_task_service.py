@@ -1,13 +1,13 @@
 """Email Task Service - handles tasks from email sources like BillBrain."""
 
-import sqlite3
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
+from src.services.embedding_service import embedding_service
 from src.models.workflow_state import ClusterNote, NoteType, Task, Priority, TaskStatus
 
 
@@ -16,16 +16,6 @@ class EmailTaskService:
     
     def __init__(self):
         self.db_path = settings.sqlite_db_path
-        self._model = None  # Lazy load
-    
-    @property
-    def model(self):
-        """Lazy load embedding model."""
-        if self._model is None:
-            logger.info("Loading embedding model for email task dedup...")
-            self._model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-            logger.success("Embedding model loaded")
-        return self._model
     
     def create_task_from_email(
         self,
@@ -102,7 +92,7 @@ class EmailTaskService:
         Returns:
             (is_duplicate, existing_task_id)
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Get recent open tasks (last 30 days)
@@ -119,12 +109,12 @@ class EmailTaskService:
             return False, None
         
         # Encode new action
-        new_embedding = self.model.encode([action])[0]
+        new_embedding = embedding_service.encode([action], "email_task")[0]
         
-        # Encode existing actions
+        # Encode existing actions; concurrent batch items share this encode
         existing_ids = [row[0] for row in existing]
         existing_actions = [row[1] for row in existing]
-        existing_embeddings = self.model.encode(existing_actions)
+        existing_embeddings = embedding_service.encode(existing_actions, "email_task")
         
         # Calculate similarities
         similarities = np.inner(new_embedding, existing_embeddings)
@@ -191,7 +181,7 @@ class EmailTaskService:
         """Insert task into database."""
         import json
         
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -219,7 +209,7 @@ class EmailTaskService:
     
     def get_email_tasks(self, limit: int = 50) -> List[Dict]:
         """Get tasks created from email sources."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -0,0 +1,44 @@
+"""Shared sentence embedding model with single-flight encoding."""
+
+from typing import List
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from loguru import logger
+
+from src.config import settings
+from src.llm.single_flight import SingleFlight
+from src.services.metrics_service import EMBEDDING_LATENCY, EMBEDDING_TEXTS
+
+
+class EmbeddingService:
+    """One lazily loaded MiniLM model for every service that embeds text."""
+    
+    def __init__(self):
+        self._model = None
+        self._flight = SingleFlight("embedding")
+    
+    @property
+    def model(self):
+        """Lazy load embedding model."""
+        if self._model is None:
+            logger.info("Loading embedding model...")
+            self._model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            logger.success("Embedding model loaded")
+        return self._model
+    
+    def encode(self, texts: List[str], service: str) -> np.ndarray:
+        """Embed texts; identical concurrent requests share one encode."""
+        def run():
+            with EMBEDDING_LATENCY.time(service):
+                embeddings = self.model.encode(texts)
+            EMBEDDING_TEXTS.inc(service, amount=len(texts))
+            return embeddings
+        
+        if not settings.single_flight_enabled:
+            return run()
+        return self._flight.do(tuple(texts), run)
+
+
+# Global instance
+embedding_service = EmbeddingService()
@@ -1,11 +1,18 @@
 """Learn user's energy patterns from task completion times."""
 
-import sqlite3
 from typing import Dict, List
 from datetime import datetime
+import numpy as np
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
+
+
+DEFAULT_PEAK_HOURS = [9, 14, 16]
+
+# Completions needed before observed counts outweigh the default curve.
+ENERGY_PRIOR_COMPLETIONS = 10.0
 
 
 class EnergyPatternService:
@@ -14,7 +21,7 @@ class EnergyPatternService:
         self._ensure_table()
     
     def _ensure_table(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS completion_patterns (
@@ -31,7 +38,7 @@ class EnergyPatternService:
     
     def log_completion(self, task_id: int, completed_at: datetime):
         hour = completed_at.hour
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT estimated_duration_minutes FROM tasks WHERE id = ?", (task_id,))
         row = cursor.fetchone()
@@ -46,20 +53,44 @@ class EnergyPatternService:
         conn.close()
     
     def get_peak_hours(self, top_n: int = 3) -> List[int]:
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
             SELECT hour FROM completion_patterns
             WHERE completion_count > 0
-            ORDER BY productivity_score DESC LIMIT ?
+            ORDER BY completion_count DESC, productivity_score DESC, hour ASC LIMIT ?
         """, (top_n,))
         hours = [row[0] for row in cursor.fetchall()]
         conn.close()
-        return hours if hours else [9, 14, 16]
+        return hours if hours else list(DEFAULT_PEAK_HOURS)
+    
+    def get_hourly_energy(self) -> np.ndarray:
+        """Relative energy (0-1) for each hour of the day.
+        
+        Completion counts per hour, blended with a default curve peaking at
+        DEFAULT_PEAK_HOURS until enough completions have been observed.
+        """
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT hour, completion_count FROM completion_patterns")
+        counts = np.zeros(24)
+        for hour, count in cursor.fetchall():
+            if 0 <= hour < 24:
+                counts[hour] = count or 0
+        conn.close()
+        
+        default = np.full(24, 0.5)
+        default[DEFAULT_PEAK_HOURS] = 1.0
+        
+        total = counts.sum()
+        observed = counts / counts.max() if total > 0 else default
+        blend = total / (total + ENERGY_PRIOR_COMPLETIONS)
+        energy = blend * observed + (1 - blend) * default
+        return energy / energy.max()
     
     def get_pattern_summary(self) -> Dict:
         peak_hours = self.get_peak_hours(3)
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT SUM(completion_count) FROM completion_patterns")
         total = cursor.fetchone()[0] or 0
@@ -1,11 +1,29 @@
 """Financial service for managing bills, subscriptions, and loans."""
 
+import json
 import sqlite3
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Any, Optional
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
+from src.services.metrics_service import CACHE_REQUESTS
+
+
+# Normalizes a subscription amount to its monthly cost
+MONTHLY_AMOUNT_SQL = """
+    CASE frequency
+        WHEN 'monthly' THEN amount
+        WHEN 'yearly' THEN amount / 12.0
+        WHEN 'weekly' THEN amount * 4.33
+        WHEN 'quarterly' THEN amount / 3.0
+        ELSE 0
+    END
+"""
+
+# Writes that invalidate the cached dashboard summary
+SUMMARY_TABLES = ['bills', 'subscriptions', 'loans']
 
 
 class FinancialService:
@@ -13,12 +31,50 @@ class FinancialService:
     
     def __init__(self):
         self.db_path = settings.sqlite_db_path
+        # Only cache the summary when every invalidation trigger exists
+        self.summary_cache_enabled = False
+        self._ensure_tables()
+    
+    def _ensure_tables(self):
+        """Create the summary cache and the triggers that clear it."""
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS financial_summary_cache (
+                id INTEGER PRIMARY KEY DEFAULT 1,
+                summary TEXT,
+                cache_date TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        missing = []
+        for table in SUMMARY_TABLES:
+            for event in ['INSERT', 'UPDATE', 'DELETE']:
+                name = f"financial_summary_{table}_{event.lower()}"
+                try:
+                    cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS {name}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            DELETE FROM financial_summary_cache;
+                        END
+                    """)
+                except sqlite3.OperationalError as e:
+                    missing.append(f"{name} ({e})")
+        
+        self.summary_cache_enabled = not missing
+        if missing:
+            # Nothing would clear a stored summary, so drop it and stop caching
+            cursor.execute("DELETE FROM financial_summary_cache")
+            logger.warning(f"Financial summary cache disabled, run add_financial_tables: {', '.join(missing)}")
+        conn.commit()
+        conn.close()
     
     # ==================== BILLS ====================
     
     def create_bill(self, data: Dict[str, Any]) -> int:
         """Create a new bill."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -45,7 +101,7 @@ class FinancialService:
     
     def get_bills(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
         """Get bills, optionally filtered by status."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         if status:
@@ -72,7 +128,7 @@ class FinancialService:
     
     def mark_bill_paid(self, bill_id: int, paid_amount: float, paid_date: str = None) -> bool:
         """Mark a bill as paid."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         paid_date = paid_date or date.today().isoformat()
@@ -90,7 +146,7 @@ class FinancialService:
     
     def get_upcoming_bills(self, days: int = 14) -> List[Dict]:
         """Get bills due in the next N days."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         future_date = (date.today() + timedelta(days=days)).isoformat()
@@ -112,7 +168,7 @@ class FinancialService:
     
     def create_subscription(self, data: Dict[str, Any]) -> int:
         """Create a new subscription."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -140,7 +196,10 @@ class FinancialService:
     
     def get_subscriptions(self, status: Optional[str] = None) -> List[Dict]:
         """Get all subscriptions."""
-        conn = sqlite3.connect(self.db_path)
+        from src.services.projection_service import projection_service
+        projection_service.ensure_fresh()
+        
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         if status:
@@ -167,23 +226,13 @@ class FinancialService:
     
     def get_monthly_subscription_total(self) -> float:
         """Calculate total monthly subscription cost."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT amount, frequency FROM subscriptions WHERE status = 'active'
+        cursor.execute(f"""
+            SELECT COALESCE(SUM({MONTHLY_AMOUNT_SQL}), 0) FROM subscriptions WHERE status = 'active'
         """)
-        
-        total = 0.0
-        for amount, frequency in cursor.fetchall():
-            if frequency == "monthly":
-                total += amount
-            elif frequency == "yearly":
-                total += amount / 12
-            elif frequency == "weekly":
-                total += amount * 4.33
-            elif frequency == "quarterly":
-                total += amount / 3
+        total = cursor.fetchone()[0]
         
         conn.close()
         return round(total, 2)
@@ -192,7 +241,7 @@ class FinancialService:
     
     def create_loan(self, data: Dict[str, Any]) -> int:
         """Create a new loan."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Calculate monthly payment if not provided
@@ -231,7 +280,7 @@ class FinancialService:
     
     def get_loans(self, status: Optional[str] = None) -> List[Dict]:
         """Get all loans."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         if status:
@@ -261,7 +310,7 @@ class FinancialService:
     
     def record_loan_payment(self, loan_id: int, amount: float, payment_date: str = None, extra_principal: float = 0) -> Dict:
         """Record a loan payment and update balance."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         payment_date = payment_date or date.today().isoformat()
@@ -308,7 +357,9 @@ class FinancialService:
     
     def get_amortization_schedule(self, loan_id: int) -> List[Dict]:
         """Generate amortization schedule for a loan."""
-        conn = sqlite3.connect(self.db_path)
+        from src.services.amortization_service import amortization_service
+        
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -323,79 +374,104 @@ class FinancialService:
             return []
         
         balance, rate, payment, term, start_date = row
-        monthly_rate = rate / 100 / 12
+        result = amortization_service.simulate([balance], [rate], [payment], max_months=term)
+        
+        months = int(result["payoff_month"][0])
+        months = months if months > 0 else result["balance"].shape[1]
+        interest = result["interest"][0, :months].round(2)
+        principal = result["principal"][0, :months].round(2)
+        balances = result["balance"][0, :months].round(2)
+        
+        return [
+            {
+                "month": month + 1,
+                "payment": round(float(interest[month] + principal[month]), 2),
+                "principal": float(principal[month]),
+                "interest": float(interest[month]),
+                "balance": float(balances[month])
+            }
+            for month in range(months)
+        ]
+    
+    def simulate_payoff(self, scenarios: List[Dict[str, Any]], loan_id: Optional[int] = None) -> Dict[str, Any]:
+        """Compare what-if payoff scenarios against the baseline for one or all active loans."""
+        from src.services.amortization_service import amortization_service
         
-        schedule = []
-        for month in range(1, term + 1):
-            interest = round(balance * monthly_rate, 2)
-            principal = round(payment - interest, 2)
-            balance = round(balance - principal, 2)
-            
-            if balance < 0:
-                principal += balance
-                balance = 0
-            
-            schedule.append({
-                "month": month,
-                "payment": payment,
-                "principal": principal,
-                "interest": interest,
-                "balance": balance
-            })
-            
-            if balance <= 0:
-                break
+        loans = [l for l in self.get_loans(status="active") if loan_id is None or l["id"] == loan_id]
+        if not loans:
+            return {"loans": [], "baseline": {"total_interest": 0.0, "debt_free_date": None}, "scenarios": []}
         
-        return schedule
+        return amortization_service.compare_scenarios(loans, scenarios)
     
     def _calculate_monthly_payment(self, principal: float, annual_rate: float, term_months: int) -> float:
         """Calculate monthly payment using amortization formula."""
-        if annual_rate == 0:
-            return round(principal / term_months, 2)
-        
-        monthly_rate = annual_rate / 100 / 12
-        payment = principal * (monthly_rate * (1 + monthly_rate)**term_months) / ((1 + monthly_rate)**term_months - 1)
-        return round(payment, 2)
+        from src.services.amortization_service import amortization_service
+        return amortization_service.monthly_payment(principal, annual_rate, term_months)
     
     # ==================== DASHBOARD ====================
     
-    def get_financial_summary(self) -> Dict[str, Any]:
-        """Get overall financial summary for dashboard."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Pending bills
-        cursor.execute("SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM bills WHERE status = 'pending'")
-        pending_bills_count, pending_bills_total = cursor.fetchone()
-        
-        # Overdue bills
-        cursor.execute("""
-            SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM bills 
-            WHERE status = 'pending' AND due_date < date('now')
-        """)
-        overdue_count, overdue_total = cursor.fetchone()
+    def get_financial_summary(self, cached: bool = True) -> Dict[str, Any]:
+        """Get overall financial summary for dashboard.
         
-        # Active subscriptions
-        cursor.execute("SELECT COUNT(*) FROM subscriptions WHERE status = 'active'")
-        active_subs = cursor.fetchone()[0]
-        
-        # Monthly subscription cost
-        monthly_subs = self.get_monthly_subscription_total()
-        
-        # Active loans
-        cursor.execute("SELECT COUNT(*), COALESCE(SUM(current_balance), 0), COALESCE(SUM(monthly_payment), 0) FROM loans WHERE status = 'active'")
-        active_loans, total_debt, monthly_loan_payments = cursor.fetchone()
-        
-        conn.close()
-        
-        return {
+        Served from financial_summary_cache until a bill, subscription or loan
+        write (or the date rolling over, which changes what is overdue).
+        """
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        today = date.today().isoformat()
+        
+        cached = cached and self.summary_cache_enabled
+        if cached:
+            cursor.execute("SELECT summary FROM financial_summary_cache WHERE id = 1 AND cache_date = ?", (today,))
+            row = cursor.fetchone()
+            if row:
+                conn.close()
+                CACHE_REQUESTS.inc("financial_summary", "hit")
+                return json.loads(row[0])
+            CACHE_REQUESTS.inc("financial_summary", "miss")
+        
+        cursor.execute(f"""
+            SELECT b.pending_count, b.pending_total, b.overdue_count, b.overdue_total,
+                   s.active_count, s.monthly_cost,
+                   l.active_count, l.total_debt, l.monthly_payments
+            FROM (
+                SELECT COALESCE(SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END), 0) AS pending_count,
+                       COALESCE(SUM(CASE WHEN status = 'pending' THEN amount ELSE 0 END), 0) AS pending_total,
+                       COALESCE(SUM(CASE WHEN status = 'pending' AND due_date < ? THEN 1 ELSE 0 END), 0) AS overdue_count,
+                       COALESCE(SUM(CASE WHEN status = 'pending' AND due_date < ? THEN amount ELSE 0 END), 0) AS overdue_total
+                FROM bills
+            ) b, (
+                SELECT COUNT(*) AS active_count,
+                       COALESCE(SUM({MONTHLY_AMOUNT_SQL}), 0) AS monthly_cost
+                FROM subscriptions WHERE status = 'active'
+            ) s, (
+                SELECT COUNT(*) AS active_count,
+                       COALESCE(SUM(current_balance), 0) AS total_debt,
+                       COALESCE(SUM(monthly_payment), 0) AS monthly_payments
+                FROM loans WHERE status = 'active'
+            ) l
+        """, (today, today))
+        (pending_bills_count, pending_bills_total, overdue_count, overdue_total,
+         active_subs, monthly_subs, active_loans, total_debt, monthly_loan_payments) = cursor.fetchone()
+        monthly_subs = round(monthly_subs, 2)
+        
+        summary = {
             "pending_bills": {"count": pending_bills_count, "total": pending_bills_total},
             "overdue_bills": {"count": overdue_count, "total": overdue_total},
             "subscriptions": {"count": active_subs, "monthly_cost": monthly_subs},
             "loans": {"count": active_loans, "total_debt": total_debt, "monthly_payments": monthly_loan_payments},
             "total_monthly_obligations": round(monthly_subs + (monthly_loan_payments or 0), 2)
         }
-
+        
+        if self.summary_cache_enabled:
+            cursor.execute("""
+                INSERT OR REPLACE INTO financial_summary_cache (id, summary, cache_date, created_at)
+                VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+            """, (json.dumps(summary), today))
+            conn.commit()
+        conn.close()
+        
+        return summary
 
 # Global instance
 financial_service = FinancialService()
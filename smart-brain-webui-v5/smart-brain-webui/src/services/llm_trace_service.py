@@ -0,0 +1,175 @@
+"""LLM call tracing: tokens, latency, retries, fallbacks and cost.
+
+LLMService opens a trace around each provider call; the clients report
+what only they can see (token usage, attempts, model fallback) through
+note_* helpers that write into the current trace via a ContextVar, so no
+client signature changes. Finished traces go to an in-memory ring buffer
+and the llm_traces table.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from loguru import logger
+
+from src.config import settings
+from src.storage.database import connect
+
+
+_current: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_trace", default=None)
+
+GROUPINGS = {"stage": "task_type", "provider": "provider", "model": "model", "day": "DATE(created_at)"}
+
+
+def note_attempt():
+    """Called by a client at the start of every request attempt."""
+    record = _current.get()
+    if record is not None:
+        record["attempts"] += 1
+
+
+def note_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    record = _current.get()
+    if record is not None:
+        record["prompt_tokens"] += prompt_tokens or 0
+        record["completion_tokens"] += completion_tokens or 0
+
+
+def note_fallback(model: Optional[str] = None):
+    """A client fell back to another model (or LLMService to another provider)."""
+    record = _current.get()
+    if record is not None:
+        record["fallback_used"] = True
+        if model:
+            record["model"] = model
+
+
+def note_cache_hit():
+    record = _current.get()
+    if record is not None:
+        record["cache_hit"] = True
+
+
+class LLMTraceService:
+    """Record LLM calls and aggregate them by stage and day."""
+    
+    def __init__(self):
+        self.db_path = settings.sqlite_db_path
+        self.recent = deque(maxlen=settings.llm_trace_buffer_size)
+        self._ensure_tables()
+    
+    def _ensure_tables(self):
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_traces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TIMESTAMP NOT NULL,
+                task_type TEXT,
+                provider TEXT NOT NULL,
+                model TEXT,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                latency_ms REAL,
+                retries INTEGER DEFAULT 0,
+                fallback_used BOOLEAN DEFAULT 0,
+                cache_hit BOOLEAN DEFAULT 0,
+                status TEXT,
+                error TEXT,
+                cost_usd REAL DEFAULT 0
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_traces_created ON llm_traces(created_at)")
+        conn.commit()
+        conn.close()
+    
+    @contextmanager
+    def trace(self, provider: str, model: str, task_type: Optional[str] = None, fallback: bool = False):
+        """Trace one provider call; the body runs with this trace as the current one."""
+        record = {
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "task_type": task_type or "default", "provider": provider, "model": model,
+            "prompt_tokens": 0, "completion_tokens": 0, "attempts": 0,
+            "fallback_used": fallback, "cache_hit": False, "status": "ok", "error": None,
+        }
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)[:500]
+            raise
+        finally:
+            _current.reset(token)
+            record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self._finish(record)
+    
+    def _finish(self, record: Dict[str, Any]):
+        record["retries"] = max(record.pop("attempts") - 1, 0)
+        record["cost_usd"] = self._cost(record)
+        self.recent.append(record)
+        
+        logger.debug(
+            f"LLM {record['task_type']} via {record['provider']}/{record['model']}: "
+            f"{record['latency_ms']} ms, {record['prompt_tokens']}+{record['completion_tokens']} tokens, "
+            f"{record['retries']} retries{' (fallback)' if record['fallback_used'] else ''}"
+        )
+        try:
+            conn = connect(self.db_path)
+            conn.execute("""
+                INSERT INTO llm_traces (created_at, task_type, provider, model, prompt_tokens, completion_tokens,
+                                        latency_ms, retries, fallback_used, cache_hit, status, error, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (record["created_at"], record["task_type"], record["provider"], record["model"],
+                  record["prompt_tokens"], record["completion_tokens"], record["latency_ms"], record["retries"],
+                  record["fallback_used"], record["cache_hit"], record["status"], record["error"], record["cost_usd"]))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            # Tracing must never break the call being traced
+            logger.warning(f"Failed to store LLM trace: {e}")
+    
+    def _cost(self, record: Dict[str, Any]) -> float:
+        if record["provider"] != "azure":
+            return 0.0
+        return round(record["prompt_tokens"] / 1000 * settings.azure_prompt_cost_per_1k
+                     + record["completion_tokens"] / 1000 * settings.azure_completion_cost_per_1k, 6)
+    
+    def get_recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent traces from the in-memory buffer, newest first."""
+        return list(reversed(self.recent))[:limit]
+    
+    def get_stats(self, by: str = "stage", days: int = 7) -> List[Dict[str, Any]]:
+        """Totals per stage (task_type), provider, model or day."""
+        column = GROUPINGS[by]
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {column} AS grp,
+                   COUNT(*), SUM(prompt_tokens), SUM(completion_tokens),
+                   AVG(latency_ms), MAX(latency_ms), SUM(latency_ms),
+                   SUM(retries), SUM(fallback_used), SUM(cache_hit),
+                   SUM(CASE WHEN status = 'error' THEN 1 ELSE 0 END), SUM(cost_usd)
+            FROM llm_traces
+            WHERE created_at >= datetime('now', 'localtime', ?)
+            GROUP BY grp
+            ORDER BY SUM(latency_ms) DESC
+        """, (f"-{int(days)} days",))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [{
+            by: grp, "calls": calls, "prompt_tokens": prompt or 0, "completion_tokens": completion or 0,
+            "avg_latency_ms": round(avg or 0, 1), "max_latency_ms": round(worst or 0, 1),
+            "total_latency_s": round((total or 0) / 1000, 2), "retries": retries or 0,
+            "fallbacks": fallbacks or 0, "cache_hits": hits or 0, "errors": errors or 0,
+            "cost_usd": round(cost or 0, 4)
+        } for grp, calls, prompt, completion, avg, worst, total, retries, fallbacks, hits, errors, cost in rows]
+
+
+# Global instance
+llm_trace_service = LLMTraceService()
@@ -0,0 +1,192 @@
+"""In-process metrics exposed in Prometheus text format.
+
+Counters, gauges and histograms keep their state in plain dicts keyed by
+label values, so recording is a dict lookup and a few additions under a
+lock. Nothing is formatted until /metrics is scraped.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Sequence
+
+
+# Seconds; request and LLM latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Seconds; single SQL statements
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Estimated tokens; assembled prompts
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+    
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+    
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+    
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and renders the /metrics payload."""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+    
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+    
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+    
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+HTTP_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.")
+
+DB_QUERY_LATENCY = metrics.histogram(
+    "db_query_duration_seconds", "SQLite statement execution time.", ("operation",), DB_BUCKETS)
+
+LLM_REQUESTS = metrics.counter(
+    "llm_requests_total", "LLM calls by provider, model, task type and outcome.",
+    ("provider", "model", "task_type", "status"))
+LLM_LATENCY = metrics.histogram(
+    "llm_request_duration_seconds", "LLM call latency.", ("provider", "model", "task_type"))
+LLM_BREAKER_STATE = metrics.gauge(
+    "llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open).", ("provider", "model"))
+LLM_BREAKER_TRIPS = metrics.counter(
+    "llm_circuit_trips_total", "Times an LLM circuit breaker opened.", ("provider", "model"))
+LLM_SLOTS_IN_USE = metrics.gauge(
+    "llm_slots_in_use", "LLM concurrency slots currently held.", ("provider", "model"))
+LLM_QUEUE_DEPTH = metrics.gauge(
+    "llm_queue_depth", "LLM calls waiting for a slot.", ("provider", "model", "priority"))
+LLM_QUEUE_WAIT = metrics.histogram(
+    "llm_queue_wait_seconds", "Time LLM calls spent queued for a slot.", ("provider", "model", "priority"))
+LLM_QUEUE_TIMEOUTS = metrics.counter(
+    "llm_queue_timeouts_total", "LLM calls that gave up waiting for a slot.", ("provider", "model", "priority"))
+LLM_PROMPT_TOKENS = metrics.histogram(
+    "llm_prompt_tokens", "Estimated prompt size per stage.", ("stage",), TOKEN_BUCKETS)
+LLM_PROMPT_TRIMMED_TOKENS = metrics.counter(
+    "llm_prompt_trimmed_tokens_total", "Estimated tokens cut to fit the prompt budget.", ("stage", "section"))
+
+EMBEDDING_LATENCY = metrics.histogram(
+    "embedding_encode_duration_seconds", "Sentence embedding encode time.", ("service",))
+EMBEDDING_TEXTS = metrics.counter(
+    "embedding_texts_total", "Texts passed to the embedding model.", ("service",))
+
+ROUTING_DECISIONS = metrics.counter(
+    "routing_decisions_total", "Notes routed by method (keyword/local/llm).", ("method",))
+
+SINGLE_FLIGHT_CALLS = metrics.counter(
+    "single_flight_calls_total", "Deduplicated model calls by result (executed/coalesced).", ("call", "result"))
+
+CACHE_REQUESTS = metrics.counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
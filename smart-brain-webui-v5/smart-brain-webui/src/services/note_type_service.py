@@ -1,10 +1,10 @@
 """Dynamic note type system."""
 
-import sqlite3
 from typing import List, Dict
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 class NoteTypeService:
@@ -13,7 +13,7 @@ class NoteTypeService:
         self._ensure_table()
     
     def _ensure_table(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS note_types (
@@ -34,7 +34,7 @@ class NoteTypeService:
         conn.close()
     
     def get_all_types(self) -> List[Dict]:
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT name, description, icon, usage_count FROM note_types WHERE active = 1")
         types = [{'name': r[0], 'description': r[1], 'icon': r[2], 'usage_count': r[3]} 
@@ -43,7 +43,7 @@ class NoteTypeService:
         return types
     
     def add_type(self, name: str, description: str = '', icon: str = '📄'):
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("INSERT INTO note_types (name, description, icon) VALUES (?, ?, ?)", 
                        (name, description, icon))
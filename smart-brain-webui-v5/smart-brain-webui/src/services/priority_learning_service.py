@@ -1,19 +1,53 @@
-"""Dynamic priority weighting learned from user behavior."""
+"""Dynamic priority weighting learned from user behavior.
 
+Weights are fit by ridge regression of completion promptness on task features,
+pulled toward the current weights. Only X^T X / X^T y are persisted, so each
+update costs O(new completions); it runs after every completion and on a
+timer (priority_learning_interval_seconds).
+
+Age boosts are fit too. Promptness is measured from the start of the task's
+age band (0, 3 or 7 days), so an age weight says how readily the user picks
+up a task once it has sat that long, not merely that old tasks were late.
+The completion hour is not a task feature: the planner places tasks into
+high-energy hours from energy_pattern_service instead.
+"""
+
+import json
 import sqlite3
-from typing import Dict
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
+
+
+# Weights fitted from completions. Order defines the feature matrix columns.
+LEARNED_FEATURES = [
+    'priority_high', 'priority_medium', 'priority_low',
+    'quick_win_boost', 'main_company_boost', 'age_3day_boost', 'age_7day_boost',
+]
+
+# A task finished immediately scores PROMPTNESS_SCALE; one that sat for
+# PROMPTNESS_DECAY_DAYS scores ~37% of that. Matches the 0-10 weight range.
+PROMPTNESS_SCALE = 10.0
+PROMPTNESS_DECAY_DAYS = 7.0
+
+# Ridge strength, in "virtual completions" supporting the prior weights.
+PRIOR_STRENGTH = 20.0
 
 
 class PriorityLearningService:
     def __init__(self):
         self.db_path = settings.sqlite_db_path
+        # Completions and the timer can both trigger a fit
+        self._lock = threading.Lock()
         self._ensure_table()
     
     def _ensure_table(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS learned_weights (
@@ -28,24 +62,162 @@ class PriorityLearningService:
             INSERT OR IGNORE INTO learned_weights (name, weight) VALUES
             ('priority_high', 10.0), ('priority_medium', 5.0), ('priority_low', 0.0),
             ('quick_win_boost', 2.0), ('age_3day_boost', 1.0), ('age_7day_boost', 3.0),
-            ('main_company_boost', 5.0)
+            ('main_company_boost', 5.0), ('peak_hour_boost', 1.0)
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS priority_learning_state (
+                id INTEGER PRIMARY KEY DEFAULT 1,
+                xtx TEXT,
+                xty TEXT,
+                prior TEXT,
+                sample_count INTEGER DEFAULT 0,
+                last_completed_at TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
         """)
         conn.commit()
         conn.close()
     
     def get_weight(self, name: str) -> float:
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT weight FROM learned_weights WHERE name = ?", (name,))
         row = cursor.fetchone()
         conn.close()
         return row[0] if row else 0.0
     
-    def learn_from_completions(self):
-        logger.info("Updated priority weights from completion patterns")
+    def learn_from_completions(self, full: bool = False) -> Dict[str, float]:
+        """Fold completions since the last run into the weights.
+        
+        With full=True the accumulated statistics are discarded and the whole
+        completion history is refit against the original prior.
+        """
+        with self._lock:
+            return self._learn(full)
+    
+    def _learn(self, full: bool) -> Dict[str, float]:
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        
+        xtx, xty, prior, n, watermark = self._load_state(cursor, full)
+        X, y, latest = self._load_completions(cursor, watermark)
+        
+        if len(y) == 0:
+            conn.close()
+            return {}
+        
+        xtx += X.T @ X
+        xty += X.T @ y
+        n += len(y)
+        
+        k = len(LEARNED_FEATURES)
+        weights = np.linalg.solve(xtx + PRIOR_STRENGTH * np.eye(k), xty + PRIOR_STRENGTH * prior)
+        
+        # Per-feature support: how many completions actually exercised it.
+        support = np.diag(xtx)
+        confidence = support / (support + PRIOR_STRENGTH)
+        
+        cursor.executemany("""
+            UPDATE learned_weights
+            SET weight = ?, confidence = ?, sample_count = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE name = ?
+        """, [
+            (round(float(w), 4), round(float(c), 4), int(s), name)
+            for name, w, c, s in zip(LEARNED_FEATURES, weights, confidence, support)
+        ])
+        cursor.execute("""
+            INSERT OR REPLACE INTO priority_learning_state
+                (id, xtx, xty, prior, sample_count, last_completed_at, updated_at)
+            VALUES (1, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (json.dumps(xtx.tolist()), json.dumps(xty.tolist()), json.dumps(prior.tolist()), n, latest))
+        
+        conn.commit()
+        conn.close()
+        
+        learned = {name: round(float(w), 4) for name, w in zip(LEARNED_FEATURES, weights)}
+        logger.info(f"Updated priority weights from {len(y)} new completions ({n} total): {learned}")
+        return learned
+    
+    def _load_state(self, cursor, full: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, str]:
+        """Load accumulated statistics; the prior is fixed at the first fit.
+        
+        State saved for a different feature set is dropped and refit in full.
+        """
+        k = len(LEARNED_FEATURES)
+        
+        cursor.execute("""
+            SELECT xtx, xty, prior, sample_count, last_completed_at
+            FROM priority_learning_state WHERE id = 1
+        """)
+        row = cursor.fetchone()
+        
+        if row and row[2] and len(json.loads(row[2])) == k:
+            prior = np.array(json.loads(row[2]))
+            if not full:
+                return np.array(json.loads(row[0])), np.array(json.loads(row[1])), prior, row[3], row[4]
+        else:
+            cursor.execute("SELECT name, weight FROM learned_weights")
+            current = {r[0]: r[1] for r in cursor.fetchall()}
+            prior = np.array([current.get(name, 0.0) for name in LEARNED_FEATURES])
+        
+        return np.zeros((k, k)), np.zeros(k), prior, 0, None
+    
+    def _load_completions(self, cursor, since: str) -> Tuple[np.ndarray, np.ndarray, str]:
+        """Pull completions after `since` as a feature matrix and promptness targets."""
+        company = self._get_company(cursor)
+        
+        from src.services.threshold_service import threshold_service
+        quick_win = threshold_service.get('quick_win_minutes')
+        
+        query = """
+            SELECT
+                CASE priority WHEN 'high' THEN 0 WHEN 'low' THEN 2 ELSE 1 END,
+                MAX(julianday(completed_at) - julianday(created_at), 0),
+                COALESCE(estimated_duration_minutes, 30),
+                CASE WHEN ? != '' AND instr(lower(COALESCE(domain, '')), ?) > 0 THEN 1 ELSE 0 END,
+                completed_at
+            FROM tasks
+            WHERE status = 'completed'
+              AND julianday(completed_at) IS NOT NULL AND julianday(created_at) IS NOT NULL
+        """
+        params = [company, company]
+        
+        if since:
+            query += " AND julianday(completed_at) > julianday(?)"
+            params.append(since)
+        
+        query += " ORDER BY julianday(completed_at)"
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        if not rows:
+            return np.empty((0, len(LEARNED_FEATURES))), np.empty(0), since
+        
+        data = np.array([r[:4] for r in rows], dtype=float)
+        priority, age_days, duration, company_match = data.T
+        
+        X = np.zeros((len(rows), len(LEARNED_FEATURES)))
+        X[np.arange(len(rows)), priority.astype(int)] = 1.0
+        X[:, 3] = duration <= quick_win
+        X[:, 4] = company_match
+        X[:, 5] = (age_days >= 3) & (age_days < 7)
+        X[:, 6] = age_days >= 7
+        
+        # Promptness counted from when the task entered its age band (see module docstring)
+        band_start = np.select([age_days >= 7, age_days >= 3], [7.0, 3.0], 0.0)
+        y = PROMPTNESS_SCALE * np.exp(-(age_days - band_start) / PROMPTNESS_DECAY_DAYS)
+        return X, y, rows[-1][4]
+    
+    def _get_company(self, cursor) -> str:
+        try:
+            cursor.execute("SELECT value FROM profile_data WHERE key = 'company'")
+            row = cursor.fetchone()
+        except sqlite3.OperationalError:
+            return ''
+        return (row[0] or '').strip().lower() if row else ''
     
     def get_all_weights(self) -> Dict[str, float]:
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT name, weight FROM learned_weights")
         weights = {row[0]: row[1] for row in cursor.fetchall()}
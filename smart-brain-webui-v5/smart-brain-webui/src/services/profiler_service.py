@@ -0,0 +1,207 @@
+"""Opt-in profiling for slow endpoints.
+
+sample() is a wall-clock sampling profiler: the calling thread snapshots
+every other thread's Python stack via sys._current_frames() at a fixed
+interval, so it sees the event loop, the threadpool and the vault watcher
+without instrumenting them. Results export as collapsed stacks
+(flamegraph.pl, speedscope, inferno) or a speedscope JSON file.
+
+profile_request() wraps a single request in cProfile. cProfile only sees
+the thread it runs on, and the slow endpoints hand their work to
+asyncio.to_thread, so the request's context carries a list of profiles:
+ProfilingExecutor (installed as the loop's default executor when profiling
+is enabled) and profiled() give every worker call made on the request's
+behalf its own cProfile, and the summary merges them with the event loop's.
+Other requests served concurrently on the loop thread show up too.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+
+# (file suffix, function) of leaf frames where a thread is parked, not working
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socketserver.py", "serve_forever"),
+}
+
+SORT_KEYS = {key.value for key in pstats.SortKey}
+
+Frame = Tuple[str, str, int]
+
+# Profiles of the request being profiled: the event loop's first, then one per worker call
+_request_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("request_profiles", default=None)
+
+
+class ProfilerBusy(Exception):
+    """Another profiling session is already running."""
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _is_idle(leaf: Frame) -> bool:
+    name, filename, _ = leaf
+    return (os.path.basename(filename), name) in IDLE_LEAVES
+
+
+def profiled(fn: Callable) -> Callable:
+    """Wrap fn to run under its own cProfile when called for a profiled request.
+    
+    Must be called in the request's context (before handing fn to a thread).
+    """
+    profiles = _request_profiles.get()
+    if profiles is None:
+        return fn
+    
+    def run(*args, **kwargs):
+        profile = cProfile.Profile()
+        profiles.append(profile)
+        profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+    return run
+
+
+class ProfilingExecutor(ThreadPoolExecutor):
+    """Default executor that profiles work submitted by a profiled request (asyncio.to_thread)."""
+    
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(profiled(fn), *args, **kwargs)
+
+
+class ProfilerService:
+    """Sampling profiler across all threads, plus per-request cProfile."""
+    
+    def __init__(self):
+        self._sampling = threading.Lock()
+        self._request = threading.Lock()
+    
+    def sample(self, seconds: float, interval_ms: float = 5.0, include_idle: bool = False) -> Dict[str, Any]:
+        """Sample all threads for `seconds`; blocks the calling thread meanwhile."""
+        if not self._sampling.acquire(blocking=False):
+            raise ProfilerBusy("A sampling session is already running")
+        try:
+            counts: Dict[Tuple[str, Tuple[Frame, ...]], int] = {}
+            me = threading.get_ident()
+            interval = interval_ms / 1000
+            taken = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+            
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_key(frame))
+                        frame = frame.f_back
+                    if not stack or (not include_idle and _is_idle(stack[0])):
+                        continue
+                    key = (names.get(ident, f"thread-{ident}"), tuple(reversed(stack)))
+                    counts[key] = counts.get(key, 0) + 1
+                taken += 1
+                time.sleep(interval)
+            
+            return {
+                "samples": counts,
+                "snapshots": taken,
+                "interval_ms": interval_ms,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            }
+        finally:
+            self._sampling.release()
+    
+    @staticmethod
+    def to_collapsed(result: Dict[str, Any]) -> str:
+        """Brendan Gregg's collapsed format: 'thread;outer;...;leaf count' per line."""
+        lines = []
+        for (thread, stack), count in sorted(result["samples"].items(), key=lambda kv: -kv[1]):
+            frames = ";".join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def to_speedscope(result: Dict[str, Any], name: str = "smart-brain") -> Dict[str, Any]:
+        """speedscope.app sampled-profile JSON, one profile per thread."""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        by_thread: Dict[str, Dict[str, list]] = {}
+        
+        for (thread, stack), count in result["samples"].items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            profile = by_thread.setdefault(thread, {"samples": [], "weights": []})
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * result["interval_ms"])
+        
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "smart-brain profiler_service",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": thread, "unit": "milliseconds",
+                "startValue": 0, "endValue": sum(profile["weights"]),
+                "samples": profile["samples"], "weights": profile["weights"],
+            } for thread, profile in sorted(by_thread.items(), key=lambda kv: -sum(kv[1]["weights"]))],
+        }
+    
+    @contextmanager
+    def profile_request(self):
+        """cProfile the body of the with-block and its worker calls; one request at a time.
+        
+        Yields the list of profiles (event loop first) for summarize().
+        """
+        if not self._request.acquire(blocking=False):
+            raise ProfilerBusy("Another request is being profiled")
+        profile = cProfile.Profile()
+        profiles = [profile]
+        token = _request_profiles.set(profiles)
+        try:
+            profile.enable()
+            try:
+                yield profiles
+            finally:
+                profile.disable()
+        finally:
+            _request_profiles.reset(token)
+            self._request.release()
+    
+    @staticmethod
+    def summarize(profiles: List[cProfile.Profile], sort: str = "cumulative", limit: int = 40) -> str:
+        if sort not in SORT_KEYS:
+            sort = "cumulative"
+        out = io.StringIO()
+        out.write(f"Merged profiles: event loop + {len(profiles) - 1} worker call(s)\n")
+        stats = pstats.Stats(*profiles, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+# Global instance
+profiler_service = ProfilerService()
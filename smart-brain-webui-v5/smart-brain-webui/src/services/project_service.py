@@ -1,10 +1,10 @@
 """Project management with learning."""
 
-import sqlite3
 from typing import List, Dict, Optional, Tuple
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 from src.llm.llm_service import llm_service as llm
 
 
@@ -17,7 +17,7 @@ class ProjectService:
     
     def _ensure_table(self):
         """Create projects table."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -50,7 +50,7 @@ class ProjectService:
     
     def create_project(self, name: str, domain: str, description: str = "", keywords: str = "") -> int:
         """Create a new project."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -67,7 +67,7 @@ class ProjectService:
     
     def get_projects_for_domain(self, domain: str) -> List[Dict]:
         """Get all projects for a domain."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -86,7 +86,7 @@ class ProjectService:
     
     def get_all_projects(self) -> List[Dict]:
         """Get all active projects grouped by domain."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -199,7 +199,7 @@ Respond with ONLY the project name, nothing else."""
     
     def record_feedback(self, content_keywords: str, project_id: int, was_correct: bool):
         """Record whether project assignment was correct."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         if was_correct:
@@ -222,7 +222,7 @@ Respond with ONLY the project name, nothing else."""
     
     def add_learned_keywords(self, project_id: int, new_keywords: str):
         """Add keywords learned from user corrections."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT keywords FROM projects WHERE id = ?", (project_id,))
@@ -248,7 +248,7 @@ Respond with ONLY the project name, nothing else."""
     
     def assign_task_to_project(self, task_id: int, project_id: int):
         """Assign a task to a project."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("UPDATE tasks SET project_id = ? WHERE id = ?", (project_id, task_id))
@@ -265,7 +265,7 @@ Respond with ONLY the project name, nothing else."""
     
     def validate_assignments(self, domain: str) -> List[Dict]:
         """Check if tasks are correctly assigned and suggest corrections."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Get tasks with their current project
@@ -0,0 +1,277 @@
+"""Recurring obligation projection for subscriptions and loan payments.
+
+Subscription due dates are rolled forward in one batched pass, then the
+next occurrences of every subscription and loan payment are materialized
+into projected_obligations so cash-flow queries are a single indexed scan.
+Triggers on subscriptions and loans mark the projection stale.
+"""
+
+import math
+import sqlite3
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+
+from src.config import settings
+from src.storage.database import connect
+from src.services.amortization_service import amortization_service, add_months, next_payment_date
+
+
+# Calendar step per frequency: months for month-based, days for weekly
+MONTH_STEPS = {'monthly': 1, 'quarterly': 3, 'yearly': 12}
+WEEK_DAYS = 7
+
+
+class ProjectionService:
+    """Materialize upcoming subscription and loan payments."""
+    
+    def __init__(self):
+        self.db_path = settings.sqlite_db_path
+        # Only trust projection_state when every stale trigger exists
+        self.triggers_ready = False
+        self._ensure_tables()
+    
+    def _ensure_tables(self):
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS projected_obligations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_type TEXT NOT NULL,
+                source_id INTEGER NOT NULL,
+                name TEXT,
+                amount REAL,
+                due_date DATE NOT NULL,
+                category TEXT,
+                UNIQUE(source_type, source_id, due_date)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_projected_obligations_due ON projected_obligations(due_date)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS projection_state (
+                id INTEGER PRIMARY KEY DEFAULT 1,
+                refreshed_on DATE,
+                horizon_end DATE
+            )
+        """)
+        missing = []
+        for table in ['subscriptions', 'loans']:
+            for event in ['INSERT', 'UPDATE', 'DELETE']:
+                name = f"projection_{table}_{event.lower()}"
+                try:
+                    cursor.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS {name}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            DELETE FROM projection_state;
+                        END
+                    """)
+                except sqlite3.OperationalError as e:
+                    missing.append(f"{name} ({e})")
+        
+        self.triggers_ready = not missing
+        if missing:
+            # Nothing would mark the projection stale, so rebuild it on every read
+            cursor.execute("DELETE FROM projection_state")
+            logger.warning(f"Projection triggers not created, refreshing on every read; "
+                           f"run add_financial_tables: {', '.join(missing)}")
+        conn.commit()
+        conn.close()
+    
+    def ensure_fresh(self, days: int = 0, today: Optional[date] = None):
+        """Refresh if the projection is from an earlier day, stale, or too short.
+        
+        Without all stale triggers edits can't be detected, so it always refreshes.
+        """
+        today = today or date.today()
+        horizon_end = today + timedelta(days=max(days, settings.projection_horizon_days))
+        if not self.triggers_ready:
+            self.refresh(horizon_end, today)
+            return
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("SELECT refreshed_on, horizon_end FROM projection_state WHERE id = 1")
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row and row[0] == today.isoformat() and row[1] >= horizon_end.isoformat():
+            return
+        self.refresh(horizon_end, today)
+    
+    def refresh(self, horizon_end: date, today: Optional[date] = None) -> int:
+        """Advance subscription due dates and rebuild projected_obligations."""
+        today = today or date.today()
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        
+        advanced = self._advance_subscriptions(cursor, today)
+        rows = self._project_subscriptions(cursor, today, horizon_end)
+        rows += self._project_loans(cursor, today, horizon_end)
+        
+        cursor.execute("DELETE FROM projected_obligations")
+        cursor.executemany("""
+            INSERT OR IGNORE INTO projected_obligations (source_type, source_id, name, amount, due_date, category)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        # Written last: the subscription updates above fire the stale trigger
+        cursor.execute("""
+            INSERT OR REPLACE INTO projection_state (id, refreshed_on, horizon_end)
+            VALUES (1, ?, ?)
+        """, (today.isoformat(), horizon_end.isoformat()))
+        
+        conn.commit()
+        conn.close()
+        
+        logger.info(f"Projected {len(rows)} obligations through {horizon_end} ({advanced} subscriptions rolled over)")
+        return len(rows)
+    
+    def _advance_subscriptions(self, cursor, today: date) -> int:
+        """Roll every past-due next_due_date forward to its next occurrence."""
+        cursor.execute("""
+            SELECT id, frequency, start_date, next_due_date
+            FROM subscriptions
+            WHERE status = 'active' AND next_due_date IS NOT NULL AND next_due_date < ?
+        """, (today.isoformat(),))
+        
+        updates = []
+        for sub_id, frequency, start_date, next_due in cursor.fetchall():
+            due = self._first_on_or_after(frequency, start_date, next_due, today)
+            if due:
+                updates.append((due.isoformat(), sub_id))
+        
+        cursor.executemany("""
+            UPDATE subscriptions SET next_due_date = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+        """, updates)
+        return len(updates)
+    
+    def _project_subscriptions(self, cursor, today: date, horizon_end: date) -> List[Tuple]:
+        cursor.execute("""
+            SELECT id, name, amount, frequency, category, start_date, COALESCE(next_due_date, start_date)
+            FROM subscriptions
+            WHERE status = 'active' AND COALESCE(next_due_date, start_date) IS NOT NULL
+        """)
+        
+        rows = []
+        for sub_id, name, amount, frequency, category, start_date, next_due in cursor.fetchall():
+            for due in self._occurrences(frequency, start_date, next_due, today, horizon_end):
+                rows.append(('subscription', sub_id, name, amount, due.isoformat(), category))
+        return rows
+    
+    def _project_loans(self, cursor, today: date, horizon_end: date) -> List[Tuple]:
+        """Monthly loan payments until payoff, with the smaller final payment."""
+        cursor.execute("""
+            SELECT id, name, current_balance, interest_rate, monthly_payment, payment_due_day
+            FROM loans
+            WHERE status = 'active' AND current_balance > 0 AND monthly_payment > 0
+        """)
+        loans = cursor.fetchall()
+        if not loans:
+            return []
+        
+        months = math.ceil((horizon_end - today).days / 28) + 1
+        result = amortization_service.simulate(
+            [l[2] for l in loans], [l[3] for l in loans], [l[4] for l in loans], max_months=months
+        )
+        paid = result["interest"] + result["principal"]
+        
+        rows = []
+        for i, (loan_id, name, _, _, _, due_day) in enumerate(loans):
+            first = next_payment_date(due_day, today)
+            for k in range(paid.shape[1]):
+                due = add_months(first, k, due_day or 1)
+                if due > horizon_end or paid[i, k] <= 0:
+                    break
+                rows.append(('loan', loan_id, name, round(float(paid[i, k]), 2), due.isoformat(), 'loan'))
+        return rows
+    
+    def _occurrences(self, frequency: str, start_date: Optional[str], next_due: str,
+                     today: date, horizon_end: date) -> List[date]:
+        """Occurrences in [today, horizon_end], stepping from the current due date."""
+        first = self._first_on_or_after(frequency, start_date, next_due, today)
+        if not first:
+            return []
+        
+        due_day = self._anchor_day(start_date, next_due)
+        dates = []
+        k = 0
+        while True:
+            if frequency in MONTH_STEPS:
+                due = add_months(first, k * MONTH_STEPS[frequency], due_day)
+            else:
+                due = first + timedelta(days=WEEK_DAYS * k)
+            if due > horizon_end:
+                return dates
+            dates.append(due)
+            k += 1
+    
+    def _first_on_or_after(self, frequency: str, start_date: Optional[str], next_due: str,
+                           today: date) -> Optional[date]:
+        """First occurrence on or after today; month steps keep the start date's day."""
+        if frequency not in MONTH_STEPS and frequency != 'weekly':
+            return None
+        
+        anchor = date.fromisoformat(next_due[:10])
+        if anchor >= today:
+            return anchor
+        
+        if frequency == 'weekly':
+            return anchor + timedelta(days=WEEK_DAYS * math.ceil((today - anchor).days / WEEK_DAYS))
+        
+        step = MONTH_STEPS[frequency]
+        due_day = self._anchor_day(start_date, next_due)
+        k = max(0, ((today.year - anchor.year) * 12 + today.month - anchor.month) // step)
+        while add_months(anchor, k * step, due_day) < today:
+            k += 1
+        return add_months(anchor, k * step, due_day)
+    
+    def _anchor_day(self, start_date: Optional[str], next_due: str) -> int:
+        """Day of month the subscription bills on, so Jan 31 -> Feb 28 -> Mar 31."""
+        return int((start_date or next_due)[8:10])
+    
+    def get_cashflow(self, days: int = 90, today: Optional[date] = None) -> Dict[str, Any]:
+        """Pending bills plus projected subscription and loan payments for the next N days."""
+        today = today or date.today()
+        end = today + timedelta(days=days)
+        self.ensure_fresh(days, today)
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 'bill', id, name, amount, due_date, category
+            FROM bills WHERE status = 'pending' AND due_date <= ?
+            UNION ALL
+            SELECT source_type, source_id, name, amount, due_date, category
+            FROM projected_obligations WHERE due_date >= ? AND due_date <= ?
+            ORDER BY 5, 1, 2
+        """, (end.isoformat(), today.isoformat(), end.isoformat()))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        items = []
+        by_type: Dict[str, float] = {}
+        by_month: Dict[str, float] = {}
+        for source_type, source_id, name, amount, due_date, category in rows:
+            amount = amount or 0.0
+            items.append({
+                "type": source_type, "source_id": source_id, "name": name, "amount": amount,
+                "due_date": due_date, "category": category,
+                "overdue": bool(due_date) and due_date < today.isoformat()
+            })
+            by_type[source_type] = by_type.get(source_type, 0.0) + amount
+            month = (due_date or today.isoformat())[:7]
+            by_month[month] = by_month.get(month, 0.0) + amount
+        
+        return {
+            "start": today.isoformat(),
+            "end": end.isoformat(),
+            "items": items,
+            "total": round(sum(by_type.values()), 2),
+            "by_type": {k: round(v, 2) for k, v in by_type.items()},
+            "by_month": {k: round(v, 2) for k, v in sorted(by_month.items())}
+        }
+
+
+# Global instance
+projection_service = ProjectionService()
@@ -1,12 +1,12 @@
 """Question queue for clarifications including task ambiguity."""
 
-import sqlite3
 import json
 from typing import List, Dict, Optional
 from datetime import datetime
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 class QuestionService:
@@ -18,7 +18,7 @@ class QuestionService:
     
     def _ensure_table(self):
         """Create questions table with task_data support."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -45,7 +45,7 @@ class QuestionService:
                                 context: str, note_id: int, domain: str, 
                                 task_data: Dict) -> int:
         """Ask user to clarify an ambiguous task."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -71,7 +71,7 @@ class QuestionService:
     def ask_domain_clarification(self, title: str, content: str, 
                                  suggested_domain: str, confidence: float) -> int:
         """Ask user to clarify domain routing."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         question = f"Where should this note go: '{title}'?"
@@ -95,7 +95,7 @@ class QuestionService:
     
     def get_pending_questions(self) -> List[Dict]:
         """Get all unanswered questions."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -123,7 +123,7 @@ class QuestionService:
     
     def answer_question(self, question_id: int, answer: str):
         """Record answer and create task if it was a clarification."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Get question details
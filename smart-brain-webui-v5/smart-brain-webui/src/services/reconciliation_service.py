@@ -0,0 +1,359 @@
+"""Bill-to-transaction reconciliation.
+
+Candidate debits are loaded once for the date span of all open bills.
+Bills are swept in due-date order over a sliding window of transactions
+kept sorted by amount, so each bill bisects straight to the few debits
+that are inside both its date window and its amount band before anything
+is scored on amount, date and vendor similarity. Matches are assigned
+one-to-one, best score first. Confident matches mark the bill paid, the
+rest wait in a review queue.
+
+Bills owned by another app (BillBrain) are marked paid by that app: each
+reconcile_external call returns new confident matches in auto_matched and
+review matches confirmed since the last call in confirmed.
+"""
+
+import re
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from loguru import logger
+
+from src.config import settings
+from src.storage.database import connect
+
+
+# Amount band: the larger of an absolute and a relative tolerance
+AMOUNT_TOLERANCE = 1.00
+AMOUNT_TOLERANCE_PCT = 0.02
+
+SCORE_WEIGHTS = {'amount': 0.4, 'date': 0.25, 'vendor': 0.35}
+
+# Tokens that appear in bank descriptions but say nothing about the payee
+DESCRIPTION_NOISE = {
+    'inc', 'llc', 'co', 'corp', 'com', 'www', 'the', 'payment', 'pmt', 'ach', 'debit', 'pos',
+    'purchase', 'online', 'autopay', 'bill', 'billpay', 'web', 'recurring', 'card', 'checkcard',
+}
+
+
+class TransactionAlreadyMatched(Exception):
+    """Raised when confirming a match whose transaction already pays another bill."""
+
+
+class ReconciliationService:
+    """Match pending bills to imported transactions."""
+    
+    def __init__(self):
+        self.db_path = settings.sqlite_db_path
+        self._ensure_tables()
+    
+    def _ensure_tables(self):
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reconciliation_matches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                bill_ref TEXT NOT NULL,
+                transaction_id INTEGER NOT NULL,
+                score REAL,
+                amount_score REAL,
+                date_score REAL,
+                vendor_score REAL,
+                status TEXT DEFAULT 'review',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                reviewed_at TIMESTAMP,
+                UNIQUE(source, bill_ref, transaction_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reconciliation_status ON reconciliation_matches(status)")
+        conn.commit()
+        conn.close()
+    
+    def reconcile_bills(self, auto_mark: bool = True) -> Dict[str, Any]:
+        """Match pending bills; confident matches are marked paid when auto_mark is set."""
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, COALESCE(vendor, name), name, amount, due_date
+            FROM bills
+            WHERE status = 'pending' AND amount > 0 AND due_date IS NOT NULL
+              AND id NOT IN (SELECT CAST(bill_ref AS INTEGER) FROM reconciliation_matches
+                             WHERE source = 'bills' AND status = 'review')
+        """)
+        bills = [{"ref": str(r[0]), "vendor": r[1], "name": r[2], "amount": r[3], "due_date": r[4]}
+                 for r in cursor.fetchall()]
+        conn.close()
+        
+        return self._reconcile('bills', bills, auto_mark)
+    
+    def reconcile_external(self, source: str, bills: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Match bills owned by another app (e.g. BillBrain). The caller marks them paid.
+        
+        Bills that already have a match are not re-matched: accepted ones
+        (auto or confirmed) come back in "confirmed" for the caller to mark
+        paid, ones still in review stay queued.
+        """
+        normalized = [
+            {"ref": str(b["id"]), "vendor": b.get("vendor") or '', "name": b.get("vendor") or '',
+             "amount": b["amount"], "due_date": str(b["due_date"])[:10]}
+            for b in bills if b.get("amount") and b.get("due_date")
+        ]
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT m.bill_ref, m.transaction_id, t.date, -t.amount, m.status
+            FROM reconciliation_matches m JOIN transactions t ON t.id = m.transaction_id
+            WHERE m.source = ? AND m.status IN ('review', 'auto', 'confirmed')
+        """, (source,))
+        existing = {r[0]: r for r in cursor.fetchall()}
+        conn.close()
+        
+        confirmed = [
+            {"bill_ref": r[0], "transaction_id": r[1], "transaction_date": r[2],
+             "transaction_amount": round(r[3], 2), "status": r[4]}
+            for r in (existing.get(b["ref"]) for b in normalized) if r and r[4] != 'review'
+        ]
+        result = self._reconcile(source, [b for b in normalized if b["ref"] not in existing], auto_mark=True)
+        result["confirmed"] = confirmed
+        return result
+    
+    def _reconcile(self, source: str, bills: List[Dict[str, Any]], auto_mark: bool) -> Dict[str, Any]:
+        if not bills:
+            return {"auto_matched": [], "review": [], "unmatched": 0}
+        
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT bill_ref, transaction_id FROM reconciliation_matches WHERE source = ? AND status = 'rejected'
+        """, (source,))
+        rejected = set(cursor.fetchall())
+        
+        transactions = self._load_transactions(cursor, bills)
+        matches = self.match(bills, transactions, rejected)
+        
+        auto, review = [], []
+        for m in matches:
+            m["status"] = 'auto' if auto_mark and m["score"] >= settings.reconcile_auto_threshold else 'review'
+            (auto if m["status"] == 'auto' else review).append(m)
+        
+        cursor.executemany("""
+            INSERT OR REPLACE INTO reconciliation_matches
+                (source, bill_ref, transaction_id, score, amount_score, date_score, vendor_score, status, reviewed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (source, m["bill_ref"], m["transaction_id"], m["score"], m["amount_score"], m["date_score"],
+             m["vendor_score"], m["status"], None)
+            for m in matches
+        ])
+        if source == 'bills' and auto:
+            self._mark_paid(cursor, auto)
+        conn.commit()
+        conn.close()
+        
+        logger.info(f"Reconciled {len(bills)} {source} bills: {len(auto)} auto-matched, {len(review)} for review")
+        return {"auto_matched": auto, "review": review, "unmatched": len(bills) - len(matches)}
+    
+    def _load_transactions(self, cursor, bills: List[Dict[str, Any]]) -> List[Tuple]:
+        """Unclaimed debits in the combined date window of all bills, sorted by date.
+        
+        A debit queued for review against one bill is claimed too, so it is
+        never proposed for a second bill.
+        """
+        due_dates = [date.fromisoformat(b["due_date"][:10]) for b in bills]
+        start = min(due_dates) - timedelta(days=settings.reconcile_days_before)
+        end = max(due_dates) + timedelta(days=settings.reconcile_days_after)
+        
+        cursor.execute("""
+            SELECT id, date, -amount, description
+            FROM transactions
+            WHERE amount < 0 AND date BETWEEN ? AND ? AND matched_bill_id IS NULL
+              AND id NOT IN (SELECT transaction_id FROM reconciliation_matches
+                             WHERE status IN ('review', 'auto', 'confirmed'))
+            ORDER BY date, id
+        """, (start.isoformat(), end.isoformat()))
+        return cursor.fetchall()
+    
+    def match(self, bills: List[Dict[str, Any]], transactions: List[Tuple],
+              rejected: Optional[set] = None) -> List[Dict[str, Any]]:
+        """Score candidate pairs and assign them one-to-one, highest score first.
+        
+        transactions are (id, date, debit amount, description) sorted by date;
+        rejected holds (bill_ref, transaction_id) pairs never to propose again.
+        """
+        rejected = rejected or set()
+        before = settings.reconcile_days_before
+        after = settings.reconcile_days_after
+        posted = [date.fromisoformat(t[1][:10]).toordinal() for t in transactions]
+        descriptions: Dict[int, Tuple[List[str], str, set]] = {}
+        
+        # Sweep bills by due date; `window` holds (amount, index) for transactions
+        # posted within [due - before, due + after], kept sorted by amount.
+        order = sorted(range(len(bills)), key=lambda b: bills[b]["due_date"][:10])
+        window: List[Tuple[float, int]] = []
+        added = removed = 0
+        
+        candidates = []
+        for b in order:
+            bill = bills[b]
+            amount = bill["amount"]
+            due = date.fromisoformat(bill["due_date"][:10]).toordinal()
+            while added < len(transactions) and posted[added] <= due + after:
+                insort(window, (transactions[added][2], added))
+                added += 1
+            while removed < added and posted[removed] < due - before:
+                window.pop(bisect_left(window, (transactions[removed][2], removed)))
+                removed += 1
+            
+            tolerance = max(AMOUNT_TOLERANCE, amount * AMOUNT_TOLERANCE_PCT)
+            vendor = self._profile(bill["vendor"])
+            lo = bisect_left(window, (amount - tolerance, -1))
+            hi = bisect_right(window, (amount + tolerance, len(transactions)))
+            for debit, i in window[lo:hi]:
+                txn_id, _, _, description = transactions[i]
+                if (bill["ref"], txn_id) in rejected:
+                    continue
+                days = posted[i] - due
+                if i not in descriptions:
+                    descriptions[i] = self._profile(description)
+                
+                parts = {
+                    "amount_score": 1 - abs(debit - amount) / tolerance,
+                    "date_score": 1 - abs(days) / max(after if days > 0 else before, 1),
+                    "vendor_score": self._vendor_similarity(vendor, descriptions[i]),
+                }
+                score = (SCORE_WEIGHTS['amount'] * parts["amount_score"]
+                         + SCORE_WEIGHTS['date'] * parts["date_score"]
+                         + SCORE_WEIGHTS['vendor'] * parts["vendor_score"])
+                if score >= settings.reconcile_review_threshold:
+                    candidates.append((score, bill, transactions[i], parts))
+        
+        candidates.sort(key=lambda c: (-c[0], c[1]["ref"], c[2][0]))
+        used_bills, used_txns, matches = set(), set(), []
+        for score, bill, txn, parts in candidates:
+            if bill["ref"] in used_bills or txn[0] in used_txns:
+                continue
+            used_bills.add(bill["ref"])
+            used_txns.add(txn[0])
+            matches.append({
+                "bill_ref": bill["ref"],
+                "bill_name": bill["name"],
+                "bill_amount": bill["amount"],
+                "due_date": bill["due_date"],
+                "transaction_id": txn[0],
+                "transaction_date": txn[1],
+                "transaction_amount": round(txn[2], 2),
+                "description": txn[3],
+                "score": round(score, 3),
+                **{k: round(v, 3) for k, v in parts.items()},
+            })
+        return matches
+    
+    def _tokens(self, text: str) -> List[str]:
+        return [t for t in re.findall(r'[a-z0-9]+', (text or '').lower()) if t not in DESCRIPTION_NOISE and not t.isdigit()]
+    
+    def _profile(self, text: str) -> Tuple[List[str], str, set]:
+        """Tokens, joined tokens and character bigrams used for vendor similarity."""
+        tokens = self._tokens(text)
+        joined = ''.join(tokens)
+        return tokens, joined, {joined[i:i + 2] for i in range(len(joined) - 1)}
+    
+    def _vendor_similarity(self, vendor: Tuple[List[str], str, set], description: Tuple[List[str], str, set]) -> float:
+        """Share of vendor tokens found in the description, or bigram Dice overlap if higher."""
+        vendor_tokens, _, vendor_bigrams = vendor
+        description_tokens, joined, description_bigrams = description
+        if not vendor_tokens:
+            return 0.0
+        found = sum(1 for t in vendor_tokens if t in description_tokens or (len(t) > 3 and t in joined))
+        if not vendor_bigrams or not description_bigrams:
+            return found / len(vendor_tokens)
+        dice = 2 * len(vendor_bigrams & description_bigrams) / (len(vendor_bigrams) + len(description_bigrams))
+        return max(found / len(vendor_tokens), dice)
+    
+    def _mark_paid(self, cursor, matches: List[Dict[str, Any]]):
+        cursor.executemany("""
+            UPDATE bills SET status = 'paid', paid_date = ?, paid_amount = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [(m["transaction_date"], m["transaction_amount"], int(m["bill_ref"])) for m in matches])
+        cursor.executemany("""
+            UPDATE transactions SET matched_bill_id = ? WHERE id = ?
+        """, [(int(m["bill_ref"]), m["transaction_id"]) for m in matches])
+    
+    # ==================== REVIEW QUEUE ====================
+    
+    def get_review_queue(self, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        query = """
+            SELECT m.id, m.source, m.bill_ref, b.name, b.amount, b.due_date,
+                   t.id, t.date, -t.amount, t.description, m.score, m.amount_score, m.date_score, m.vendor_score
+            FROM reconciliation_matches m
+            JOIN transactions t ON t.id = m.transaction_id
+            LEFT JOIN bills b ON m.source = 'bills' AND b.id = CAST(m.bill_ref AS INTEGER)
+            WHERE m.status = 'review'
+        """
+        params = []
+        if source:
+            query += " AND m.source = ?"
+            params.append(source)
+        cursor.execute(query + " ORDER BY m.score DESC", params)
+        queue = [{
+            "id": r[0], "source": r[1], "bill_ref": r[2], "bill_name": r[3], "bill_amount": r[4],
+            "due_date": r[5], "transaction_id": r[6], "transaction_date": r[7],
+            "transaction_amount": r[8], "description": r[9], "score": r[10],
+            "amount_score": r[11], "date_score": r[12], "vendor_score": r[13]
+        } for r in cursor.fetchall()]
+        conn.close()
+        return queue
+    
+    def resolve_review(self, match_id: int, accept: bool) -> Optional[Dict[str, Any]]:
+        """Confirm or reject a queued match.
+        
+        Confirming a local bill marks it paid; a confirmed external bill is
+        handed back to its owner on the next reconcile_external call.
+        Confirming raises TransactionAlreadyMatched if the transaction already
+        pays another bill.
+        """
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT m.source, m.bill_ref, m.transaction_id, t.date, -t.amount
+            FROM reconciliation_matches m JOIN transactions t ON t.id = m.transaction_id
+            WHERE m.id = ? AND m.status = 'review'
+        """, (match_id,))
+        row = cursor.fetchone()
+        if not row:
+            conn.close()
+            return None
+        
+        source, bill_ref, transaction_id, txn_date, debit = row
+        if accept:
+            cursor.execute("""
+                SELECT source, bill_ref FROM reconciliation_matches
+                WHERE transaction_id = ? AND id != ? AND status IN ('auto', 'confirmed')
+                UNION ALL
+                SELECT 'bills', CAST(matched_bill_id AS TEXT) FROM transactions
+                WHERE id = ? AND matched_bill_id IS NOT NULL
+            """, (transaction_id, match_id, transaction_id))
+            claim = cursor.fetchone()
+            if claim:
+                conn.close()
+                raise TransactionAlreadyMatched(
+                    f"Transaction {transaction_id} is already matched to {claim[0]} bill {claim[1]}")
+        
+        cursor.execute("""
+            UPDATE reconciliation_matches SET status = ?, reviewed_at = CURRENT_TIMESTAMP WHERE id = ?
+        """, ('confirmed' if accept else 'rejected', match_id))
+        if accept and source == 'bills':
+            self._mark_paid(cursor, [{"bill_ref": bill_ref, "transaction_id": transaction_id,
+                                      "transaction_date": txn_date, "transaction_amount": round(debit, 2)}])
+        conn.commit()
+        conn.close()
+        
+        return {"source": source, "bill_ref": bill_ref, "transaction_id": transaction_id,
+                "status": 'confirmed' if accept else 'rejected'}
+
+
+# Global instance
+reconciliation_service = ReconciliationService()
@@ -0,0 +1,233 @@
+"""Local nearest-centroid domain classifier in front of LLM routing.
+
+Notes already filed in a domain, plus confirmed routing_confidence keyword
+sets, are turned into L2-normalised TF-IDF vectors and averaged into one
+centroid per domain. A new note goes to the most similar centroid when it
+wins clearly: confidence is the relative margin over the runner-up,
+(best - second) / best, and it must reach route_classifier_threshold with
+a best similarity of at least route_classifier_min_similarity. Everything
+else escalates to the LLM.
+
+Classification is a sparse dot product over the note's terms, so it costs
+microseconds per domain. The model retrains lazily once it is older than
+route_classifier_refresh_seconds, or after invalidate().
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.config import settings
+from src.storage.database import connect
+from src.services.metrics_service import ROUTING_DECISIONS
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_\-]{2,}")
+STOPWORDS = frozenset("""
+the and for with that this from have has was were are not but you your our their they them
+what when where which who how all any can will would should could about into over under
+then than there here also just more most some such only very need needs todo note notes
+""".split())
+# Terms kept per centroid; the tail contributes little to any dot product
+CENTROID_TERMS = 400
+
+Vector = Dict[str, float]
+# (text, domain, weight)
+Example = Tuple[str, str, float]
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _normalise(vector: Vector) -> Vector:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {t: v / norm for t, v in vector.items()} if norm else {}
+
+
+class _Model:
+    def __init__(self, centroids: Dict[str, Vector], idf: Dict[str, float], default_idf: float,
+                 examples: Dict[str, int]):
+        self.centroids = centroids
+        self.idf = idf
+        self.default_idf = default_idf
+        self.examples = examples
+        self.trained_at = time.time()
+    
+    def vectorize(self, text: str) -> Vector:
+        counts = Counter(tokenize(text))
+        return _normalise({t: (1 + math.log(c)) * self.idf.get(t, self.default_idf) for t, c in counts.items()})
+    
+    def similarities(self, vector: Vector) -> List[Tuple[float, str]]:
+        return sorted(((sum(w * centroid.get(t, 0.0) for t, w in vector.items()), domain)
+                       for domain, centroid in self.centroids.items()), reverse=True)
+
+
+class RouteClassifierService:
+    """Nearest-centroid routing over notes and routing feedback."""
+    
+    def __init__(self):
+        self.db_path = settings.sqlite_db_path
+        self._model: Optional[_Model] = None
+        self._lock = threading.Lock()
+        self.decisions = {"keyword": 0, "local": 0, "llm": 0}
+    
+    def classify(self, text: str, domains: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Route locally if the note is a clear match, else None (escalate)."""
+        model = self._current_model()
+        if model is None:
+            return None
+        vector = model.vectorize(text)
+        if not vector:
+            return None
+        ranked = [(s, d) for s, d in model.similarities(vector) if domains is None or d in domains]
+        if not ranked:
+            return None
+        
+        best, domain = ranked[0]
+        second = ranked[1][0] if len(ranked) > 1 else 0.0
+        confidence = (best - second) / best if best > 0 else 0.0
+        if best < settings.route_classifier_min_similarity or confidence < settings.route_classifier_threshold:
+            return None
+        return {
+            "domain": domain,
+            "confidence": round(confidence, 3),
+            "reasoning": f"Local classifier (similarity {best:.2f}, runner-up {second:.2f})"
+        }
+    
+    def record(self, method: str):
+        """Count how a note was routed: keyword, local or llm."""
+        self.decisions[method] += 1
+        ROUTING_DECISIONS.inc(method)
+    
+    def report(self) -> Dict[str, Any]:
+        total = sum(self.decisions.values())
+        model = self._model
+        return {
+            "decisions": dict(self.decisions),
+            "total": total,
+            "llm_call_reduction_rate": round(1 - self.decisions["llm"] / total, 3) if total else None,
+            "threshold": settings.route_classifier_threshold,
+            "min_similarity": settings.route_classifier_min_similarity,
+            "model": None if model is None else {
+                "domains": len(model.centroids),
+                "examples": model.examples,
+                "vocabulary": len(model.idf),
+                "age_seconds": round(time.time() - model.trained_at, 1)
+            }
+        }
+    
+    def invalidate(self):
+        self._model = None
+    
+    def evaluate(self, thresholds: Tuple[float, ...] = (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)) -> Dict[str, Any]:
+        """Train on the older 80% of examples, classify the newest 20%, per threshold.
+        
+        coverage = share of notes handled locally (LLM calls saved),
+        accuracy = share of those that match the domain they were filed in.
+        """
+        notes, feedback = self._load_examples()
+        cut = int(len(notes) * 0.8)
+        held_out = notes[cut:]
+        model = self._train(notes[:cut] + feedback)
+        if model is None or not held_out:
+            return {"held_out": len(held_out), "results": []}
+        
+        ranked = []
+        for text, domain, _ in held_out:
+            sims = model.similarities(model.vectorize(text))
+            ranked.append((sims, domain))
+        
+        results = []
+        for threshold in thresholds:
+            handled = correct = 0
+            for sims, domain in ranked:
+                if not sims:
+                    continue
+                best, predicted = sims[0]
+                second = sims[1][0] if len(sims) > 1 else 0.0
+                if best >= settings.route_classifier_min_similarity and best > 0 and (best - second) / best >= threshold:
+                    handled += 1
+                    correct += predicted == domain
+            results.append({
+                "threshold": threshold,
+                "coverage": round(handled / len(ranked), 3),
+                "accuracy": round(correct / handled, 3) if handled else None
+            })
+        return {"held_out": len(held_out), "results": results}
+    
+    def _current_model(self) -> Optional[_Model]:
+        model = self._model
+        if model is not None and time.time() - model.trained_at < settings.route_classifier_refresh_seconds:
+            return model
+        with self._lock:
+            model = self._model
+            if model is None or time.time() - model.trained_at >= settings.route_classifier_refresh_seconds:
+                notes, feedback = self._load_examples()
+                model = self._model = self._train(notes + feedback)
+        return model
+    
+    def _load_examples(self) -> Tuple[List[Example], List[Example]]:
+        """Notes oldest first, and feedback keyword sets weighted by how often they were right."""
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT title, content, domain FROM (
+                SELECT id, title, substr(content, 1, 2000) AS content, domain FROM notes
+                ORDER BY id DESC LIMIT ?
+            ) ORDER BY id
+        """, (settings.route_classifier_max_notes,))
+        notes = [(f"{title} {content}", domain, 1.0) for title, content, domain in cursor.fetchall()]
+        feedback = []
+        
+        try:
+            cursor.execute("""
+                SELECT keywords, domain, correct_count FROM routing_confidence
+                WHERE confidence >= 0.5 AND keywords != ''
+            """)
+            feedback = [(keywords, domain, 1.0 + correct) for keywords, domain, correct in cursor.fetchall()]
+        except Exception:
+            # routing_confidence is created by confidence_service on first use
+            pass
+        conn.close()
+        return notes, feedback
+    
+    @staticmethod
+    def _train(examples: List[Example]) -> Optional[_Model]:
+        docs = [(Counter(tokenize(text)), domain, weight) for text, domain, weight in examples]
+        docs = [d for d in docs if d[0]]
+        if not docs:
+            return None
+        
+        df = Counter()
+        for counts, _, _ in docs:
+            df.update(counts.keys())
+        n = len(docs)
+        idf = {t: math.log((1 + n) / (1 + c)) + 1 for t, c in df.items()}
+        default_idf = math.log(1 + n) + 1
+        
+        sums: Dict[str, Vector] = {}
+        examples: Dict[str, int] = {}
+        for counts, domain, weight in docs:
+            vector = _normalise({t: (1 + math.log(c)) * idf[t] for t, c in counts.items()})
+            total = sums.setdefault(domain, {})
+            for t, v in vector.items():
+                total[t] = total.get(t, 0.0) + v * weight
+            examples[domain] = examples.get(domain, 0) + 1
+        
+        centroids = {}
+        for domain, total in sums.items():
+            if examples[domain] < settings.route_classifier_min_examples:
+                continue
+            top = dict(sorted(total.items(), key=lambda kv: -kv[1])[:CENTROID_TERMS])
+            centroids[domain] = _normalise(top)
+        if not centroids:
+            return None
+        return _Model(centroids, idf, default_idf, examples)
+
+
+# Global instance
+route_classifier = RouteClassifierService()
@@ -1,38 +1,61 @@
 """Routing service - assigns PARA domains to notes."""
 
-from typing import Dict
+from typing import Dict, List, Optional
 from loguru import logger
 
 from src.models.workflow_state import ClusterNote, RoutedNote
 from src.llm.llm_service import llm_service as llm
+from src.llm.prompt_builder import PromptBuilder, PromptTooLarge
 from src.config import settings
 from src.services.confidence_service import confidence_service
 from src.services.question_service import question_service
 from src.services.domain_service import domain_service
+from src.services.route_classifier_service import route_classifier
 
 
 def _build_routing_prompt(cluster: ClusterNote, domains: list) -> str:
-    """Build routing prompt with dynamic domains."""
+    """Build routing prompt with dynamic domains, fitted to the routing budget."""
     domain_list = "\n".join([f"- {d['path']}: {d['name']}" for d in domains])
     
-    return f"""Assign this note to the correct PARA domain based on its content.
-
-Available domains:
-{domain_list}
-
-Note:
+    builder = PromptBuilder("routing")
+    builder.add("intro", "Assign this note to the correct PARA domain based on its content.", required=True)
+    builder.add("domains", domain_list, priority=1, header="Available domains:")
+    builder.add("note", f"""Note:
 Title: {cluster.title}
 Content: {cluster.content[:500]}
-Keywords: {', '.join(cluster.keywords)}
-
-Output JSON:
-{{
+Keywords: {', '.join(cluster.keywords)}""", required=True)
+    builder.add("output", """Output JSON:
+{
   "domain": "domain path",
   "confidence": 0.0-1.0,
   "reasoning": "brief explanation"
-}}
+}
+
+Return ONLY the JSON.""", required=True)
+    return builder.build()
+
+
+def _build_batch_routing_prompt(clusters: List[ClusterNote], domains: list) -> str:
+    """Build one routing prompt for several notes, numbered from 1."""
+    domain_list = "\n".join([f"- {d['path']}: {d['name']}" for d in domains])
+    notes = "\n\n".join(
+        f"[{i}] Title: {c.title}\nContent: {c.content[:300]}\nKeywords: {', '.join(c.keywords)}"
+        for i, c in enumerate(clusters, 1)
+    )
+    
+    builder = PromptBuilder("routing_batch", task_type="routing")
+    builder.add("intro", "Assign each note below to the correct PARA domain based on its content.", required=True)
+    builder.add("domains", domain_list, priority=1, header="Available domains:")
+    builder.add("notes", notes, required=True, header="Notes:")
+    builder.add("output", """Output JSON with one result per note, using the note's number as "index":
+{
+  "results": [
+    {"index": 1, "domain": "domain path", "confidence": 0.0-1.0, "reasoning": "brief explanation"}
+  ]
+}
 
-Return ONLY the JSON."""
+Return ONLY the JSON.""", required=True)
+    return builder.build()
 
 
 class RouteService:
@@ -52,6 +75,52 @@ class RouteService:
             domain_service.ensure_default_domains()
             domains = domain_service.get_all_domains()
         
+        quick_match = self._quick_route(cluster, domains)
+        if quick_match:
+            return quick_match
+        
+        llm_match = self._llm_route(cluster, domains)
+        route_classifier.record("llm")
+        
+        if ask_if_uncertain:
+            self._clarify_if_uncertain(cluster, llm_match, confidence_threshold)
+        
+        return llm_match
+    
+    def route_many(self, clusters: List[ClusterNote], ask_if_uncertain: bool = True) -> List[Dict[str, any]]:
+        """Route several notes; results are in input order.
+        
+        Keyword and local matches are resolved first, then the rest share
+        one LLM prompt per route_batch_size notes instead of a call each.
+        """
+        logger.debug(f"Routing {len(clusters)} notes")
+        
+        from src.services.threshold_service import threshold_service
+        confidence_threshold = threshold_service.get('routing_confidence_min')
+        
+        domains = domain_service.get_all_domains()
+        if not domains:
+            domain_service.ensure_default_domains()
+            domains = domain_service.get_all_domains()
+        
+        results: List[Optional[Dict[str, any]]] = [self._quick_route(c, domains) for c in clusters]
+        pending = [i for i, r in enumerate(results) if r is None]
+        if pending:
+            logger.info(f"Batch routing {len(pending)}/{len(clusters)} notes with LLM")
+        
+        size = max(1, settings.route_batch_size)
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            for i, match in zip(chunk, self._llm_route_batch([clusters[i] for i in chunk], domains)):
+                route_classifier.record("llm")
+                if ask_if_uncertain:
+                    self._clarify_if_uncertain(clusters[i], match, confidence_threshold)
+                results[i] = match
+        
+        return results
+    
+    def _quick_route(self, cluster: ClusterNote, domains: list) -> Optional[Dict[str, any]]:
+        """Keyword or local classifier match; None means the LLM has to decide."""
         keyword_match = self._keyword_match(cluster, domains)
         
         if keyword_match:
@@ -64,24 +133,32 @@ class RouteService:
         
         if keyword_match and keyword_match["confidence"] > 0.8:
             logger.info(f"High confidence routing: {keyword_match['domain']}")
+            route_classifier.record("keyword")
             return keyword_match
         
-        llm_match = self._llm_route(cluster, domains)
+        local_match = self._local_match(cluster, domains)
+        if local_match:
+            logger.info(f"Local classifier routing: {local_match['domain']}")
+            route_classifier.record("local")
+            return local_match
         
-        if ask_if_uncertain and llm_match["confidence"] < confidence_threshold:
-            logger.warning(f"Low confidence, asking clarification")
-            
-            question_id = question_service.ask_domain_clarification(
-                cluster.title,
-                cluster.content[:200],
-                llm_match["domain"],
-                llm_match["confidence"]
-            )
-            
-            llm_match["needs_clarification"] = True
-            llm_match["question_id"] = question_id
+        return None
+    
+    def _clarify_if_uncertain(self, cluster: ClusterNote, match: Dict[str, any], threshold: float):
+        """Ask the user to confirm a low-confidence LLM routing."""
+        if match["confidence"] >= threshold:
+            return
+        logger.warning(f"Low confidence, asking clarification")
         
-        return llm_match
+        question_id = question_service.ask_domain_clarification(
+            cluster.title,
+            cluster.content[:200],
+            match["domain"],
+            match["confidence"]
+        )
+        
+        match["needs_clarification"] = True
+        match["question_id"] = question_id
     
     def _keyword_match(self, cluster: ClusterNote, domains: list) -> Dict[str, any]:
         """Match note to domain using learned keywords."""
@@ -111,11 +188,21 @@ class RouteService:
             "reasoning": "Keyword matching"
         }
     
+    def _local_match(self, cluster: ClusterNote, domains: list) -> Optional[Dict[str, any]]:
+        """Nearest-centroid match over previously routed notes; None escalates to the LLM."""
+        if not settings.route_classifier_enabled:
+            return None
+        try:
+            text = f"{cluster.title} {cluster.content} {' '.join(cluster.keywords)}"
+            return route_classifier.classify(text, [d['path'] for d in domains])
+        except Exception as e:
+            logger.warning(f"Local routing classifier failed: {e}")
+            return None
+    
     def _llm_route(self, cluster: ClusterNote, domains: list) -> Dict[str, any]:
         """Route using LLM."""
-        prompt = _build_routing_prompt(cluster, domains)
-        
         try:
+            prompt = _build_routing_prompt(cluster, domains)
             response = llm.generate_json(prompt, task_type='routing')
             
             domain = response.get("domain", "personal")
@@ -138,6 +225,64 @@ class RouteService:
                 "confidence": 0.5,
                 "reasoning": "Fallback due to error"
             }
+    
+    def _llm_route_batch(self, clusters: List[ClusterNote], domains: list) -> List[Dict[str, any]]:
+        """Route notes with one LLM call; notes missing from the reply are routed singly."""
+        if len(clusters) == 1:
+            return [self._llm_route(clusters[0], domains)]
+        
+        try:
+            prompt = _build_batch_routing_prompt(clusters, domains)
+        except PromptTooLarge:
+            half = len(clusters) // 2
+            logger.info(f"Batch routing prompt for {len(clusters)} notes over budget, splitting it")
+            return self._llm_route_batch(clusters[:half], domains) + self._llm_route_batch(clusters[half:], domains)
+        
+        valid_domains = [d['path'] for d in domains]
+        
+        try:
+            response = llm.generate_json(prompt, task_type='routing')
+            items = response.get("results", []) if isinstance(response, dict) else response
+        except Exception as e:
+            logger.error(f"Batch LLM routing failed: {e}")
+            return [{
+                "domain": valid_domains[0] if valid_domains else "personal",
+                "confidence": 0.5,
+                "reasoning": "Fallback due to error"
+            } for _ in clusters]
+        
+        by_index = {}
+        for item in items or []:
+            try:
+                by_index[int(item["index"])] = item
+            except (KeyError, TypeError, ValueError):
+                continue
+        
+        results = []
+        for i, cluster in enumerate(clusters, 1):
+            item = by_index.get(i)
+            if item is None:
+                logger.warning(f"Batch routing reply missing note {i}, routing it separately")
+                results.append(self._llm_route(cluster, domains))
+                continue
+            
+            domain = item.get("domain", "personal")
+            if domain not in valid_domains:
+                logger.warning(f"Invalid domain '{domain}', defaulting to first domain")
+                domain = valid_domains[0] if valid_domains else "personal"
+            
+            try:
+                confidence = float(item.get("confidence", 0.7))
+            except (TypeError, ValueError):
+                confidence = 0.7
+            
+            results.append({
+                "domain": domain,
+                "confidence": confidence,
+                "reasoning": item.get("reasoning", "LLM classification")
+            })
+        
+        return results
 
 
 # Global service instance
@@ -1,11 +1,11 @@
 """Work Context Service - learns user's world through interview and brain dumps."""
 
-import sqlite3
 import json
 from typing import Dict, List, Optional, Any
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 class WorkContextService:
@@ -17,7 +17,7 @@ class WorkContextService:
     
     def _ensure_tables(self):
         """Ensure work_context tables exist."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Unified work context - stores platforms, areas, topics, people, etc.
@@ -59,7 +59,7 @@ class WorkContextService:
     
     def get_interview_status(self) -> Dict:
         """Get interview progress."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT phase, answers FROM interview_state WHERE id = 1")
@@ -181,7 +181,7 @@ class WorkContextService:
             next_phase = phase
         
         # Save state
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("""
             INSERT OR REPLACE INTO interview_state (id, phase, answers, updated_at)
@@ -194,7 +194,7 @@ class WorkContextService:
     
     def _process_interview_complete(self, answers: Dict):
         """Convert interview answers into work_context entries."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         platforms = answers.get("platforms", [])
@@ -248,7 +248,7 @@ class WorkContextService:
     
     def reset_interview(self):
         """Reset to start fresh."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("UPDATE interview_state SET phase = 'not_started', answers = NULL WHERE id = 1")
         cursor.execute("DELETE FROM work_context WHERE source = 'interview'")
@@ -259,7 +259,7 @@ class WorkContextService:
     
     def get_context_for_extraction(self) -> Dict:
         """Get learned context for brain dump extraction."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         # Get platforms with areas
@@ -318,7 +318,7 @@ class WorkContextService:
     def add_discovered_entity(self, entity_type: str, name: str, parent_name: str = None, 
                              description: str = None, confirmed: bool = False) -> int:
         """Add entity discovered from brain dump."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         parent_id = None
@@ -342,7 +342,7 @@ class WorkContextService:
     
     def confirm_entity(self, entity_id: int):
         """Confirm a discovered entity."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("UPDATE work_context SET confirmed = 1 WHERE id = ?", (entity_id,))
         conn.commit()
@@ -350,7 +350,7 @@ class WorkContextService:
     
     def get_unconfirmed_entities(self) -> List[Dict]:
         """Get entities discovered but not confirmed."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -370,7 +370,7 @@ class WorkContextService:
     
     def get_all_context(self) -> List[Dict]:
         """Get all work context entries."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
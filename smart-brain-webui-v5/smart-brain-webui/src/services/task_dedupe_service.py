@@ -2,19 +2,14 @@
 
 from typing import List
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 from src.models.workflow_state import Task
 from src.config import settings
+from src.services.embedding_service import embedding_service
 
 
 class TaskDedupeService:
-    def __init__(self):
-        logger.info("Loading embedding model...")
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        logger.success("Embedding model loaded")
-    
     def deduplicate(self, tasks: List[Task]) -> List[Task]:
         if len(tasks) <= 1:
             return tasks
@@ -22,7 +17,7 @@ class TaskDedupeService:
         logger.info(f"Deduplicating {len(tasks)} tasks")
         
         actions = [task.action for task in tasks]
-        embeddings = self.model.encode(actions)
+        embeddings = embedding_service.encode(actions, "task_dedupe")
         similarities = np.inner(embeddings, embeddings)
         
         keep_indices = []
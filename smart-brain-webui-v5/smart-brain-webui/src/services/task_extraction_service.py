@@ -59,20 +59,19 @@ class TaskExtractionService:
         """
         logger.info(f"Extracting tasks from note {note_id}")
         
+        tasks = []
+        questions = []
+        
         try:
-            prompt = TASK_EXTRACTION_PROMPT.format(content=content)
-            response = llm.generate_json(prompt, task_type='task_extraction')
-            
-            tasks_data = response.get("tasks", [])
-            
-            if not tasks_data:
-                logger.info("No tasks found")
-                return [], []
+            from src.services.project_service import project_service
             
-            tasks = []
-            questions = []
+            prompt = TASK_EXTRACTION_PROMPT.format(content=content)
             
-            for i, task_dict in enumerate(tasks_data):
+            # Each task is handled as soon as the model closes it, while the rest are still generating
+            for key, task_dict in llm.stream_json(prompt, task_type='task_extraction'):
+                if key not in ("tasks", None) or not isinstance(task_dict, dict):
+                    continue
+                i = len(tasks)
                 try:
                     priority_str = task_dict.get("priority", "medium").lower()
                     if priority_str not in ["high", "medium", "low"]:
@@ -116,29 +115,31 @@ class TaskExtractionService:
                 except Exception as e:
                     logger.error(f"Failed to parse task: {e}")
                     continue
-            
-            logger.success(f"Extracted {len(tasks)} tasks, {len(questions)} need clarification")
-            
-            # Suggest project assignments
-            from src.services.project_service import project_service
-            for task in tasks:
+                
+                # Suggest project assignment
                 if task.domain:
-                    proj_id, proj_name, confidence = project_service.suggest_project(
+                    proj_id, proj_name, confidence, new_project = project_service.suggest_project(
                         f"{task.action}: {task.text}", task.domain
                     )
                     task.metadata["suggested_project_id"] = proj_id
                     task.metadata["suggested_project_name"] = proj_name
                     task.metadata["project_confidence"] = confidence
                     
-                    # If new project suggested with high confidence
-                    if not proj_id and proj_name and confidence > 0.7:
-                        task.metadata["new_project_suggested"] = proj_name
+                    if not proj_id and new_project:
+                        task.metadata["new_project_suggested"] = new_project
+            
+            if not tasks:
+                logger.info("No tasks found")
+                return [], []
+            
+            logger.success(f"Extracted {len(tasks)} tasks, {len(questions)} need clarification")
             
             return tasks, questions
             
         except Exception as e:
-            logger.error(f"Task extraction failed: {e}")
-            return [], []
+            # Tasks the stream already closed are kept; only the rest of the reply is lost
+            logger.error(f"Task extraction failed after {len(tasks)} tasks: {e}")
+            return tasks, questions
     
     def apply_clarifications(self, tasks: List[Task], answers: Dict[int, str]) -> List[Task]:
         """Apply user's clarification answers to tasks."""
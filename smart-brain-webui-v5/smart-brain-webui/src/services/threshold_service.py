@@ -1,10 +1,10 @@
 """Learned threshold service - adapts based on user behavior."""
 
-import sqlite3
 from typing import Dict
 from loguru import logger
 
 from src.config import settings
+from src.storage.database import connect
 
 
 DEFAULT_THRESHOLDS = {
@@ -25,7 +25,7 @@ class ThresholdService:
     
     def _ensure_table(self):
         """Create thresholds table."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("""
@@ -43,7 +43,7 @@ class ThresholdService:
     
     def initialize(self):
         """Initialize with defaults."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         for name, value in DEFAULT_THRESHOLDS.items():
@@ -58,7 +58,7 @@ class ThresholdService:
     
     def get(self, name: str) -> float:
         """Get threshold value."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT value FROM learned_thresholds WHERE name = ?", (name,))
@@ -71,7 +71,7 @@ class ThresholdService:
     
     def adjust(self, name: str, feedback: str):
         """Adjust threshold based on user feedback."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT value FROM learned_thresholds WHERE name = ?", (name,))
@@ -110,7 +110,7 @@ class ThresholdService:
     
     def get_all(self) -> Dict[str, float]:
         """Get all thresholds."""
-        conn = sqlite3.connect(self.db_path)
+        conn = connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute("SELECT name, value FROM learned_thresholds")
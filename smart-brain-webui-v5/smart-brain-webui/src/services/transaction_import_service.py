@@ -0,0 +1,252 @@
+"""Streaming bank transaction import (CSV and OFX).
+
+Rows are parsed by generators and inserted in fixed-size chunks, so memory
+holds one chunk plus a small digest per row rather than the file. Each row gets a content-hash import_id
+(the UNIQUE index on transactions.import_id does the dedupe), making
+re-imports of overlapping statements idempotent. Identical rows within one
+file are told apart by an occurrence count per row, kept for the whole file
+so row order doesn't matter.
+"""
+
+import csv
+import hashlib
+import re
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Dict, Any, Optional, Callable
+from loguru import logger
+
+from src.config import settings
+from src.storage.database import connect
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+# Header aliases, matched case-insensitively
+CSV_COLUMNS = {
+    'date': ['date', 'transaction date', 'posted date', 'posting date', 'trans date'],
+    'description': ['description', 'payee', 'name', 'merchant', 'details', 'memo'],
+    'amount': ['amount', 'transaction amount'],
+    'debit': ['debit', 'withdrawal', 'withdrawals', 'debit amount'],
+    'credit': ['credit', 'deposit', 'deposits', 'credit amount'],
+    'category': ['category'],
+    'account': ['account', 'account name', 'account number'],
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y/%m/%d', '%d-%b-%Y', '%b %d, %Y', '%Y%m%d']
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str) -> Optional[str]:
+    """Normalize a statement date to ISO. Cached: statements repeat the same few dates."""
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+class TransactionImportService:
+    """Import bank statements into the transactions table."""
+    
+    def __init__(self):
+        self.db_path = settings.sqlite_db_path
+    
+    def resolve_import_path(self, path: str) -> Path:
+        """Resolve a caller-supplied path; it must stay inside settings.import_path."""
+        root = Path(settings.import_path).resolve()
+        resolved = (root / path).resolve()
+        if not resolved.is_relative_to(root):
+            raise ValueError(f"Import path must be inside the import directory ({settings.import_path})")
+        return resolved
+    
+    def import_file(self, path: str, fmt: Optional[str] = None, account: Optional[str] = None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Import a CSV or OFX/QFX file. Format is inferred from the extension if not given."""
+        path = Path(path)
+        fmt = (fmt or path.suffix.lstrip('.')).lower()
+        if fmt in ('qfx', 'ofx'):
+            fmt = 'ofx'
+        elif fmt != 'csv':
+            raise ValueError(f"Unsupported import format: {fmt}")
+        
+        with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+            rows = self._parse_csv(f, account) if fmt == 'csv' else self._parse_ofx(f, account)
+            return self._insert(rows, f"{fmt}:{path.name}", progress)
+    
+    def _insert(self, rows: Iterator[Dict[str, Any]], source: str,
+                progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Bulk insert parsed rows in chunks; duplicates are ignored by import_id."""
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        
+        stats = {"read": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+        seen: Dict[bytes, int] = {}
+        chunk = []
+        
+        def flush():
+            before = conn.total_changes
+            cursor.executemany("""
+                INSERT OR IGNORE INTO transactions
+                    (date, description, amount, category, account, transaction_type, import_source, import_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, chunk)
+            conn.commit()
+            inserted = conn.total_changes - before
+            stats["inserted"] += inserted
+            stats["duplicates"] += len(chunk) - inserted
+            chunk.clear()
+            if progress:
+                progress(stats["read"], stats["inserted"])
+            logger.debug(f"Import {source}: {stats['read']} rows read, {stats['inserted']} inserted")
+        
+        for row in rows:
+            if row is None:
+                stats["skipped"] += 1
+                continue
+            stats["read"] += 1
+            chunk.append((
+                row["date"], row["description"], row["amount"], row.get("category"), row.get("account"),
+                'debit' if row["amount"] < 0 else 'credit', source, self._import_id(row, seen)
+            ))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+        
+        conn.close()
+        logger.info(f"Imported {source}: {stats}")
+        return stats
+    
+    def _import_id(self, row: Dict[str, Any], seen: Dict[bytes, int]) -> str:
+        """Content hash; repeats of an identical row within one file get an occurrence suffix.
+        
+        seen counts rows by key digest for the whole file, so statements
+        need not be date-ordered.
+        """
+        if row.get("fitid"):
+            key = f"ofx|{row.get('account') or ''}|{row['fitid']}"
+        else:
+            key = "|".join([row.get("account") or '', row["date"], f"{row['amount']:.2f}",
+                            " ".join(row["description"].lower().split())])
+        digest = hashlib.sha1(key.encode()).digest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        return hashlib.sha1(f"{key}|{occurrence}".encode()).hexdigest()
+    
+    # ==================== CSV ====================
+    
+    def _parse_csv(self, f, account: Optional[str]) -> Iterator[Optional[Dict[str, Any]]]:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        columns = self._map_columns(header)
+        if 'date' not in columns or not ({'amount', 'debit', 'credit'} & columns.keys()):
+            raise ValueError("CSV needs date and amount (or debit/credit) columns")
+        
+        for record in reader:
+            if not any(record):
+                continue
+            get = lambda name: record[columns[name]].strip() if name in columns and columns[name] < len(record) else ''
+            
+            date = self._parse_date(get('date'))
+            if 'amount' in columns:
+                amount = self._parse_amount(get('amount'))
+            else:
+                debit, credit = self._parse_amount(get('debit')), self._parse_amount(get('credit'))
+                amount = None if debit is None and credit is None else (credit or 0.0) - abs(debit or 0.0)
+            
+            if not date or amount is None:
+                yield None
+                continue
+            
+            yield {
+                "date": date,
+                "description": get('description') or '(no description)',
+                "amount": amount,
+                "category": get('category') or None,
+                "account": account or get('account') or None,
+            }
+    
+    def _map_columns(self, header) -> Dict[str, int]:
+        normalized = [h.strip().lower() for h in header]
+        columns = {}
+        for field, aliases in CSV_COLUMNS.items():
+            for alias in aliases:
+                if alias in normalized:
+                    columns[field] = normalized.index(alias)
+                    break
+        return columns
+    
+    # ==================== OFX ====================
+    
+    def _parse_ofx(self, f, account: Optional[str]) -> Iterator[Optional[Dict[str, Any]]]:
+        """Tokenize SGML (OFX 1.x) or XML (OFX 2.x) in chunks, one STMTTRN at a time."""
+        current = None
+        buffer = ''
+        statement_account = account
+        for block in iter(lambda: f.read(64 * 1024), ''):
+            buffer += block
+            # Keep a possibly incomplete trailing tag for the next block
+            cut = buffer.rfind('<')
+            if cut <= 0:
+                continue
+            text, buffer = buffer[:cut], buffer[cut:]
+            for closing, tag, value in OFX_TAG.findall(text):
+                tag, value = tag.upper(), value.strip()
+                if tag == 'ACCTID' and not closing:
+                    statement_account = account or value
+                elif tag == 'STMTTRN':
+                    if closing and current is not None:
+                        yield self._ofx_row(current, statement_account)
+                        current = None
+                    elif not closing:
+                        current = {}
+                elif current is not None and not closing and value:
+                    current[tag] = value
+        
+        for closing, tag, value in OFX_TAG.findall(buffer):
+            if tag.upper() == 'STMTTRN' and closing and current is not None:
+                yield self._ofx_row(current, statement_account)
+    
+    def _ofx_row(self, fields: Dict[str, str], account: Optional[str]) -> Optional[Dict[str, Any]]:
+        date = self._parse_date(fields.get('DTPOSTED', '')[:8])
+        amount = self._parse_amount(fields.get('TRNAMT', ''))
+        if not date or amount is None:
+            return None
+        
+        name, memo = fields.get('NAME', ''), fields.get('MEMO', '')
+        return {
+            "date": date,
+            "description": name or memo or fields.get('TRNTYPE', '(no description)'),
+            "amount": amount,
+            "account": account,
+            "fitid": fields.get('FITID'),
+        }
+    
+    # ==================== NORMALIZATION ====================
+    
+    def _parse_date(self, value: str) -> Optional[str]:
+        return parse_date(value.strip())
+    
+    def _parse_amount(self, value: str) -> Optional[float]:
+        """Parse '$1,234.56', '(12.00)', '12.00-' or '-12' into a signed float."""
+        value = value.strip().replace('$', '').replace(',', '').replace(' ', '')
+        if not value:
+            return None
+        negative = value.startswith('(') and value.endswith(')') or value.endswith('-')
+        value = value.strip('()').rstrip('-')
+        try:
+            amount = float(value)
+        except ValueError:
+            return None
+        return round(-abs(amount) if negative else amount, 2)
+
+
+# Global instance
+transaction_import_service = TransactionImportService()
@@ -0,0 +1,176 @@
+"""SQLite connection factory.
+
+connect() is a drop-in for sqlite3.connect whose cursors time every
+statement into db_query_duration_seconds and per-statement stats. For
+SELECTs the timing covers executing the statement and stepping to the
+first row, not later fetches.
+
+Statements slower than settings.slow_query_ms are logged with their
+parameters redacted, and their EXPLAIN QUERY PLAN is captured once so
+full table scans stand out in /api/debug/queries.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from loguru import logger
+
+from src.config import settings
+from src.services.metrics_service import DB_QUERY_LATENCY
+
+
+# Only these can be prefixed with EXPLAIN QUERY PLAN
+EXPLAINABLE = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"}
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def statement_operation(sql: str) -> str:
+    """Leading keyword of a statement (SELECT, INSERT, ...), used as a low-cardinality label."""
+    head = sql.lstrip()[:10].split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+@lru_cache(maxsize=2048)
+def normalize_statement(sql: str) -> str:
+    """Collapse whitespace and replace inline literals so variants share one entry."""
+    sql = WHITESPACE.sub(" ", sql).strip()
+    sql = LITERAL.sub("?", sql)
+    return IN_LIST.sub("(?, ...)", sql)
+
+
+def redact(parameters) -> str:
+    """Show parameter types, never values."""
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: <{type(v).__name__}>" for k, v in parameters.items()) + "}"
+    return "[" + ", ".join(f"<{type(v).__name__}>" for v in parameters) + "]"
+
+
+class QueryStats:
+    """Per-normalized-statement timing aggregates."""
+    
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, sql: str, elapsed: float, rows: int = 1) -> bool:
+        """Add one execution; returns True if the statement still needs a query plan."""
+        key = normalize_statement(sql)
+        slow = elapsed * 1000 >= settings.slow_query_ms
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    "statement": key, "operation": statement_operation(key), "count": 0, "rows": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "slow_count": 0, "plan": None, "full_scan": []
+                }
+            entry["count"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += elapsed * 1000
+            entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+            if slow:
+                entry["slow_count"] += 1
+            return slow and entry["plan"] is None and entry["operation"] in EXPLAINABLE
+    
+    def set_plan(self, sql: str, plan: List[str]) -> List[str]:
+        """Store a captured plan; returns the tables it scans without an index."""
+        scans = [d.split()[1] for d in plan if d.startswith("SCAN ") and "USING" not in d
+                 and not d.startswith(("SCAN CONSTANT", "SCAN SUBQUERY"))]
+        with self._lock:
+            entry = self._stats.get(normalize_statement(sql))
+            if entry is not None:
+                entry["plan"] = plan
+                entry["full_scan"] = scans
+        return scans
+    
+    def snapshot(self, sort: str = "total_ms", limit: int = 50, slow_only: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = [dict(e) for e in self._stats.values() if e["slow_count"] or not slow_only]
+        for entry in entries:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["count"], 3)
+            entry["total_ms"] = round(entry["total_ms"], 3)
+            entry["max_ms"] = round(entry["max_ms"], 3)
+        entries.sort(key=lambda e: e.get(sort) or 0, reverse=True)
+        return entries[:limit]
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, time.perf_counter() - start, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._observe(sql, time.perf_counter() - start, None, max(self.rowcount, 0))
+    
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - start, "SCRIPT")
+    
+    def _observe(self, sql: str, elapsed: float, parameters, rows: int = 1):
+        DB_QUERY_LATENCY.observe(elapsed, statement_operation(sql))
+        if not settings.query_stats_enabled:
+            return
+        
+        needs_plan = query_stats.record(sql, elapsed, rows)
+        if elapsed * 1000 < settings.slow_query_ms:
+            return
+        
+        # executemany has no single parameter set to explain or show
+        params = redact(parameters) if parameters is not None else "(batch)"
+        scans = []
+        if needs_plan and parameters is not None:
+            plan = self._explain(sql, parameters)
+            if plan is not None:
+                scans = query_stats.set_plan(sql, plan)
+        note = f" [full scan: {', '.join(scans)}]" if scans else ""
+        logger.warning(f"Slow query {elapsed * 1000:.1f} ms{note}: {normalize_statement(sql)} params={params}")
+    
+    def _explain(self, sql: str, parameters) -> Optional[List[str]]:
+        # A plain cursor, so the EXPLAIN itself isn't timed or recorded
+        try:
+            rows = sqlite3.Cursor(self.connection).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+        except sqlite3.Error:
+            return None
+        return [row[-1] for row in rows]
+
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    # The connection shortcuts create C-level cursors, so route them through ours
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def connect(db_path: str, **kwargs) -> sqlite3.Connection:
+    return sqlite3.connect(db_path, factory=TimedConnection, **kwargs)
+
+
+# Global instance
+query_stats = QueryStats()
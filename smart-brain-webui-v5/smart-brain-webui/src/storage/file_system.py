@@ -1,12 +1,29 @@
-"""File storage service - writes notes to vault."""
+"""File storage service - writes notes to vault.
 
+Files are written to a temp file in the target directory and moved into
+place with os.replace, so readers never see a half-written note. Names
+are reserved with O_CREAT | O_EXCL, which makes collision handling atomic
+across concurrent writers. A batch of notes is inserted in one transaction,
+or into the caller's open transaction when it passes its connection, so
+notes can commit together with the rows they belong to.
+"""
+
+import asyncio
+import os
 import sqlite3
+import tempfile
 from pathlib import Path
 from datetime import datetime
+from typing import List, Dict, Any, Optional
 from loguru import logger
 
 from src.models.workflow_state import RoutedNote
 from src.config import settings
+from src.storage.database import connect
+
+
+# Give up on a title after this many numbered variants
+MAX_NAME_ATTEMPTS = 1000
 
 
 class FileStorageService:
@@ -14,31 +31,81 @@ class FileStorageService:
         self.vault_path = Path(settings.vault_path)
         self.db_path = settings.sqlite_db_path
     
-    def write_note(self, note: RoutedNote, source_file: str) -> Path:
-        file_path = self._generate_file_path(note)
-        markdown = self._generate_markdown(note)
+    def write_note(self, note: RoutedNote, source_file: str) -> Dict[str, Any]:
+        """Write one note; returns its id, file_path and created_at."""
+        return self.write_notes([note], source_file)[0]
+    
+    def write_notes(self, notes: List[RoutedNote], source_file: str,
+                    conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+        """Write notes to the vault and insert their rows in a single transaction.
         
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        file_path.write_text(markdown, encoding="utf-8")
+        With conn, the rows join the caller's transaction uncommitted; if the
+        caller's commit fails it should discard() the returned notes.
+        """
+        if not notes:
+            return []
         
-        logger.info(f"Wrote note: {file_path}")
-        self._store_in_db(note, file_path, source_file)
+        written = []
+        try:
+            for note in notes:
+                written.append(self._write_file(note))
+            stored = self._store_in_db(notes, written, source_file, conn)
+        except Exception:
+            # Keep vault and DB in step: drop files whose rows never landed
+            for file_path in written:
+                file_path.unlink(missing_ok=True)
+            raise
         
+        logger.info(f"Wrote {len(stored)} note(s) to vault")
+        return stored
+    
+    async def write_note_async(self, note: RoutedNote, source_file: str) -> Dict[str, Any]:
+        return (await self.write_notes_async([note], source_file))[0]
+    
+    async def write_notes_async(self, notes: List[RoutedNote], source_file: str) -> List[Dict[str, Any]]:
+        """Run the batch write off the event loop."""
+        return await asyncio.to_thread(self.write_notes, notes, source_file)
+    
+    def discard(self, stored: List[Dict[str, Any]]):
+        """Remove the files of notes whose rows were rolled back."""
+        for note in stored:
+            Path(note["file_path"]).unlink(missing_ok=True)
+    
+    def _write_file(self, note: RoutedNote) -> Path:
+        file_path = self._reserve_path(note)
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=".tmp-", suffix=".md")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._generate_markdown(note))
+            os.replace(tmp_path, file_path)
+        except Exception:
+            os.unlink(tmp_path)
+            file_path.unlink(missing_ok=True)
+            raise
+        
+        logger.debug(f"Wrote note: {file_path}")
         return file_path
     
-    def _generate_file_path(self, note: RoutedNote) -> Path:
+    def _reserve_path(self, note: RoutedNote) -> Path:
+        """Claim a free file name by creating it exclusively; title-2.md, title-3.md on collision."""
         safe_title = note.title.lower()
         safe_title = "".join(c if c.isalnum() or c in " -_" else "" for c in safe_title)
-        safe_title = safe_title.replace(" ", "-")[:100]
+        safe_title = safe_title.replace(" ", "-")[:100] or "untitled"
         
         subdir = {"Project": "projects", "Area": "areas", "Note": "notes"}.get(note.type.value, "notes")
-        path = self.vault_path / note.domain / subdir / f"{safe_title}.md"
+        directory = self.vault_path / note.domain / subdir
+        directory.mkdir(parents=True, exist_ok=True)
         
-        if path.exists():
-            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-            path = path.with_stem(f"{safe_title}-{timestamp}")
+        for attempt in range(1, MAX_NAME_ATTEMPTS + 1):
+            name = safe_title if attempt == 1 else f"{safe_title}-{attempt}"
+            path = directory / f"{name}.md"
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                continue
         
-        return path
+        raise FileExistsError(f"No free file name for '{safe_title}' in {directory}")
     
     def _generate_markdown(self, note: RoutedNote) -> str:
         return f"""---
@@ -52,15 +119,40 @@ tags: [{", ".join(note.keywords)}]
 {note.content}
 """
     
-    def _store_in_db(self, note: RoutedNote, file_path: Path, source_file: str):
-        conn = sqlite3.connect(self.db_path)
+    def _store_in_db(self, notes: List[RoutedNote], paths: List[Path], source_file: str,
+                     conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+        # Same format as the CURRENT_TIMESTAMP column default
+        created_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        
+        own_conn = conn is None
+        if own_conn:
+            conn = connect(self.db_path)
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO notes (title, content, domain, type, file_path, source_file)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (note.title, note.content, note.domain, note.type.value, str(file_path), source_file))
-        conn.commit()
-        conn.close()
+        stored = []
+        try:
+            for note, file_path in zip(notes, paths):
+                # The vault watcher may already have indexed the new file; take over its row
+                cursor.execute("""
+                    INSERT INTO notes (title, content, domain, type, file_path, source_file, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(file_path) DO UPDATE SET
+                        title = excluded.title,
+                        content = excluded.content,
+                        domain = excluded.domain,
+                        type = excluded.type,
+                        source_file = excluded.source_file,
+                        updated_at = excluded.updated_at
+                    RETURNING id, created_at
+                """, (note.title, note.content, note.domain, note.type.value, str(file_path), source_file,
+                      created_at, created_at))
+                note_id, note_created_at = cursor.fetchone()
+                stored.append({"id": note_id, "file_path": str(file_path), "created_at": note_created_at})
+            if own_conn:
+                conn.commit()
+        finally:
+            if own_conn:
+                conn.close()
+        return stored
 
 
 file_storage = FileStorageService()
@@ -0,0 +1,93 @@
+"""Frontmatter reader for vault notes.
+
+Only the --- header block is parsed, with a restricted parser for the flat
+schema FileStorageService writes (key: value, "quoted" strings and
+[a, b] lists) rather than full YAML. read_note memory-maps the file so
+finding the header never copies the body; the body is read on first
+access.
+"""
+
+import mmap
+import os
+import re
+from typing import Dict, Any, Tuple, Union, Optional
+
+
+# Headers larger than this are not treated as frontmatter
+MAX_HEADER_BYTES = 64 * 1024
+
+HEADER_CLOSE = re.compile(rb"\r?\n---[ \t]*\r?\n")
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+
+def parse_frontmatter(data: Buffer) -> Tuple[Dict[str, Any], int]:
+    """Parse the header of a note held in bytes or an mmap.
+    
+    Returns the header fields and the offset where the body starts
+    (0 when there is no frontmatter).
+    """
+    if data[:4] == b"---\n":
+        start = 4
+    elif data[:5] == b"---\r\n":
+        start = 5
+    else:
+        return {}, 0
+    
+    # Start on the opening newline so an empty header still closes
+    match = HEADER_CLOSE.search(data, start - 1, min(len(data), MAX_HEADER_BYTES))
+    if not match:
+        return {}, 0
+    
+    fields = {}
+    header = data[start:match.start()].decode("utf-8", errors="replace") if match.start() > start else ""
+    for line in header.split("\n"):
+        key, sep, value = line.partition(":")
+        # Skip blank lines, comments and nested YAML we don't write
+        if not sep or not key or key[0] in " \t#-":
+            continue
+        fields[key.strip()] = _parse_value(value.strip())
+    return fields, match.end()
+
+
+def _parse_value(value: str) -> Any:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    if value.startswith("[") and value.endswith("]"):
+        return [item.strip().strip("\"'") for item in value[1:-1].split(",") if item.strip()]
+    return value
+
+
+class NoteFile:
+    """Parsed frontmatter plus a lazily loaded body."""
+    
+    __slots__ = ("path", "fields", "body_offset", "_body")
+    
+    def __init__(self, path: str, fields: Dict[str, Any], body_offset: int, body: Optional[str] = None):
+        self.path = path
+        self.fields = fields
+        self.body_offset = body_offset
+        self._body = body
+    
+    @property
+    def body(self) -> str:
+        """Text after the header, read from disk on first access."""
+        if self._body is None:
+            with open(self.path, "rb") as f:
+                f.seek(self.body_offset)
+                self._body = f.read().decode("utf-8", errors="replace")
+        return self._body
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.fields.get(key, default)
+
+
+def read_note(path: Union[str, os.PathLike]) -> NoteFile:
+    """Parse a note's frontmatter without reading its body."""
+    path = os.fspath(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return NoteFile(path, {}, 0, body="")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            fields, offset = parse_frontmatter(mm)
+    return NoteFile(path, fields, offset)
@@ -0,0 +1,276 @@
+"""Vault indexer - keeps the notes table in sync with files in the vault.
+
+A manifest of (mtime, size, content hash) per file lets a rescan stat the
+whole vault and only read files whose stat changed; files whose content
+hash is unchanged are not rewritten. After the first scan a watcher
+(watchfiles/inotify when installed, polling otherwise) syncs just the
+paths that changed.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from loguru import logger
+
+from src.config import settings
+from src.storage.database import connect
+from src.storage.frontmatter import parse_frontmatter
+
+
+SUBDIR_TYPES = {"projects": "Project", "areas": "Area", "notes": "Note"}
+UPSERT_CHUNK_SIZE = 500
+
+
+class VaultIndexer:
+    """Incremental vault -> notes table sync."""
+    
+    def __init__(self):
+        self.vault_path = Path(settings.vault_path)
+        self.db_path = settings.sqlite_db_path
+        self.last_sync: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ensure_tables()
+    
+    def _ensure_tables(self):
+        conn = connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vault_manifest (
+                file_path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        conn.close()
+    
+    # ==================== SYNC ====================
+    
+    def scan(self) -> Dict[str, Any]:
+        """Full rescan: stat every note, read only the ones that changed."""
+        with self._lock:
+            start = time.perf_counter()
+            stats = dict(self._walk(str(self.vault_path)))
+            
+            conn = connect(self.db_path)
+            manifest = self._load_manifest(conn)
+            deleted = [path for path in manifest if path not in stats]
+            result = self._sync(conn, stats, deleted, manifest)
+            conn.close()
+            
+            return self._finish("scan", result, start)
+    
+    def sync_paths(self, paths: Iterable[str]) -> Dict[str, Any]:
+        """Sync only the given paths (from watcher events)."""
+        with self._lock:
+            start = time.perf_counter()
+            stats, deleted = {}, []
+            for path in {self._vault_relative(p) for p in paths}:
+                if not self._is_note(os.path.basename(path)):
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    deleted.append(path)
+                    continue
+                if st.st_size:
+                    stats[path] = (st.st_mtime_ns, st.st_size)
+            
+            conn = connect(self.db_path)
+            manifest = self._load_manifest(conn, list(stats) + deleted)
+            result = self._sync(conn, stats, [p for p in deleted if p in manifest], manifest)
+            conn.close()
+            
+            return self._finish("incremental", result, start)
+    
+    def _sync(self, conn, stats: Dict[str, Tuple[int, int]], deleted: List[str],
+              manifest: Dict[str, Tuple[int, int, str]]) -> Dict[str, int]:
+        cursor = conn.cursor()
+        result = {"scanned": len(stats), "updated": 0, "unchanged": 0, "deleted": len(deleted)}
+        upserts, touched = [], []
+        
+        for path, (mtime_ns, size) in stats.items():
+            known = manifest.get(path)
+            if known and known[0] == mtime_ns and known[1] == size:
+                result["unchanged"] += 1
+                continue
+            
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                continue
+            content_hash = hashlib.sha1(raw).hexdigest()
+            
+            if known and known[2] == content_hash:
+                touched.append((mtime_ns, size, content_hash, path))
+                result["unchanged"] += 1
+                continue
+            
+            note = self._parse_note(raw, path)
+            upserts.append((note["title"], note["content"], note["domain"], note["type"], path,
+                            mtime_ns, size, content_hash))
+            result["updated"] += 1
+            
+            if len(upserts) >= UPSERT_CHUNK_SIZE:
+                self._upsert(cursor, upserts)
+                upserts.clear()
+        
+        if upserts:
+            self._upsert(cursor, upserts)
+        cursor.executemany("""
+            UPDATE vault_manifest SET mtime_ns = ?, size = ?, content_hash = ?, indexed_at = CURRENT_TIMESTAMP
+            WHERE file_path = ?
+        """, touched)
+        
+        # Only files this indexer has seen before are removed from notes
+        cursor.executemany("DELETE FROM notes WHERE file_path = ?", [(p,) for p in deleted])
+        cursor.executemany("DELETE FROM vault_manifest WHERE file_path = ?", [(p,) for p in deleted])
+        
+        conn.commit()
+        return result
+    
+    def _upsert(self, cursor, rows: List[Tuple]):
+        cursor.executemany("""
+            INSERT INTO notes (title, content, domain, type, file_path, source_file)
+            VALUES (?, ?, ?, ?, ?, 'vault')
+            ON CONFLICT(file_path) DO UPDATE SET
+                title = excluded.title,
+                content = excluded.content,
+                domain = excluded.domain,
+                type = excluded.type,
+                updated_at = CURRENT_TIMESTAMP
+        """, [row[:5] for row in rows])
+        cursor.executemany("""
+            INSERT OR REPLACE INTO vault_manifest (file_path, mtime_ns, size, content_hash)
+            VALUES (?, ?, ?, ?)
+        """, [(row[4], row[5], row[6], row[7]) for row in rows])
+    
+    def _finish(self, mode: str, result: Dict[str, int], start: float) -> Dict[str, Any]:
+        result = {"mode": mode, **result, "seconds": round(time.perf_counter() - start, 3)}
+        self.last_sync = result
+        if result["updated"] or result["deleted"]:
+            logger.info(f"Vault sync ({mode}): {result}")
+        return result
+    
+    def _load_manifest(self, conn, paths: Optional[List[str]] = None) -> Dict[str, Tuple[int, int, str]]:
+        cursor = conn.cursor()
+        if paths is None:
+            cursor.execute("SELECT file_path, mtime_ns, size, content_hash FROM vault_manifest")
+            rows = cursor.fetchall()
+        else:
+            rows = []
+            for i in range(0, len(paths), UPSERT_CHUNK_SIZE):
+                chunk = paths[i:i + UPSERT_CHUNK_SIZE]
+                cursor.execute(f"""
+                    SELECT file_path, mtime_ns, size, content_hash FROM vault_manifest
+                    WHERE file_path IN ({",".join("?" * len(chunk))})
+                """, chunk)
+                rows.extend(cursor.fetchall())
+        return {row[0]: row[1:] for row in rows}
+    
+    # ==================== FILES ====================
+    
+    def _walk(self, directory: str) -> Iterable[Tuple[str, Tuple[int, int]]]:
+        """Yield (path, (mtime_ns, size)) for every note under directory."""
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk(entry.path)
+            elif self._is_note(entry.name):
+                st = entry.stat()
+                # Empty files are names reserved by the writer, not yet filled in
+                if st.st_size:
+                    yield entry.path, (st.st_mtime_ns, st.st_size)
+    
+    def _is_note(self, name: str) -> bool:
+        return name.endswith(".md") and not name.startswith(".")
+    
+    def _vault_relative(self, path: str) -> str:
+        """Map an absolute watcher path to the vault_path-based form stored in notes.file_path."""
+        root = str(self.vault_path)
+        if os.path.isabs(path) and not os.path.isabs(root):
+            return os.path.join(root, os.path.relpath(path, os.path.abspath(root)))
+        return path
+    
+    def _parse_note(self, raw: bytes, path: str) -> Dict[str, str]:
+        """Read the frontmatter written by FileStorageService; fall back to the path."""
+        rel = Path(os.path.relpath(path, str(self.vault_path)))
+        parents = rel.parent.parts
+        if parents and parents[-1] in SUBDIR_TYPES:
+            note = {"domain": "/".join(parents[:-1]), "type": SUBDIR_TYPES[parents[-1]]}
+        else:
+            note = {"domain": "/".join(parents), "type": "Note"}
+        note["title"] = rel.stem
+        
+        fields, body_offset = parse_frontmatter(raw)
+        for key in ("title", "domain", "type"):
+            if isinstance(fields.get(key), str) and fields[key]:
+                note[key] = fields[key]
+        
+        body = raw[body_offset:].decode("utf-8", errors="replace")
+        note["content"] = (body[1:] if body.startswith("\n") else body).rstrip("\n")
+        note["domain"] = note["domain"] or "personal"
+        return note
+    
+    # ==================== WATCHER ====================
+    
+    def start_watcher(self):
+        """Scan once, then follow changes in a background thread."""
+        if self.is_watching():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="vault-watcher", daemon=True)
+        self._thread.start()
+    
+    def is_watching(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def stop_watcher(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+    
+    def _watch(self):
+        try:
+            self.scan()
+        except Exception as e:
+            logger.error(f"Initial vault scan failed: {e}")
+        
+        try:
+            from watchfiles import watch
+        except ImportError:
+            watch = None
+        
+        if watch and self.vault_path.exists():
+            logger.info(f"Watching vault at {self.vault_path}")
+            for changes in watch(str(self.vault_path), stop_event=self._stop,
+                                 watch_filter=lambda _, path: self._is_note(os.path.basename(path))):
+                try:
+                    self.sync_paths(path for _, path in changes)
+                except Exception as e:
+                    logger.error(f"Vault sync failed: {e}")
+            return
+        
+        logger.info(f"Polling vault at {self.vault_path} every {settings.vault_poll_interval_seconds}s")
+        while not self._stop.wait(settings.vault_poll_interval_seconds):
+            try:
+                self.scan()
+            except Exception as e:
+                logger.error(f"Vault sync failed: {e}")
+
+
+# Global instance
+vault_indexer = VaultIndexer()